@@ -1,4 +1,5 @@
 import numpy as np
+from ConvergenceHistory import ConvergenceHistory
 
 # Function for which to find root
 def func(x):
@@ -10,45 +11,53 @@ def dFunc(x):
 
 
 # Unmodified Newton's method
-def newton1D(f, x0, maxIters=20, tol=1.0e-14):
+def newton1D(f, x0, maxIters=20, tol=1.0e-14, verb=1):
 
   # Compute initial residual
   r = f(x0)
   # Store it for use in convergence tests
   rInit = np.abs(r)
+  # Per-iteration history; prints only if verb>0
+  hist = ConvergenceHistory(maxIters, verb=verb)
 
   # Main loop
   for i in range(maxIters):
-    print('newton iter=%6d, x=%12.5g, rel resid=%12.5g' % (i,x0,np.abs(r/rInit)))
+    hist.record(i, residNorm=np.abs(r))
     # Compute derivative (residual has already been computed)
     df = dFunc(x0)
     # Compute full Newton step
     dx = -r/df
     # Take full Newton step
     x0 = x0 + dx
+    hist.record(i, stepNorm=np.abs(dx))
+    hist.emit(i)
     # Compute residual
     r = f(x0)
     # Check for convergence
     if np.abs(r) <= tol*rInit:
-      print('Newton\'s method converged in %d iters' % i)
-      print('solution is x=', x0)
-      print('residual is r=', np.abs(r))
+      if verb>0:
+        print('Newton\'s method converged in %d iters' % i)
+        print('solution is x=', x0)
+        print('residual is r=', np.abs(r))
       return (x0, True)
 
   # If exited loop, the method has failed to converge
-  print('Failure to converge!')
+  if verb>0:
+    print('Failure to converge!')
   return (x0, False)
 
 # Newton's method with simple backtracking
-def newtonBacktrack1D(f, x0, maxIters=20, maxBack=20, tol=1.0e-14):
+def newtonBacktrack1D(f, x0, maxIters=20, maxBack=20, tol=1.0e-14, verb=1):
 
   # Compute initial residual
   r0 = f(x0)
   rInit = np.abs(r0)
+  # Per-iteration history; prints only if verb>0
+  hist = ConvergenceHistory(maxIters, verb=verb)
 
   # Main loop
   for i in range(maxIters):
-    print('newton iter=%6d, x=%12.5g, rel resid=%12.5g' % (i,x0,np.abs(r0/rInit)))
+    hist.record(i, residNorm=np.abs(r0))
     # Compute derivative
     df = dFunc(x0)
     # Compute full Newton step (using stored residual)
@@ -57,7 +66,8 @@ def newtonBacktrack1D(f, x0, maxIters=20, maxBack=20, tol=1.0e-14):
     # Set up for line search to reduce residual
     alpha = 1.0
     lsGood = False
-    print('Line search:')
+    if verb>1:
+      print('Line search:')
     # Line search loop
     for j in range(maxBack):
       # Take trial step
@@ -66,10 +76,10 @@ def newtonBacktrack1D(f, x0, maxIters=20, maxBack=20, tol=1.0e-14):
       r1 = f(x1)
       # Find relative residual compared to that at start of step
       red = np.abs(r1/r0)
-      print('\tback=%6d, alpha=%12.5g, reduction=%12.5g' % (j,alpha,red))
+      if verb>1:
+        print('\tback=%6d, alpha=%12.5g, reduction=%12.5g' % (j,alpha,red))
       # Have we reduced the residual?
       if red < 1.0: # Yes, accept trial step
-        print('Line search found sufficient reduction')
         x0 = x1
         r0 = r1
         lsGood = True # Mark as accepted
@@ -77,18 +87,24 @@ def newtonBacktrack1D(f, x0, maxIters=20, maxBack=20, tol=1.0e-14):
       else: # No, reduce step further
         alpha /= 2.0
 
+    hist.record(i, stepNorm=np.abs(alpha*dx), backtracks=j)
+    hist.emit(i)
+
     if not lsGood: # Detect line search failure
-      print('Line search failed!')
+      if verb>0:
+        print('Line search failed!')
       return (x0, False)
 
     # Check for convergence to root
     if np.abs(r0) <= tol*rInit:
-      print('Newton\'s method converged in %d iters' % i)
-      print('solution is x=', x0)
-      print('residual is r=', np.abs(r0))
+      if verb>0:
+        print('Newton\'s method converged in %d iters' % i)
+        print('solution is x=', x0)
+        print('residual is r=', np.abs(r0))
       return (x0, True)
 
-  print('Failure to converge!')
+  if verb>0:
+    print('Failure to converge!')
   return (x0, False)
 
 if __name__=='__main__':
@@ -0,0 +1,288 @@
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+from NonlinearProblem import entryRows
+from ColoredJacobian import problemColoring
+
+# Forward-mode automatic differentiation with dual numbers.
+#
+# A Dual holds a value array val and a tangent dot, the derivative of val
+# along one direction (dot has val's shape) or along k directions at once
+# (dot has an extra trailing axis of length k). Arithmetic, sparse
+# matrix-vector products (K*u, K@u with scipy sparse matrices) and the
+# elementwise ufuncs in Dual.unary propagate the tangent by the chain rule,
+# so a residual written with those, like the out=None paths of the
+# problems' evalF(), evaluated at Dual(u, v) gives F(u) in val and the exact
+# J(u) v in dot. The in-place paths (out=, csrMatvec) are not supported:
+# ufuncs called with out= raise TypeError.
+#
+# The cost of a Dual evaluation is about twice that of evalF() for one
+# direction, and k+1 times for k directions, with no step size to choose.
+class Dual:
+    # Make ndarray and sparse matrix operators defer to Dual
+    __array_priority__ = 1000
+
+    # Ufunc -> derivative as a function of the argument (and the value)
+    unary = {
+        np.negative : lambda x, f: -np.ones_like(x),
+        np.exp : lambda x, f: f,
+        np.log : lambda x, f: 1.0/x,
+        np.sqrt : lambda x, f: 0.5/f,
+        np.square : lambda x, f: 2.0*x,
+        np.sin : lambda x, f: np.cos(x),
+        np.cos : lambda x, f: -np.sin(x),
+        np.tan : lambda x, f: 1.0 + f*f,
+        np.arctan : lambda x, f: 1.0/(1.0 + x*x),
+        np.sinh : lambda x, f: np.cosh(x),
+        np.cosh : lambda x, f: np.sinh(x),
+        np.tanh : lambda x, f: 1.0 - f*f,
+        np.absolute : lambda x, f: np.sign(x),
+    }
+
+    def __init__(self, val, dot):
+        self.val = np.asarray(val, dtype=np.double)
+        self.dot = np.asarray(dot, dtype=np.double)
+
+    def __repr__(self):
+        return 'Dual(%r, %r)' % (self.val, self.dot)
+
+    def __getitem__(self, idx):
+        return Dual(self.val[idx], self.dot[idx])
+
+    # a (shaped like val) broadcast against dot
+    def spread(self, a):
+        a = np.asarray(a)
+        return a.reshape(a.shape + (1,)*(self.dot.ndim - self.val.ndim))
+
+    def __neg__(self):
+        return Dual(-self.val, -self.dot)
+
+    def __add__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.val + other.val, self.dot + other.dot)
+        return Dual(self.val + other, self.dot)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.val - other.val, self.dot - other.dot)
+        return Dual(self.val - other, self.dot)
+
+    def __rsub__(self, other):
+        return Dual(other - self.val, -self.dot)
+
+    def __mul__(self, other):
+        if isinstance(other, Dual):
+            return Dual(self.val*other.val, self.spread(other.val)*self.dot
+                + self.spread(self.val)*other.dot)
+        if sp.issparse(other):
+            return NotImplemented
+        return Dual(self.val*other, self.spread(other)*self.dot)
+
+    # A sparse matrix times a Dual is a matrix-vector product, as for
+    # ndarrays
+    def __rmul__(self, other):
+        if sp.issparse(other):
+            if not sp.isspmatrix(other):
+                return NotImplemented
+            return self.__rmatmul__(other)
+        return self.__mul__(other)
+
+    def __rmatmul__(self, other):
+        return Dual(other @ self.val, other @ self.dot)
+
+    def __truediv__(self, other):
+        if isinstance(other, Dual):
+            q = self.val/other.val
+            return Dual(q, (self.dot - self.spread(q)*other.dot)
+                / self.spread(other.val))
+        return Dual(self.val/other, self.dot/self.spread(other))
+
+    def __rtruediv__(self, other):
+        q = other/self.val
+        return Dual(q, self.spread(-q/self.val)*self.dot)
+
+    def __pow__(self, p):
+        if isinstance(p, Dual):
+            return np.exp(p*np.log(self))
+        return Dual(self.val**p, self.spread(p*self.val**(p-1))*self.dot)
+
+    def __rpow__(self, a):
+        f = a**self.val
+        return Dual(f, self.spread(f*np.log(a))*self.dot)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method != '__call__' or 'out' in kwargs:
+            return NotImplemented
+        if ufunc in Dual.unary:
+            x = inputs[0].val
+            f = ufunc(x)
+            return Dual(f, self.spread(Dual.unary[ufunc](x, f))*inputs[0].dot)
+        binary = {
+            np.add : lambda a, b: a + b,
+            np.subtract : lambda a, b: a - b,
+            np.multiply : lambda a, b: a*b,
+            np.true_divide : lambda a, b: a/b,
+            np.power : lambda a, b: a**b,
+        }
+        if ufunc in binary:
+            (a, b) = inputs
+            if not isinstance(a, Dual):
+                a = Dual(a, np.zeros_like(b.dot))
+            return binary[ufunc](a, b)
+        return NotImplemented
+
+
+# Jacobian-vector product J(u) v of func by one Dual evaluation of evalF
+def jacVec(func, u, v):
+    return func.evalF(Dual(u, v)).dot
+
+
+# A problem whose Jacobian comes from forward-mode AD of its evalF(), for
+# problems without a hand-coded evalJ() or to check one. Everything else
+# is the wrapped problem's, so it can be passed to NewtonKrylov in place of
+# func: with matrixFree=True, GMRES uses evalJOperator(), whose products
+# are exact AD directional derivatives, and the preconditioner is built
+# from evalJ().
+#
+# evalJ() seeds one direction per color of the Jacobian pattern (as in
+# ColoredJacobian.py, 3 in 1D and 5 for the 2D five-point stencil) and
+# propagates all of them in a single Dual evaluation, so the assembled
+# Jacobian is exact and costs one pass over the residual code; diagonal()
+# gives the diagonal from the same pass. numDualEvals counts the Dual
+# evaluations, and numJacVecs the products made through evalJOperator().
+class ADJacobian:
+    def __init__(self, func, pattern=None):
+        self.func = func
+        if pattern is None:
+            pattern = func.pattern
+        self.pattern = sp.csr_matrix(pattern)
+        self.pattern.sort_indices()
+        self.colors = problemColoring(func, self.pattern)
+        self.numColors = int(self.colors.max()) + 1
+        self.rows = entryRows(self.pattern)
+        self.entryColors = self.colors[self.pattern.indices]
+        n = self.pattern.shape[1]
+        self.seeds = np.zeros((n, self.numColors))
+        self.seeds[np.arange(n), self.colors] = 1.0
+        self.numDualEvals = 0
+        self.numJacVecs = 0
+
+    def __getattr__(self, name):
+        return getattr(self.func, name)
+
+    def __str__(self):
+        return 'ADJacobian(%d colors)' % self.numColors
+
+    def newJ(self):
+        J = self.pattern.copy()
+        J.data[:] = 0.0
+        return J
+
+    def evalF(self, u, out=None):
+        return self.func.evalF(u, out=out)
+
+    # J(u) times each color's seed, as the columns of an n by numColors
+    # array
+    def compressedJ(self, u):
+        self.numDualEvals += 1
+        return self.func.evalF(Dual(u, self.seeds)).dot
+
+    def evalJ(self, u, J_out=None):
+        if J_out is None:
+            J_out = self.newJ()
+        JS = self.compressedJ(u)
+        J_out.data[:] = JS[self.rows, self.entryColors]
+        return J_out
+
+    def diagonal(self, u):
+        JS = self.compressedJ(u)
+        return JS[np.arange(len(u)), self.colors]
+
+    def evalJOperator(self, u):
+        u = np.array(u, copy=True)
+
+        def matvec(v):
+            self.numDualEvals += 1
+            self.numJacVecs += 1
+            return jacVec(self.func, u, np.ravel(v))
+
+        n = len(u)
+        return spla.LinearOperator((n,n), matvec=matvec, dtype=np.double)
+
+
+if __name__=='__main__':
+
+    import argparse
+    import time
+    from FDBratu2D import FDBratu2D
+    from FDBurgers1D import FDBurgers1D
+    from FDNonlinPoisson1D import FDNonlinPoisson1D
+    from NewtonKrylov import NewtonKrylov
+    from NewtonFDDeriv import FDDifferentiator
+    parser = argparse.ArgumentParser(description='Forward-mode AD Jacobians '
+        'against FD-JFNK')
+    parser.add_argument('--m1', type=int, default=4000)
+    parser.add_argument('--m2', type=int, default=128)
+    parser.add_argument('--reps', type=int, default=20)
+    args = parser.parse_args()
+
+    atanRHS = lambda u: (np.arctan(u), 1.0/(1.0 + u*u))
+    problems = [
+        ('bratu2d', FDBratu2D(m=args.m2, alpha=1.0)),
+        ('burgers1d', FDBurgers1D(m=args.m1, beta=100.0)),
+        ('poisson1d-atan', FDNonlinPoisson1D(m=args.m1, alpha=2.0,
+            rhsFunc=atanRHS)),
+    ]
+    diff = FDDifferentiator(1)
+    for (name, func) in problems:
+        n = func.numUnknowns()
+        rng = np.random.default_rng(0)
+        u = 0.5 + 0.1*rng.standard_normal(n)
+        v = rng.standard_normal(n)
+        Jv = func.evalJ(u)*v
+        F0 = func.evalF(u)
+
+        t0 = time.perf_counter()
+        for k in range(args.reps):
+            JvFD = diff.dirDeriv(func.evalF, u, v, F0=F0)
+        tFD = (time.perf_counter() - t0)/args.reps
+        t0 = time.perf_counter()
+        for k in range(args.reps):
+            JvAD = jacVec(func, u, v)
+        tAD = (time.perf_counter() - t0)/args.reps
+        t0 = time.perf_counter()
+        for k in range(args.reps):
+            func.evalF(u)
+        tF = (time.perf_counter() - t0)/args.reps
+
+        ad = ADJacobian(func)
+        JAD = ad.evalJ(u)
+        JErr = spla.norm(JAD - func.evalJ(u))/spla.norm(func.evalJ(u))
+        print('%s, n=%d' % (name, n))
+        print('  Jv: FD err=%.3g (%.3g evalF), AD err=%.3g (%.3g evalF); '
+            'AD J (%d colors) err=%.3g' % (
+            np.linalg.norm(JvFD - Jv)/np.linalg.norm(Jv), tFD/tF,
+            np.linalg.norm(JvAD - Jv)/np.linalg.norm(Jv), tAD/tF,
+            ad.numColors, JErr))
+
+        print('  %-12s %6s %8s %8s %10s %10s %10s' % ('Jacobian', 'conv',
+            'newton', 'krylov', 'residEval', 'dualEval', 'time (s)'))
+        for mode in ['analytic', 'fd-jfnk', 'ad']:
+            opts = dict(tau_r=1.0e-10, tau_a=1.0e-12, verb=0, linVerb=0,
+                precPolicy='adaptive', globalization='backtrack')
+            f = func
+            if mode == 'fd-jfnk':
+                opts['jfnk'] = True
+            elif mode == 'ad':
+                f = ADJacobian(func)
+                opts['matrixFree'] = True
+            solver = NewtonKrylov(**opts)
+            t0 = time.perf_counter()
+            (conv, uSoln) = solver.solve(f, func.initialU())
+            elapsed = time.perf_counter() - t0
+            print('  %-12s %6s %8d %8d %10d %10d %10.4g' % (mode, conv,
+                solver.history.numSteps(), solver.totalKrylovIters,
+                solver.numResidEvals, f.numDualEvals if mode == 'ad' else 0,
+                elapsed))
@@ -0,0 +1,38 @@
+import numpy as np
+import scipy.sparse.linalg as spla
+
+# Preconditioners are applied to vectors with applyLeft() and applyRight(),
+# and to blocks of vectors (the columns of an n by p array) with
+# applyRightBlock(). The base class is the identity on both sides; its
+# applyRightBlock() applies applyRight() column by column, so subclasses
+# only override it when they can do a block at once.
+class BasicPreconditioner:
+    def applyRight(self, vec):
+        return vec
+
+    def applyLeft(self, vec):
+        return vec
+
+    def applyRightBlock(self, X):
+        if type(self).applyRight is BasicPreconditioner.applyRight:
+            return X
+        return np.column_stack([self.applyRight(X[:,i])
+            for i in range(X.shape[1])])
+
+
+# Incomplete LU factorization (SuperLU's ILUTP, through scipy's spilu),
+# applied as a right preconditioner
+class ILURightPreconditioner(BasicPreconditioner):
+    def __init__(self, A,
+                drop_tol=1.0e-4,        # drop tolerance for ILU
+                fill_factor=10):        # fill allowance for ILU
+
+        self.ILU = spla.spilu(A.tocsc(), drop_tol=drop_tol,
+            fill_factor=fill_factor)
+
+    def applyRight(self, vec):
+        return self.ILU.solve(vec)
+
+    # The triangular solves take all columns in one call
+    def applyRightBlock(self, X):
+        return self.ILU.solve(X)
@@ -0,0 +1,117 @@
+import numpy as np
+
+# Newton's method with simple backtracking for many independent scalar
+# equations f(x_k)=0, k=0,...,n-1, advanced together with array operations.
+#
+# f and df must be vectorized. If indexed=True they are called as f(x, idx)
+# and df(x, idx), where x holds the current values of the entries listed in
+# idx; this is how per-entry parameters (e.g., material constants of each
+# cell) are looked up. Otherwise they're called as f(x), df(x).
+#
+# Entries drop out of the computation as soon as they converge or their line
+# search fails, so later iterations only touch the entries still active.
+#
+# Returns (x, conv, iters): the solution estimates, per-entry convergence
+# flags, and the number of Newton iterations taken by each entry.
+def batchNewtonBacktrack1D(f, df, x0, maxIters=20, maxBack=20, tol=1.0e-14,
+                            indexed=False):
+
+    if indexed:
+        evalF = f
+        evalDF = df
+    else:
+        evalF = lambda x, idx: f(x)
+        evalDF = lambda x, idx: df(x)
+
+    x = np.array(x0, dtype=np.double).ravel()
+    n = x.size
+    iters = np.zeros(n, dtype=np.int64)
+
+    # Compute initial residuals; store them for use in convergence tests
+    allIdx = np.arange(n)
+    r = np.asarray(evalF(x, allIdx), dtype=np.double)
+    rInit = np.abs(r)
+    conv = rInit <= tol*rInit
+    active = allIdx[~conv]
+
+    # Main loop
+    for i in range(maxIters):
+        if active.size == 0:
+            break
+
+        xa = x[active]
+        ra = r[active]
+        # Full Newton step for each active entry
+        dx = -ra/evalDF(xa, active)
+
+        # Backtracking: halve alpha for every entry that hasn't yet reduced
+        # its residual
+        alpha = np.ones(active.size)
+        accepted = np.zeros(active.size, dtype=bool)
+        pending = np.arange(active.size)
+        for j in range(maxBack):
+            x1 = xa[pending] + alpha[pending]*dx[pending]
+            r1 = evalF(x1, active[pending])
+            good = np.abs(r1) < np.abs(ra[pending])
+            done = pending[good]
+            xa[done] = x1[good]
+            ra[done] = r1[good]
+            accepted[done] = True
+            pending = pending[~good]
+            if pending.size == 0:
+                break
+            alpha[pending] /= 2.0
+
+        x[active] = xa
+        r[active] = ra
+        iters[active] += 1
+
+        # Entries with a failed line search stop here, unconverged
+        newConv = np.abs(ra) <= tol*rInit[active]
+        conv[active[newConv]] = True
+        active = active[accepted & ~newConv]
+
+    return (x, conv, iters)
+
+
+if __name__=='__main__':
+
+    import time
+    from ArcTan import func, dFunc, newtonBacktrack1D
+
+    print('='*80)
+    print('Batched Newton vs. a loop over ArcTan.newtonBacktrack1D')
+    print('%10s %12s %12s %10s %8s %10s' % ('n', 'loop (s)', 'batch (s)',
+        'speedup', 'conv', 'max err'))
+
+    rng = np.random.default_rng(1)
+    for n in [10, 100, 1000, 10000]:
+        x0 = rng.uniform(-10.0, 10.0, n)
+
+        t0 = time.perf_counter()
+        xLoop = np.empty(n)
+        for k in range(n):
+            (xLoop[k], c) = newtonBacktrack1D(func, x0[k], verb=0)
+        tLoop = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        (x, conv, iters) = batchNewtonBacktrack1D(func, dFunc, x0)
+        tBatch = time.perf_counter() - t0
+
+        print('%10d %12.4g %12.4g %10.4g %8s %10.3g' % (n, tLoop, tBatch,
+            tLoop/tBatch, conv.all(), np.abs(x - xLoop).max()))
+
+    print('\n', '='*80)
+    print('Per-cell constitutive law x^3 + c*x - b = 0 with per-entry c, b')
+    for n in [10**4, 10**5, 10**6]:
+        c = rng.uniform(0.1, 10.0, n)
+        b = rng.uniform(-100.0, 100.0, n)
+        f = lambda x, idx: x*x*x + c[idx]*x - b[idx]
+        df = lambda x, idx: 3.0*x*x + c[idx]
+        t0 = time.perf_counter()
+        (x, conv, iters) = batchNewtonBacktrack1D(f, df, np.zeros(n),
+            indexed=True, tol=1.0e-12)
+        tBatch = time.perf_counter() - t0
+        print('n=%8d time=%10.4g s, converged=%d, max iters=%d, '
+            'mean iters=%6.3g' % (n, tBatch, conv.sum(), iters.max(),
+            iters.mean()))
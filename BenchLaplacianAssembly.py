@@ -0,0 +1,97 @@
+# Benchmark of FD Laplacian assembly time versus grid size.
+#
+# Compares the vectorized CSR assembly in FDLaplacianND against a Kronecker
+# sum of 1D operators and (for small grids) against the original dok_matrix
+# loop. Every vectorized matrix is checked against the reference entry by
+# entry.
+
+import time
+import numpy as np
+import scipy.sparse as sp
+from FDLaplacianND import FDLaplacianND, FDLaplacianKron
+
+
+# The original loop-based assembly, kept here as the reference implementation
+def FDLaplacian2DLoop(a, b, m):
+    h = np.abs(b-a)/np.double(m+1)
+
+    A = sp.dok_matrix((m*m,m*m))
+
+    for ix in range(m):
+        for iy in range(m):
+            k = m*iy + ix
+            A[k,k] = -4.0/h/h
+            if iy > 0:
+                A[k,k-m] = 1.0/h/h
+            if iy < m-1:
+                A[k,k+m] = 1.0/h/h
+            if ix > 0:
+                A[k,k-1] = 1.0/h/h
+            if ix < m-1:
+                A[k,k+1] = 1.0/h/h
+
+    return A.tocsr()
+
+
+def sameMatrix(A, B):
+    A = A.tocsr()
+    B = B.tocsr()
+    A.sort_indices()
+    B.sort_indices()
+    return (A.shape==B.shape and np.array_equal(A.indptr, B.indptr)
+        and np.array_equal(A.indices, B.indices)
+        and np.array_equal(A.data, B.data))
+
+
+def timeIt(f, reps):
+    best = np.inf
+    for r in range(reps):
+        t0 = time.perf_counter()
+        A = f()
+        best = min(best, time.perf_counter() - t0)
+    return (best, A)
+
+
+if __name__=='__main__':
+
+    import argparse
+    parser = argparse.ArgumentParser(description='FD Laplacian assembly')
+    parser.add_argument('--maxM', action='store', default=2048)
+    parser.add_argument('--maxLoopM', action='store', default=256)
+    parser.add_argument('--maxM3D', action='store', default=128)
+    parser.add_argument('--reps', action='store', default=3)
+    args = parser.parse_args()
+
+    maxM = int(args.maxM)
+    maxLoopM = int(args.maxLoopM)
+    maxM3D = int(args.maxM3D)
+    reps = int(args.reps)
+
+    print('2D assembly (times in seconds)')
+    print('%8s %12s %12s %12s %12s %8s' % ('m', 'N', 'vectorized',
+        'kron', 'dok loop', 'same'))
+    m = 16
+    while m <= maxM:
+        (tVec, A) = timeIt(lambda: FDLaplacianND(-1.0, 1.0, m, 2), reps)
+        (tKron, K) = timeIt(lambda: FDLaplacianKron(-1.0, 1.0, m, 2), 1)
+        if m <= maxLoopM:
+            (tLoop, B) = timeIt(lambda: FDLaplacian2DLoop(-1.0, 1.0, m), 1)
+            same = sameMatrix(A, B)
+            loopStr = '%12.4g' % tLoop
+        else:
+            same = np.abs(A - K).max() <= 1.0e-12*np.abs(A.data).max()
+            loopStr = '%12s' % '-'
+        print('%8d %12d %12.4g %12.4g %s %8s' % (m, m*m, tVec, tKron,
+            loopStr, same))
+        m *= 2
+
+    print('\n3D assembly (times in seconds)')
+    print('%8s %12s %12s %12s %8s' % ('m', 'N', 'vectorized', 'kron',
+        'close'))
+    m = 8
+    while m <= maxM3D:
+        (tVec, A) = timeIt(lambda: FDLaplacianND(-1.0, 1.0, m, 3), reps)
+        (tKron, K) = timeIt(lambda: FDLaplacianKron(-1.0, 1.0, m, 3), 1)
+        close = np.abs(A - K).max() <= 1.0e-12*np.abs(A.data).max()
+        print('%8d %12d %12.4g %12.4g %8s' % (m, m**3, tVec, tKron, close))
+        m *= 2
@@ -0,0 +1,94 @@
+# Microbenchmark of residual evaluations per second.
+#
+# Compares, for each problem and number of unknowns,
+#   alloc   -- evalF(u), which builds the result from temporaries
+#   inplace -- evalF(u, out=F) with ufunc out= arguments and in-place CSR
+#              matvec (FusedKernels.csrMatvec)
+#   numba   -- evalF(u, out=F) with the fused Numba stencil kernel (only if
+#              Numba is installed)
+#
+# Example:
+#   python BenchResidual.py --problems bratu2d --n 1000000 10000000
+
+import time
+import numpy as np
+from FDBratu2D import FDBratu2D
+from FDBurgers1D import FDBurgers1D
+from FDNonlinPoisson1D import FDNonlinPoisson1D, cosRHSFunc
+import FusedKernels
+
+
+# Problem factories, keyed by name. Each takes the number of unknowns and
+# the residual kernel.
+problems = {
+    'bratu2d' : lambda n, kernel: FDBratu2D(m=int(round(np.sqrt(n))),
+        kernel=kernel),
+    'burgers1d' : lambda n, kernel: FDBurgers1D(m=n, beta=100.0,
+        kernel=kernel),
+    'poisson1d' : lambda n, kernel: FDNonlinPoisson1D(m=n, alpha=2.5,
+        rhsFunc=cosRHSFunc),
+}
+
+# Problems that have a fused Numba kernel
+numbaProblems = ('bratu2d', 'burgers1d')
+
+
+# Evaluations per second of evalF, running for at least minTime seconds
+def evalsPerSecond(func, u, out, minTime):
+    if out is None:
+        evalF = lambda: func.evalF(u)
+    else:
+        evalF = lambda: func.evalF(u, out=out)
+    evalF() # warm up (and compile, for Numba)
+
+    count = 0
+    t0 = time.perf_counter()
+    t = t0
+    while t - t0 < minTime:
+        evalF()
+        count += 1
+        t = time.perf_counter()
+    return count/(t - t0)
+
+
+def runCase(problem, n, variant, minTime=1.0):
+    kernel = 'numba' if variant == 'numba' else 'numpy'
+    func = problems[problem](n, kernel)
+    u = np.random.default_rng(0).uniform(-1.0, 1.0, func.numUnknowns())
+    out = None if variant == 'alloc' else np.empty_like(u)
+    return (func.numUnknowns(), evalsPerSecond(func, u, out, minTime))
+
+
+if __name__=='__main__':
+
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Residual evaluation microbenchmark')
+    parser.add_argument('--problems', nargs='+', default=list(problems.keys()),
+        choices=list(problems.keys()))
+    parser.add_argument('--n', nargs='+', type=int,
+        default=[10000, 100000, 1000000],
+        help='approximate numbers of unknowns')
+    parser.add_argument('--minTime', type=float, default=1.0,
+        help='seconds to run each case')
+    args = parser.parse_args()
+
+    variants = ['alloc', 'inplace']
+    if FusedKernels.haveNumba:
+        variants.append('numba')
+    else:
+        print('Numba not installed; skipping the fused kernels')
+
+    print('%-12s %10s %-8s %14s %10s' % ('problem', 'N', 'variant',
+        'evals/s', 'speedup'))
+    for problem in args.problems:
+        for n in args.n:
+            base = None
+            for variant in variants:
+                if variant == 'numba' and problem not in numbaProblems:
+                    continue
+                (N, rate) = runCase(problem, n, variant, args.minTime)
+                if base is None:
+                    base = rate
+                print('%-12s %10d %-8s %14.5g %10.3g' % (problem, N, variant,
+                    rate, rate/base))
@@ -0,0 +1,254 @@
+# Benchmark harness for the nonlinear solvers.
+#
+# Sweeps over problems, grid sizes and solver configurations, recording
+# setup and solve wall time, Newton and Krylov iteration counts, and
+# (optionally) peak memory. Results can be written to CSV/JSON and compared
+# against a stored baseline to flag regressions.
+#
+# Examples:
+#   python BenchSuite.py --problems bratu2d --configs direct nk-ilu-rebuild \
+#       --json run.json --baseline baseline.json
+#
+# Total Krylov iterations for each forcing-term strategy:
+#   python BenchSuite.py --problems bratu2d \
+#       --configs nk-ilu-rebuild nk-ilu-ew1 nk-ilu-ew2
+
+import sys
+import time
+import json
+import csv
+import tracemalloc
+import numpy as np
+from NewtonDirect import NewtonDirect
+from NewtonKrylov import NewtonKrylov
+from FDBratu1D import FDBratu1D
+from FDBratu2D import FDBratu2D
+from FDNonlinPoisson1D import FDNonlinPoisson1D, cosRHSFunc
+from FDBurgers1D import FDBurgers1D
+
+
+# Problem factories, keyed by name. Each takes the grid size m.
+problems = {
+    'bratu1d' : lambda m: FDBratu1D(m=m),
+    'bratu2d' : lambda m: FDBratu2D(m=m),
+    'poisson1d' : lambda m: FDNonlinPoisson1D(m=m, alpha=2.5,
+        rhsFunc=cosRHSFunc),
+    'burgers1d-b20' : lambda m: FDBurgers1D(m=m, beta=20.0),
+    'burgers1d-b100' : lambda m: FDBurgers1D(m=m, beta=100.0),
+    'burgers1d-b300' : lambda m: FDBurgers1D(m=m, beta=300.0),
+    'burgers1d-b1000' : lambda m: FDBurgers1D(m=m, beta=1000.0),
+}
+
+# Default grid sizes, by spatial dimension of the problem
+defaultSizes = {
+    1 : [100, 1000, 10000],
+    2 : [32, 64, 128]
+}
+
+# Solver configurations: 'solver' selects the driver, the remaining entries
+# are passed to its constructor
+configs = {
+    'direct' : {'solver' : 'direct'},
+    'direct-armijo' : {'solver' : 'direct', 'globalization' : 'armijo'},
+    'direct-dogleg' : {'solver' : 'direct', 'globalization' : 'dogleg'},
+    'nk-ilu-rebuild' : {'solver' : 'nk', 'precPolicy' : 'rebuild'},
+    'nk-ilu-reuse' : {'solver' : 'nk', 'precPolicy' : 'reuse'},
+    'nk-ilu-adaptive' : {'solver' : 'nk', 'precPolicy' : 'adaptive'},
+    'nk-ilu-drop1e-2' : {'solver' : 'nk', 'precPolicy' : 'rebuild',
+        'iluDrop' : 1.0e-2},
+    'nk-ilu-fill5' : {'solver' : 'nk', 'precPolicy' : 'rebuild',
+        'iluFill' : 5},
+    'nk-ilu-ew1' : {'solver' : 'nk', 'precPolicy' : 'rebuild',
+        'forcing' : 'ew1'},
+    'nk-ilu-ew2' : {'solver' : 'nk', 'precPolicy' : 'rebuild',
+        'forcing' : 'ew2'},
+    'nk-weakilu' : {'solver' : 'nk', 'precPolicy' : 'reuse',
+        'iluDrop' : 1.0e-2, 'iluFill' : 1},
+    'nk-weakilu-gcrodr' : {'solver' : 'nk', 'precPolicy' : 'reuse',
+        'iluDrop' : 1.0e-2, 'iluFill' : 1, 'recycle' : 10},
+    'nk-ilu-backtrack' : {'solver' : 'nk', 'precPolicy' : 'rebuild',
+        'globalization' : 'backtrack'},
+    'nk-ilu-armijo' : {'solver' : 'nk', 'precPolicy' : 'rebuild',
+        'globalization' : 'armijo'},
+    'nk-ilu-dogleg' : {'solver' : 'nk', 'precPolicy' : 'rebuild',
+        'globalization' : 'dogleg'},
+    'nk-bjilu8' : {'solver' : 'nk', 'precPolicy' : 'rebuild',
+        'precType' : 'bjilu', 'precBlocks' : 8},
+    'nk-bjilu8-t8' : {'solver' : 'nk', 'precPolicy' : 'rebuild',
+        'precType' : 'bjilu', 'precBlocks' : 8, 'threads' : 8},
+}
+
+
+def makeSolver(config, tau_r, tau_a):
+    opts = {k : v for (k, v) in config.items() if k != 'solver'}
+    if config['solver'] == 'direct':
+        return NewtonDirect(tau_r=tau_r, tau_a=tau_a, verb=0, **opts)
+    if config['solver'] == 'nk':
+        return NewtonKrylov(tau_r=tau_r, tau_a=tau_a, verb=0, linVerb=0,
+            **opts)
+    raise ValueError('unknown solver: %s' % config['solver'])
+
+
+def runOnce(problem, m, config, tau_r, tau_a):
+    t0 = time.perf_counter()
+    func = problems[problem](m)
+    u = func.initialU()
+    tSetup = time.perf_counter() - t0
+
+    solver = makeSolver(configs[config], tau_r, tau_a)
+    t0 = time.perf_counter()
+    (conv, uSoln) = solver.solve(func, u)
+    tSolve = time.perf_counter() - t0
+    if hasattr(solver, 'close'):
+        solver.close()
+
+    return (tSetup, tSolve, conv, solver)
+
+
+# Run one (problem, m, config) case: best of reps timings, and optionally a
+# separate run under tracemalloc for the peak memory (tracing slows the run
+# down, so it isn't timed).
+def runCase(problem, m, config, reps=1, memory=False, tau_r=1.0e-8,
+            tau_a=1.0e-10):
+    bestSetup = np.inf
+    bestSolve = np.inf
+    for r in range(reps):
+        (tSetup, tSolve, conv, solver) = runOnce(problem, m, config, tau_r,
+            tau_a)
+        bestSetup = min(bestSetup, tSetup)
+        bestSolve = min(bestSolve, tSolve)
+
+    peakMB = np.nan
+    if memory:
+        tracemalloc.start()
+        runOnce(problem, m, config, tau_r, tau_a)
+        peakMB = tracemalloc.get_traced_memory()[1]/2.0**20
+        tracemalloc.stop()
+
+    return {
+        'problem' : problem,
+        'm' : m,
+        'config' : config,
+        'converged' : bool(conv),
+        'setupTime' : bestSetup,
+        'solveTime' : bestSolve,
+        'newtonIters' : solver.history.numIters - 1,
+        'krylovIters' : solver.totalKrylovIters,
+        'residEvals' : solver.numResidEvals,
+        'peakMB' : peakMB
+    }
+
+
+def caseKey(rec):
+    return (rec['problem'], rec['m'], rec['config'])
+
+
+# Compare results against a baseline. A case regresses if it no longer
+# converges, needs more Newton or Krylov iterations, or its solve time grew
+# by more than timeTol (relative) and minTime (absolute, to ignore noise on
+# tiny runs).
+def findRegressions(results, baseline, timeTol=0.25, minTime=0.01):
+    base = {caseKey(rec) : rec for rec in baseline}
+    regressions = []
+    for rec in results:
+        key = caseKey(rec)
+        if key not in base:
+            continue
+        old = base[key]
+        reasons = []
+        if old['converged'] and not rec['converged']:
+            reasons.append('no longer converges')
+        if rec['newtonIters'] > old['newtonIters']:
+            reasons.append('newtonIters %d -> %d' % (old['newtonIters'],
+                rec['newtonIters']))
+        if rec['krylovIters'] > old['krylovIters']:
+            reasons.append('krylovIters %d -> %d' % (old['krylovIters'],
+                rec['krylovIters']))
+        dt = rec['solveTime'] - old['solveTime']
+        if dt > timeTol*old['solveTime'] and dt > minTime:
+            reasons.append('solveTime %.4g -> %.4g' % (old['solveTime'],
+                rec['solveTime']))
+        if len(reasons) > 0:
+            regressions.append((key, reasons))
+    return regressions
+
+
+def writeCSV(results, filename):
+    with open(filename, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def writeJSON(results, filename):
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=1)
+
+
+def readJSON(filename):
+    with open(filename) as f:
+        return json.load(f)
+
+
+def printRecord(rec):
+    print('%-16s %7d %-18s %6s %10.4g %10.4g %6d %8d %6d %8.4g' % (
+        rec['problem'], rec['m'], rec['config'], rec['converged'],
+        rec['setupTime'], rec['solveTime'], rec['newtonIters'],
+        rec['krylovIters'], rec['residEvals'], rec['peakMB']))
+
+
+if __name__=='__main__':
+
+    import argparse
+    parser = argparse.ArgumentParser(description='Nonlinear solver benchmarks')
+    parser.add_argument('--problems', nargs='+', default=list(problems.keys()),
+        choices=list(problems.keys()))
+    parser.add_argument('--configs', nargs='+', default=list(configs.keys()),
+        choices=list(configs.keys()))
+    parser.add_argument('--m', nargs='+', type=int, default=None,
+        help='grid sizes (default depends on problem dimension)')
+    parser.add_argument('--reps', type=int, default=1)
+    parser.add_argument('--memory', action='store_true', default=False)
+    parser.add_argument('--tau_r', type=float, default=1.0e-8)
+    parser.add_argument('--tau_a', type=float, default=1.0e-10)
+    parser.add_argument('--csv', default=None)
+    parser.add_argument('--json', default=None)
+    parser.add_argument('--baseline', default=None,
+        help='JSON results to compare against')
+    parser.add_argument('--saveBaseline', default=None,
+        help='write these results as a new baseline')
+    parser.add_argument('--timeTol', type=float, default=0.25)
+    args = parser.parse_args()
+
+    print('%-16s %7s %-18s %6s %10s %10s %6s %8s %6s %8s' % ('problem', 'm',
+        'config', 'conv', 'setup(s)', 'solve(s)', 'newton', 'krylov', 'resid',
+        'peak(MB)'))
+    results = []
+    for problem in args.problems:
+        dim = problems[problem](1).dim
+        sizes = args.m if args.m is not None else defaultSizes[dim]
+        for m in sizes:
+            for config in args.configs:
+                rec = runCase(problem, m, config, reps=args.reps,
+                    memory=args.memory, tau_r=args.tau_r, tau_a=args.tau_a)
+                printRecord(rec)
+                results.append(rec)
+
+    if args.csv is not None:
+        writeCSV(results, args.csv)
+    if args.json is not None:
+        writeJSON(results, args.json)
+    if args.saveBaseline is not None:
+        writeJSON(results, args.saveBaseline)
+
+    if args.baseline is not None:
+        regressions = findRegressions(results, readJSON(args.baseline),
+            timeTol=args.timeTol)
+        if len(regressions) == 0:
+            print('No regressions against', args.baseline)
+        else:
+            print('REGRESSIONS against', args.baseline)
+            for (key, reasons) in regressions:
+                print('  %s m=%d %s: %s' % (key[0], key[1], key[2],
+                    '; '.join(reasons)))
+            sys.exit(1)
@@ -0,0 +1,191 @@
+import time
+import numpy as np
+import numpy.linalg as npla
+import scipy.sparse as sp
+import scipy.linalg as la
+from scipy.linalg.blas import dgemm
+from Tab import Tab
+from FusedKernels import csrMatmat
+
+# Restarted, right-preconditioned block GMRES for A X = B with p right-hand
+# sides (the columns of B).
+#
+# Each iteration extends the block Krylov space by A M^{-1} V_j for a whole
+# n by p block V_j: one sparse-matrix times dense-block product (a single
+# pass over A, through FusedKernels.csrMatmat), one block preconditioner
+# application (applyRightBlock; ILU does all columns in one triangular
+# solve), block Gram-Schmidt with matrix-matrix products (BLAS-3) and a
+# thin QR of the new block by Cholesky QR, done twice, which is BLAS-3 as
+# well. Compared with p separate GMRES solves, A and the preconditioner
+# factors are read once per iteration instead of p times, and the shared
+# Krylov space usually needs fewer iterations than the slowest single
+# right-hand side.
+#
+# The basis is a preallocated n by (restart+1)*p array in column-major
+# order, block j in columns j*p to (j+1)*p, so orthogonalizing against all
+# earlier blocks is two matrix-matrix products on a contiguous slice. The
+# sweep is repeated only when some column loses more than 30% of its norm.
+# Memory is p times that of GMRES(restart).
+#
+# The block Hessenberg matrix Hbar is reduced to triangular form as it
+# grows, by a 2p by 2p orthogonal factor per block column (the block
+# analogue of the Givens rotations in GMRES.py), which gives the residual
+# norm of every column of the least-squares problem min |E_1 S - Hbar Y|_F
+# at O(j p^3) cost per iteration; the iteration stops when each column has
+# converged relative to its own right-hand side. Rank deficiency (e.g., a
+# column that has already converged) is harmless: the QR of the block
+# falls back to Householder and still returns an orthonormal block.
+#
+# Iterations are block iterations; each costs p matrix-vector products.
+class BlockGMRESSolver:
+    def __init__(self,
+                restart=30,             # block iterations per cycle
+                verb=0):                # 1: summary, 2: every iteration
+
+        self.restart = restart
+        self.verb = verb
+        self.V = None
+
+    def __str__(self):
+        return 'BlockGMRES(%d)' % self.restart
+
+    # Workspace for s+1 blocks of n by p, side by side
+    def workspace(self, n, p, s):
+        if self.V is None or self.V.shape != (n, (s+1)*p):
+            self.V = np.empty((n, (s+1)*p), order='F')
+            self.H = np.zeros(((s+1)*p, s*p))
+            self.g = np.zeros(((s+1)*p, p))
+            self.G = [None]*s
+            self.Z = np.empty((n, p))
+
+    # Solve A X = B to relative residual tol in each column. B may also be
+    # a single vector. Returns (conv, iters, X).
+    def solve(self, A, B, maxiters=500, tol=1.0e-8, precond=None, X0=None):
+        vector = (B.ndim == 1)
+        B = np.array(B, dtype=np.double, ndmin=2, order='C')
+        if vector:
+            B = B.T.copy()
+        (n, p) = B.shape
+        s = max(1, min(self.restart, maxiters))
+        self.workspace(n, p, s)
+        (V, H, g, G, Z) = (self.V, self.H, self.g, self.G, self.Z)
+        self.resids = []
+        self.iterTimes = []
+
+        if sp.issparse(A) and A.format == 'csr' and A.dtype == np.double:
+            matmat = lambda Y, out: csrMatmat(A, np.ascontiguousarray(Y), out)
+        else:
+            def matmat(Y, out):
+                out[:] = A.dot(Y)
+                return out
+        if precond is None:
+            applyPrec = lambda Y: Y
+        elif hasattr(precond, 'applyRightBlock'):
+            applyPrec = precond.applyRightBlock
+        else:
+            applyPrec = lambda Y: np.column_stack([precond.applyRight(Y[:,i])
+                for i in range(Y.shape[1])])
+
+        if X0 is None:
+            X = np.zeros((n, p))
+            R = B.copy()
+        else:
+            X = np.array(X0, dtype=np.double, ndmin=2, order='C')
+            if vector:
+                X = X.T.copy()
+            R = B - matmat(X, Z)
+        bNorms = npla.norm(B, axis=0)
+        targets = tol*bNorms
+        colResids = npla.norm(R, axis=0)
+
+        iters = 0
+        conv = bool(np.all(colResids <= targets))
+        while not conv and iters < maxiters:
+            (V[:, :p], S) = thinQR(R)
+            H.fill(0.0)
+            g.fill(0.0)
+            g[:p] = S
+
+            j = 0
+            while True:
+                t0 = time.perf_counter()
+                W = V[:, (j+1)*p:(j+2)*p]
+                W[:] = matmat(applyPrec(np.ascontiguousarray(V[:, j*p:(j+1)*p])),
+                    Z)
+
+                # Block classical Gram-Schmidt against all earlier blocks at
+                # once, repeated if some column lost most of its norm. The
+                # update is a dgemm straight into the basis.
+                Vj = V[:, :(j+1)*p]
+                Hcol = H[:(j+1)*p, j*p:(j+1)*p]
+                for sweep in range(2):
+                    wNorms = npla.norm(W, axis=0)
+                    C = Vj.T.dot(W)
+                    dgemm(-1.0, Vj, C, 1.0, W, overwrite_c=True)
+                    Hcol += C
+                    if np.all(npla.norm(W, axis=0) > 0.7*wNorms):
+                        break
+                (W[:], H[(j+1)*p:(j+2)*p, j*p:(j+1)*p]) = thinQR(W)
+
+                # Bring the new block column of Hbar to upper triangular
+                # form: the earlier 2p by 2p orthogonal factors, then a QR
+                # of its last 2p rows. The same factors applied to E_1 S
+                # give every column's residual norm.
+                Hc = H[:(j+2)*p, j*p:(j+1)*p]
+                for i in range(j):
+                    Hc[i*p:(i+2)*p] = G[i].T.dot(Hc[i*p:(i+2)*p])
+                (G[j], Hc[j*p:(j+2)*p]) = la.qr(Hc[j*p:(j+2)*p])
+                g[j*p:(j+2)*p] = G[j].T.dot(g[j*p:(j+2)*p])
+                colResids = npla.norm(g[(j+1)*p:(j+2)*p], axis=0)
+
+                iters += 1
+                self.resids.append(colResids.copy())
+                self.iterTimes.append(time.perf_counter() - t0)
+                if self.verb>1:
+                    tab0 = Tab()
+                    print(tab0, 'Block GMRES iter %4d max resid/|b|=%12.5g' %
+                        (iters, np.max(colResids/np.where(bNorms > 0.0,
+                        bNorms, 1.0))))
+
+                j += 1
+                if (np.all(colResids <= targets) or j == s
+                        or iters >= maxiters):
+                    break
+
+            # X += M^{-1} V_j Y, with Y from the triangular factor
+            Y = la.solve_triangular(H[:j*p, :j*p], g[:j*p])
+            np.dot(V[:, :j*p], Y, out=Z)
+            X += applyPrec(Z)
+
+            if np.all(colResids <= targets):
+                conv = True
+            elif iters < maxiters:
+                R = B - matmat(X, Z)
+                colResids = npla.norm(R, axis=0)
+                conv = bool(np.all(colResids <= targets))
+
+        if self.verb>0:
+            tab0 = Tab()
+            print(tab0, '%s: conv=%s, p=%d, iters=%d, max rel resid=%12.5g' %
+                (self, conv, p, iters, np.max(colResids/np.where(bNorms > 0.0,
+                bNorms, 1.0))))
+        if vector:
+            X = X[:,0]
+        return (conv, iters, X)
+
+
+# Q R = W with orthonormal Q (n by p) by Cholesky QR, twice. Householder
+# QR is used instead when W is too ill conditioned for the Cholesky factor
+# of W^T W to be accurate, e.g., when a column has already converged.
+def thinQR(W):
+    try:
+        R1 = la.cholesky(W.T.dot(W))
+    except la.LinAlgError:
+        return npla.qr(W)
+    d = np.abs(np.diag(R1))
+    if d.min() <= 1.0e-6*d.max():
+        return npla.qr(W)
+    Q = la.solve_triangular(R1, W.T, trans='T').T
+    R2 = la.cholesky(Q.T.dot(Q))
+    Q = la.solve_triangular(R2, Q.T, trans='T').T
+    return (Q, R2.dot(R1))
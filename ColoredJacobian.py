@@ -0,0 +1,193 @@
+import numpy as np
+import scipy.sparse as sp
+from NewtonFDDeriv import FDDifferentiator
+from NonlinearProblem import unionPattern, entryRows
+from FDLaplacianND import FDLaplacianND
+from FDCentralDiff1D import FDCentralDiff1D
+
+# Sparse Jacobians by finite differences with column coloring (A. R. Curtis,
+# M. J. D. Powell and J. K. Reid, On the estimation of sparse Jacobian
+# matrices, J. Inst. Maths. Applics. 13, 1974).
+#
+# Columns that have no row in common can be perturbed together: F(u + h d)
+# with d nonzero on a whole group of such columns gives every one of their
+# entries at once, since each row of J d has at most one contribution from
+# the group. A coloring of the column intersection graph splits the
+# columns into such groups; a tridiagonal pattern needs 3 and the 2D
+# five-point stencil 5, whatever the grid size, so a Jacobian costs that
+# many residual evaluations (per stencil point) instead of one per
+# unknown.
+
+
+# Greedy coloring of the columns of a sparsity pattern so that no two
+# columns of the same color share a row. Returns an array of colors
+# 0, 1, ..., numColors-1, one per column.
+def colorColumns(pattern):
+    P = sp.csr_matrix(pattern, copy=True)
+    P.data[:] = 1.0
+    C = (P.T*P).tocsr()
+    n = C.shape[1]
+    colors = -np.ones(n, dtype=np.int64)
+    for j in range(n):
+        taken = colors[C.indices[C.indptr[j]:C.indptr[j+1]]]
+        free = np.ones(len(taken)+1, dtype=bool)
+        free[taken[(taken >= 0) & (taken <= len(taken))]] = False
+        colors[j] = np.argmax(free)
+    return colors
+
+
+# Coloring of the unknowns of an m^dim grid, numbered as in FDLaplacianND,
+# by sum_d (d+1)*x_d mod 2*dim+1: 3 colors in 1D, 5 in 2D, 7 in 3D. It is
+# valid for the Laplacian's stencil (and the 1D central difference), where
+# greedy coloring needs 7 colors in 2D.
+def gridColoring(m, dim):
+    k = np.arange(m**dim)
+    c = sum((d+1)*((k // m**d) % m) for d in range(dim))
+    return c % (2*dim + 1)
+
+
+# Whether no two columns of the same color share a row of the pattern
+def validColoring(pattern, colors):
+    key = entryRows(pattern)*(colors.max()+1) + colors[pattern.indices]
+    return len(np.unique(key)) == pattern.nnz
+
+
+# Coloring for func's Jacobian pattern: gridColoring() for grid problems
+# (with m and dim) when it is valid and beats the greedy coloring,
+# otherwise colorColumns()
+def problemColoring(func, pattern):
+    colors = colorColumns(pattern)
+    if hasattr(func, 'm') and hasattr(func, 'dim') \
+            and func.m**func.dim == pattern.shape[1]:
+        gridColors = gridColoring(func.m, func.dim)
+        if gridColors.max() < colors.max() \
+                and validColoring(pattern, gridColors):
+            return gridColors
+    return colors
+
+
+# Jacobian pattern of an FD discretization on an m^dim grid: the
+# Laplacian's stencil, plus the central first difference in 1D if
+# convection is True (as in Burgers). Canonical CSR, diagonal included.
+def stencilPattern(m, dim, convection=False):
+    mats = [FDLaplacianND(-1.0, 1.0, m, dim)]
+    if convection:
+        if dim != 1:
+            raise ValueError('convection pattern only for dim=1, not %d' % dim)
+        mats.append(FDCentralDiff1D(-1.0, 1.0, m))
+    return unionPattern(*mats)
+
+
+# A problem whose evalJ() is a colored FD Jacobian of its evalF(), for
+# problems that only provide a residual, or to check an analytic Jacobian.
+# Everything else is the wrapped problem's, so it can be passed to
+# NewtonKrylov (or NewtonDirect) in place of func.
+#
+# The pattern defaults to func.pattern, colored by problemColoring(). The
+# stencil and step come from an FDDifferentiator: column j is perturbed by
+# dx_i*(1+|u_j|) for each stencil offset dx_i, the per-column analogue of
+# the scaling in FDDifferentiator.dirDeriv(). A caller that has F(u) can
+# pass it to evalJ() as F0, and with the default one-sided stencil the
+# Jacobian then costs numColors residual evaluations. numResidEvals counts
+# the ones made for Jacobians, and lastEvals those of the last evalJ().
+class ColoredFDJacobian:
+    def __init__(self, func, pattern=None, diff=None):
+        self.func = func
+        if pattern is None:
+            pattern = func.pattern
+        self.pattern = sp.csr_matrix(pattern)
+        self.pattern.sort_indices()
+        if diff is None:
+            diff = FDDifferentiator(1)
+        self.diff = diff
+        self.colors = problemColoring(func, self.pattern)
+        self.numColors = int(self.colors.max()) + 1
+        self.rows = entryRows(self.pattern)
+        self.entryColors = self.colors[self.pattern.indices]
+        self.numResidEvals = 0
+        self.lastEvals = 0
+
+    def __getattr__(self, name):
+        return getattr(self.func, name)
+
+    def __str__(self):
+        return 'ColoredFDJacobian(%d colors, %s)' % (self.numColors, self.diff)
+
+    def newJ(self):
+        J = self.pattern.copy()
+        J.data[:] = 0.0
+        return J
+
+    def evalF(self, u, out=None):
+        return self.func.evalF(u, out=out)
+
+    def evalJ(self, u, J_out=None, F0=None):
+        if J_out is None:
+            J_out = self.newJ()
+
+        # J d_c for each color c, with d_c the scaled indicator of the
+        # columns of color c
+        n = len(u)
+        scale = 1.0 + np.abs(u)
+        JD = np.zeros((n, self.numColors))
+        evals = 0
+        for c in range(self.numColors):
+            d = np.where(self.colors == c, scale, 0.0)
+            for (dx_i, w_i) in zip(self.diff.dx, self.diff.w):
+                if dx_i == 0.0:
+                    if F0 is None:
+                        F0 = self.func.evalF(u)
+                        evals += 1
+                    JD[:,c] += w_i*F0
+                else:
+                    JD[:,c] += w_i*self.func.evalF(u + dx_i*d)
+                    evals += 1
+
+        # Entry (i,j) is row i of J d_{color(j)}, divided by the scaling
+        # of column j
+        J_out.data[:] = JD[self.rows, self.entryColors]
+        J_out.data /= scale[self.pattern.indices]
+        self.numResidEvals += evals
+        self.lastEvals = evals
+        return J_out
+
+
+if __name__=='__main__':
+
+    import argparse
+    import time
+    import scipy.sparse.linalg as spla
+    from FDBratu2D import FDBratu2D
+    from FDBurgers1D import FDBurgers1D
+    from NewtonKrylov import NewtonKrylov
+    parser = argparse.ArgumentParser(description='Colored FD Jacobians')
+    parser.add_argument('--m1', type=int, default=2000)
+    parser.add_argument('--m2', type=int, default=100)
+    parser.add_argument('--order', type=int, default=1)
+    args = parser.parse_args()
+
+    diff = FDDifferentiator(args.order)
+    for (name, func, pattern) in [
+            ('burgers1d', FDBurgers1D(m=args.m1),
+                stencilPattern(args.m1, 1, convection=True)),
+            ('bratu2d', FDBratu2D(m=args.m2, alpha=1.0),
+                stencilPattern(args.m2, 2))]:
+        fd = ColoredFDJacobian(func, pattern=pattern, diff=diff)
+        u = 0.1*np.sin(np.arange(func.numUnknowns()))
+        F0 = fd.evalF(u)
+        t0 = time.perf_counter()
+        J = fd.evalJ(u, F0=F0)
+        elapsed = time.perf_counter() - t0
+        Jex = func.evalJ(u)
+        err = spla.norm(J - Jex)/spla.norm(Jex)
+        print('%s: n=%d, %d colors, %d residual evaluations (%.3g s), '
+            'relative error %.3g' % (name, func.numUnknowns(), fd.numColors,
+            fd.lastEvals, elapsed, err))
+
+        solver = NewtonKrylov(tau_r=1.0e-10, tau_a=1.0e-12, verb=0, linVerb=0,
+            fdJacobian=True, jfnkOrder=args.order)
+        (conv, uFD) = solver.solve(func, func.initialU())
+        print('  Newton-Krylov with colored FD Jacobian: conv=%s, %d Newton, '
+            '%d Krylov, %d residual evaluations' % (conv,
+            solver.history.numSteps(), solver.totalKrylovIters,
+            solver.numResidEvals))
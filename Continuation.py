@@ -0,0 +1,481 @@
+import numpy as np
+import numpy.linalg as npla
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+from Tab import Tab
+from BasicPreconditioner import ILURightPreconditioner
+from GMRES import GMRES
+from PreconditionerManager import PreconditionerManager
+from DirectSolvers import makeDirectSolver
+from NewtonDirect import NewtonDirect
+from NewtonKrylov import NewtonKrylov
+from FDBratu1D import FDBratu1D
+from FDBratu2D import FDBratu2D
+from FDBurgers1D import FDBurgers1D
+
+# Continuation methods for tracing solution branches u(lambda) of
+# F(u; lambda) = 0, where lambda is the problem's parameter (func.paramName,
+# e.g. alpha for Bratu or beta for Burgers) and dF/dlambda is
+# func.evalFParam(u).
+#
+# NaturalContinuation steps lambda directly and corrects with a Newton
+# solver (NewtonDirect or NewtonKrylov), warm-started from a secant or
+# tangent predictor. It can't pass a turning point.
+#
+# ArclengthContinuation parametrizes the branch by (pseudo-)arclength s and
+# corrects with Newton's method on the bordered system
+#
+#   [ J           F_lambda ] [du     ]     [ F ]
+#   [ theta*t_u^T t_lambda ] [dlambda] = - [ N ]
+#
+# where (t_u, t_lambda) is the unit tangent at the last point, theta=1/n
+# weights the u part so that the norm doesn't grow with the grid, and
+# N = theta*t_u.(u-u_k) + t_lambda*(lambda-lambda_k) - ds. The bordered
+# matrix stays nonsingular at simple turning points, which are detected as
+# sign changes of t_lambda.
+#
+# Both adapt the step: it grows by a factor grow after a corrector that
+# took at most fastIters iterations and shrinks by a factor shrink after a
+# failed one.
+
+
+# The points of a traced branch
+class ContinuationBranch:
+    def __init__(self, paramName):
+        self.paramName = paramName
+        self.param = []
+        self.uNorm = []
+        self.uMax = []
+        self.newtonIters = []
+        self.krylovIters = []
+        self.step = []
+        self.solutions = []
+        self.turningPoints = []
+
+    def numPoints(self):
+        return len(self.param)
+
+    def record(self, lam, u, newtonIters, krylovIters, step, keepSolution):
+        self.param.append(lam)
+        self.uNorm.append(npla.norm(u)/np.sqrt(len(u)))
+        self.uMax.append(npla.norm(u, np.inf))
+        self.newtonIters.append(newtonIters)
+        self.krylovIters.append(krylovIters)
+        self.step.append(step)
+        if keepSolution:
+            self.solutions.append(u.copy())
+
+    def totalNewtonIters(self):
+        return int(np.sum(self.newtonIters))
+
+    def asDict(self):
+        return {'param' : np.array(self.param),
+            'uNorm' : np.array(self.uNorm),
+            'uMax' : np.array(self.uMax),
+            'newtonIters' : np.array(self.newtonIters),
+            'krylovIters' : np.array(self.krylovIters),
+            'step' : np.array(self.step)}
+
+    def writeCSV(self, filename):
+        data = self.asDict()
+        fields = list(data.keys())
+        cols = np.column_stack([data[f] for f in fields])
+        np.savetxt(filename, cols, delimiter=',', header=','.join(fields),
+            comments='')
+
+
+def getParam(func):
+    return getattr(func, func.paramName)
+
+
+def setParam(func, lam):
+    setattr(func, func.paramName, lam)
+
+
+def printPointHeader(tab, paramName):
+    print(tab, '%6s %14s %14s %8s %8s %12s' % ('point', paramName, '|u|_inf',
+        'newton', 'krylov', 'step'))
+
+
+def printPoint(tab, branch, k):
+    print(tab, '%6d %14.8g %14.8g %8d %8d %12.5g' % (k, branch.param[k],
+        branch.uMax[k], branch.newtonIters[k], branch.krylovIters[k],
+        branch.step[k]))
+
+
+class NaturalContinuation:
+    def __init__(self, solver,
+                step=0.1,               # initial parameter step
+                minStep=1.0e-4,         # give up below this step
+                maxStep=1.0,            # largest parameter step
+                grow=1.5,               # step growth after a fast solve
+                shrink=0.5,             # step reduction after a failure
+                fastIters=3,            # "fast" corrector iteration count
+                predictor='secant',     # 'constant', 'secant' or 'tangent'
+                maxPoints=200,          # maximum points on the branch
+                keepSolutions=False,    # store u at every point
+                verb=1):                # verbosity
+
+        if predictor not in ('constant', 'secant', 'tangent'):
+            raise ValueError('unknown predictor: %s' % predictor)
+        self.solver = solver
+        self.step = step
+        self.minStep = minStep
+        self.maxStep = maxStep
+        self.grow = grow
+        self.shrink = shrink
+        self.fastIters = fastIters
+        self.predictor = predictor
+        self.maxPoints = maxPoints
+        self.keepSolutions = keepSolutions
+        self.verb = verb
+
+    # du/dlambda = -J^{-1} F_lambda at a solution
+    def tangent(self, func, u):
+        J = func.evalJ(u)
+        solver = makeDirectSolver('auto', J)
+        solver.factor(J)
+        return solver.solve(-func.evalFParam(u))
+
+    def correct(self, func, u, solveOpts):
+        solver = self.solver
+        (conv, u) = solver.solve(func, u, **solveOpts)
+        krylovIters = getattr(solver, 'totalKrylovIters', 0)
+        return (conv, u, solver.history.numIters - 1, krylovIters)
+
+    # Trace the branch from the solution near u0 at lam0 (default: the
+    # problem's current parameter) to lamEnd
+    def trace(self, func, u0, lamEnd, lam0=None):
+        tab0 = Tab()
+        if lam0 is not None:
+            setParam(func, lam0)
+        lam = getParam(func)
+        branch = ContinuationBranch(func.paramName)
+
+        # A NewtonKrylov corrector shares one preconditioner manager over
+        # the whole branch, so preconditioners built at one parameter are
+        # reused at the next as long as the manager's policy allows
+        solveOpts = {}
+        if isinstance(self.solver, NewtonKrylov):
+            self.precManager = self.solver.makePrecManager(func)
+            solveOpts['precManager'] = self.precManager
+
+        (conv, u, iters, kIters) = self.correct(func, u0, solveOpts)
+        if not conv:
+            if self.verb>0:
+                print(tab0, 'Continuation: no solution at the start point')
+            return branch
+        branch.record(lam, u, iters, kIters, 0.0, self.keepSolutions)
+        if self.verb>0:
+            printPointHeader(tab0, func.paramName)
+            printPoint(tab0, branch, 0)
+
+        direction = np.sign(lamEnd - lam)
+        step = direction*self.step
+        uPrev = None
+        stepPrev = None
+
+        while branch.numPoints() < self.maxPoints and lam != lamEnd:
+            if abs(lamEnd - lam) < abs(step):
+                step = lamEnd - lam
+
+            # Predict the solution at the new parameter
+            if self.predictor == 'tangent':
+                uPred = u + step*self.tangent(func, u)
+            elif self.predictor == 'secant' and uPrev is not None:
+                uPred = u + (step/stepPrev)*(u - uPrev)
+            else:
+                uPred = u
+
+            setParam(func, lam + step)
+            (conv, uNew, iters, kIters) = self.correct(func, uPred, solveOpts)
+            if not conv:
+                setParam(func, lam)
+                step *= self.shrink
+                if abs(step) < self.minStep:
+                    if self.verb>0:
+                        print(tab0, 'Continuation: step too small at %s=%g '
+                            '(turning point?)' % (func.paramName, lam))
+                    break
+                continue
+
+            (uPrev, u) = (u, uNew)
+            stepPrev = step
+            lam = lam + step
+            branch.record(lam, u, iters, kIters, step, self.keepSolutions)
+            if self.verb>0:
+                printPoint(tab0, branch, branch.numPoints()-1)
+
+            if iters <= self.fastIters:
+                step = direction*min(abs(step)*self.grow, self.maxStep)
+
+        return branch
+
+
+# Right preconditioner for the bordered system: a preconditioner for J on
+# the u block and the identity on the lambda entry
+class BorderedPreconditioner:
+    def __init__(self, precond, n):
+        self.precond = precond
+        self.n = n
+
+    def applyRight(self, vec):
+        vec = np.ravel(vec)
+        y = vec.astype(np.double)
+        y[:self.n] = self.precond.applyRight(vec[:self.n])
+        return y
+
+    def applyLeft(self, vec):
+        return vec
+
+
+class ArclengthContinuation:
+    def __init__(self,
+                ds=0.1,                 # initial arclength step
+                minStep=1.0e-6,         # give up below this step
+                maxStep=1.0,            # largest arclength step
+                grow=1.5,               # step growth after a fast solve
+                shrink=0.5,             # step reduction after a failure
+                fastIters=3,            # "fast" corrector iteration count
+                maxIters=10,            # corrector iterations per point
+                tau=1.0e-8,             # corrector tolerance on |(F,N)|
+                linSolver='direct',     # bordered solves: 'direct' or 'gmres'
+                precPolicy='adaptive',  # gmres: preconditioner policy
+                precBuilder=None,       # gmres: J -> preconditioner
+                maxLinIters=200,        # gmres: max iterations
+                linTol=1.0e-10,         # gmres: relative tolerance
+                maxPoints=200,          # maximum points on the branch
+                maxNorm=np.inf,         # stop when |u|_inf exceeds this
+                keepSolutions=False,    # store u at every point
+                verb=1):                # verbosity
+
+        if linSolver not in ('direct', 'gmres'):
+            raise ValueError('unknown bordered solver: %s' % linSolver)
+        self.ds = ds
+        self.minStep = minStep
+        self.maxStep = maxStep
+        self.grow = grow
+        self.shrink = shrink
+        self.fastIters = fastIters
+        self.maxIters = maxIters
+        self.tau = tau
+        self.linSolver = linSolver
+        if precBuilder is None:
+            precBuilder = lambda J: ILURightPreconditioner(J)
+        self.precManager = PreconditionerManager(precBuilder, policy=precPolicy)
+        self.maxLinIters = maxLinIters
+        self.linTol = linTol
+        self.maxPoints = maxPoints
+        self.maxNorm = maxNorm
+        self.keepSolutions = keepSolutions
+        self.verb = verb
+
+    # Solve the bordered system with rows [J, Fl; row, corner] for rhs.
+    # Returns (conv, x, krylovIters).
+    def solveBordered(self, J, Fl, row, corner, rhs, u):
+        n = J.shape[0]
+        if self.linSolver == 'direct':
+            M = sp.bmat([[J, sp.csr_matrix(Fl.reshape(n, 1))],
+                [sp.csr_matrix(row.reshape(1, n)),
+                sp.csr_matrix([[corner]])]], format='csc')
+            return (True, spla.spsolve(M, rhs), 0)
+
+        def matvec(v):
+            v = np.ravel(v)
+            y = np.empty(n+1)
+            y[:n] = J*v[:n] + Fl*v[n]
+            y[n] = np.dot(row, v[:n]) + corner*v[n]
+            return y
+        M = spla.LinearOperator((n+1, n+1), matvec=matvec, dtype=np.double)
+
+        mgr = self.precManager
+        if mgr.needsRebuild(u):
+            mgr.build(J, u)
+        prec = BorderedPreconditioner(mgr.get(), n)
+        (conv, iters, x) = GMRES(M, rhs, maxiters=self.maxLinIters,
+            tol=self.linTol, verb=0, precond=prec)
+        mgr.update(iters, self.linTol, conv)
+        return (conv, x, iters)
+
+    # Unit tangent (in the theta-weighted norm) at a solution, oriented to
+    # continue in the direction of the previous tangent tPrev
+    def tangent(self, func, u, tPrev):
+        n = len(u)
+        theta = 1.0/n
+        J = func.evalJ(u)
+        Fl = func.evalFParam(u)
+        rhs = np.zeros(n+1)
+        rhs[n] = 1.0
+        (conv, z, iters) = self.solveBordered(J, Fl, theta*tPrev[:n],
+            tPrev[n], rhs, u)
+        z /= np.sqrt(theta*np.dot(z[:n], z[:n]) + z[n]**2)
+        return (z, iters)
+
+    # Newton's method on the bordered system, from the predicted point
+    def correct(self, func, x, xk, t, ds):
+        n = len(x) - 1
+        theta = 1.0/n
+        krylovIters = 0
+        for i in range(self.maxIters+1):
+            setParam(func, x[n])
+            F = func.evalF(x[:n])
+            dx = x - xk
+            N = theta*np.dot(t[:n], dx[:n]) + t[n]*dx[n] - ds
+            res = np.sqrt(npla.norm(F)**2 + N**2)
+            if res <= self.tau:
+                return (True, x, i, krylovIters)
+            if i == self.maxIters or not np.isfinite(res):
+                break
+
+            J = func.evalJ(x[:n])
+            Fl = func.evalFParam(x[:n])
+            (conv, step, iters) = self.solveBordered(J, Fl, theta*t[:n], t[n],
+                -np.append(F, N), x[:n])
+            krylovIters += iters
+            if not conv:
+                break
+            x = x + step
+        return (False, x, i, krylovIters)
+
+    # Trace the branch through the solution near u0 at lam0 (default: the
+    # problem's current parameter), starting in the direction of increasing
+    # (direction=1) or decreasing (direction=-1) parameter, until the
+    # parameter leaves paramBounds
+    def trace(self, func, u0, paramBounds, lam0=None, direction=1):
+        tab0 = Tab()
+        if lam0 is not None:
+            setParam(func, lam0)
+        lam = getParam(func)
+        (lo, hi) = paramBounds
+        branch = ContinuationBranch(func.paramName)
+        self.precManager.reset()
+
+        newton = NewtonDirect(tau_r=0.0, tau_a=self.tau, verb=0)
+        (conv, u) = newton.solve(func, u0)
+        if not conv:
+            if self.verb>0:
+                print(tab0, 'Continuation: no solution at the start point')
+            return branch
+        branch.record(lam, u, newton.history.numIters-1, 0, 0.0,
+            self.keepSolutions)
+        if self.verb>0:
+            printPointHeader(tab0, func.paramName)
+            printPoint(tab0, branch, 0)
+
+        n = len(u)
+        tPrev = np.zeros(n+1)
+        tPrev[n] = direction
+        (t, iters) = self.tangent(func, u, tPrev)
+        x = np.append(u, lam)
+        ds = self.ds
+
+        while branch.numPoints() < self.maxPoints:
+            xPred = x + ds*t
+            (conv, xNew, iters, kIters) = self.correct(func, xPred, x, t, ds)
+            if not conv:
+                ds *= self.shrink
+                if ds < self.minStep:
+                    if self.verb>0:
+                        print(tab0, 'Continuation: step too small at %s=%g'
+                            % (func.paramName, x[n]))
+                    break
+                continue
+
+            (tNew, tIters) = self.tangent(func, xNew[:n], t)
+            if np.sign(tNew[n]) != np.sign(t[n]):
+                branch.turningPoints.append(branch.numPoints())
+                if self.verb>0:
+                    print(tab0, 'Turning point near %s=%.8g' %
+                        (func.paramName, xNew[n]))
+            x = xNew
+            t = tNew
+            branch.record(x[n], x[:n], iters, kIters + tIters, ds,
+                self.keepSolutions)
+            if self.verb>0:
+                printPoint(tab0, branch, branch.numPoints()-1)
+
+            if x[n] < lo or x[n] > hi or branch.uMax[-1] > self.maxNorm:
+                break
+            if iters <= self.fastIters:
+                ds = min(ds*self.grow, self.maxStep)
+
+        setParam(func, x[n])
+        return branch
+
+
+if __name__=='__main__':
+
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description='Continuation')
+    parser.add_argument('--problem', default='bratu2d',
+        choices=['bratu1d', 'bratu2d', 'burgers1d'])
+    parser.add_argument('--m', type=int, default=32)
+    parser.add_argument('--method', default='arclength',
+        choices=['natural', 'arclength'])
+    parser.add_argument('--lam0', type=float, default=None)
+    parser.add_argument('--lamEnd', type=float, default=None,
+        help='natural: final parameter; arclength: parameter bound')
+    parser.add_argument('--step', type=float, default=0.1)
+    parser.add_argument('--maxStep', type=float, default=1.0)
+    parser.add_argument('--predictor', default='secant',
+        choices=['constant', 'secant', 'tangent'])
+    parser.add_argument('--solver', default='direct', choices=['direct', 'nk'])
+    parser.add_argument('--linSolver', default='direct',
+        choices=['direct', 'gmres'])
+    parser.add_argument('--maxPoints', type=int, default=100)
+    parser.add_argument('--maxNorm', type=float, default=20.0)
+    parser.add_argument('--tau', type=float, default=1.0e-8,
+        help='absolute residual tolerance of the corrector')
+    parser.add_argument('--csv', default=None)
+    args = parser.parse_args()
+
+    # The Bratu problems have a fold at positive alpha in 1D (u''=alpha
+    # exp(-u)) and at negative alpha in 2D (-Laplacian(u)=alpha exp(-u)),
+    # so by default the branch is traced from the trivial solution at
+    # alpha=0 towards the fold. Burgers is continued in beta from a mildly
+    # nonlinear start.
+    if args.problem == 'burgers1d':
+        func = FDBurgers1D(m=args.m, beta=1.0)
+        (lam0, lamEnd) = (1.0, 1000.0)
+    elif args.problem == 'bratu1d':
+        func = FDBratu1D(m=args.m, alpha=0.0)
+        (lam0, lamEnd) = (0.0, 4.0)
+    else:
+        func = FDBratu2D(m=args.m, alpha=0.0)
+        (lam0, lamEnd) = (0.0, -4.0)
+    if args.lam0 is not None:
+        lam0 = args.lam0
+    if args.lamEnd is not None:
+        lamEnd = args.lamEnd
+    setParam(func, lam0)
+    u0 = np.zeros(func.numUnknowns())
+
+    t0 = time.perf_counter()
+    if args.method == 'natural':
+        if args.solver == 'nk':
+            solver = NewtonKrylov(tau_r=0.0, tau_a=args.tau,
+                precPolicy='adaptive', verb=0, linVerb=0)
+        else:
+            solver = NewtonDirect(tau_r=0.0, tau_a=args.tau, verb=0)
+        cont = NaturalContinuation(solver, step=args.step,
+            maxStep=args.maxStep, predictor=args.predictor,
+            maxPoints=args.maxPoints)
+        branch = cont.trace(func, u0, lamEnd)
+    else:
+        cont = ArclengthContinuation(ds=args.step, maxStep=args.maxStep,
+            tau=args.tau, linSolver=args.linSolver, maxPoints=args.maxPoints,
+            maxNorm=args.maxNorm)
+        bounds = (min(lam0, lamEnd), max(lam0, lamEnd))
+        branch = cont.trace(func, u0, bounds,
+            direction=np.sign(lamEnd - lam0))
+    elapsed = time.perf_counter() - t0
+
+    print('%d points, %d Newton iterations (%.3g per point), %.4g s' % (
+        branch.numPoints(), branch.totalNewtonIters(),
+        branch.totalNewtonIters()/max(branch.numPoints(), 1), elapsed))
+    if len(branch.turningPoints) > 0:
+        print('turning points at %s=%s' % (branch.paramName,
+            [branch.param[k] for k in branch.turningPoints]))
+    if args.csv is not None:
+        branch.writeCSV(args.csv)
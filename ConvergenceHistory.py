@@ -0,0 +1,99 @@
+import time
+import numpy as np
+
+# Per-iteration record of a nonlinear solve, stored in preallocated arrays.
+#
+# Row i describes iterate i: the residual norm there, and the step taken
+# from it (step norm, linear solver tolerance and Krylov iterations,
+# line-search backtracks). wallTime is the time since start(), stamped on
+# every record() call.
+#
+# Output goes to optional sinks, called with (history, i) whenever a row
+# is emitted. With verb>0 a ConsolePrinter is attached; with verb=0 and no
+# other sinks, emit() does no formatting at all.
+class ConvergenceHistory:
+    fields = ('residNorm', 'stepNorm', 'linTol', 'krylovIters', 'backtracks',
+        'wallTime')
+
+    def __init__(self, maxIters, verb=0, linVerb=0, sinks=None, prefix=''):
+        self.maxIters = maxIters
+        n = maxIters + 1
+        self.residNorm = np.full(n, np.nan)
+        self.stepNorm = np.full(n, np.nan)
+        self.linTol = np.full(n, np.nan)
+        self.krylovIters = np.zeros(n, dtype=np.int64)
+        self.backtracks = np.zeros(n, dtype=np.int64)
+        self.wallTime = np.full(n, np.nan)
+
+        self.sinks = [] if sinks is None else list(sinks)
+        if verb>0:
+            self.sinks.append(ConsolePrinter(linVerb=linVerb, prefix=prefix))
+
+        self.start()
+
+    def start(self):
+        self.numIters = 0
+        self.t0 = time.perf_counter()
+
+    # Store any subset of the fields for row i
+    def record(self, i, residNorm=None, stepNorm=None, linTol=None,
+                krylovIters=None, backtracks=None):
+        if residNorm is not None:
+            self.residNorm[i] = residNorm
+        if stepNorm is not None:
+            self.stepNorm[i] = stepNorm
+        if linTol is not None:
+            self.linTol[i] = linTol
+        if krylovIters is not None:
+            self.krylovIters[i] = krylovIters
+        if backtracks is not None:
+            self.backtracks[i] = backtracks
+        self.wallTime[i] = time.perf_counter() - self.t0
+        if i >= self.numIters:
+            self.numIters = i+1
+
+    # Pass row i to the sinks
+    def emit(self, i):
+        for sink in self.sinks:
+            sink(self, i)
+
+    # Number of Newton steps taken (rows with a recorded step)
+    def numSteps(self):
+        return int(np.count_nonzero(~np.isnan(self.stepNorm[:self.numIters])))
+
+    def totalKrylovIters(self):
+        return int(self.krylovIters[:self.numIters].sum())
+
+    def totalBacktracks(self):
+        return int(self.backtracks[:self.numIters].sum())
+
+    # The recorded rows as a dict of arrays
+    def asDict(self):
+        n = self.numIters
+        return {f : getattr(self, f)[:n].copy() for f in self.fields}
+
+    def writeCSV(self, filename):
+        data = self.asDict()
+        cols = np.column_stack([data[f] for f in self.fields])
+        np.savetxt(filename, cols, delimiter=',', header=','.join(self.fields),
+            comments='')
+
+
+# Sink that prints each emitted row. Krylov information is shown when
+# linVerb>0.
+class ConsolePrinter:
+    def __init__(self, linVerb=0, prefix=''):
+        self.linVerb = linVerb
+        self.prefix = prefix
+
+    def __call__(self, hist, i):
+        r = hist.residNorm[i]
+        r0 = hist.residNorm[0]
+        line = '%siter %6d r=%12.5g r/r0=%12.5g dx=%12.5g' % (self.prefix,
+            i, r, r/r0, hist.stepNorm[i])
+        if self.linVerb>0:
+            line += ' linTol=%10.3g krylov=%5d' % (hist.linTol[i],
+                hist.krylovIters[i])
+        if hist.backtracks[i] > 0:
+            line += ' backtracks=%3d' % hist.backtracks[i]
+        print(line)
@@ -0,0 +1,151 @@
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+import scipy.linalg.lapack as lapack
+
+# Direct linear solvers for sequences of matrices with a fixed sparsity
+# pattern, such as the Jacobians in a Newton iteration. Each has
+#
+#   factor(J)   -- compute a factorization of J (symbolic work is done only
+#                  the first time or when the pattern changes)
+#   solve(b)    -- solve with the most recent factorization
+#
+# and counts its numeric factorizations and symbolic analyses.
+
+
+# Half bandwidths (kl, ku) of a sparse matrix
+def bandwidths(J):
+    J = sp.coo_matrix(J)
+    if J.nnz == 0:
+        return (0, 0)
+    d = J.col.astype(np.int64) - J.row.astype(np.int64)
+    return (int(max(-d.min(), 0)), int(max(d.max(), 0)))
+
+
+# Sparse LU via SuperLU. The fill-reducing column ordering (COLAMD) is
+# computed once, on the first matrix, together with an index map that
+# permutes the values of any later matrix with the same pattern by a
+# single gather. SciPy has no separate COLAMD, so the ordering comes out of
+# a full factorization of the first matrix, which is kept as its LU.
+# Refactorizations then run SuperLU with the natural ordering on the
+# pre-permuted matrix, so the ordering step isn't repeated. SuperLU doesn't
+# let us keep its symbolic factorization, so that part is still redone on
+# every call.
+class SparseLUSolver:
+    def __init__(self, permSpec='COLAMD'):
+        self.permSpec = permSpec
+        self.numFactorizations = 0
+        self.numSymbolic = 0
+        self.pattern = None
+        self.LU = None
+        self.permuted = False
+
+    def __str__(self):
+        return 'SparseLU(ordering=%s)' % self.permSpec
+
+    def samePattern(self, J):
+        (indptr, indices) = self.pattern
+        return (np.array_equal(J.indptr, indptr)
+            and np.array_equal(J.indices, indices))
+
+    # Compute the column ordering of J and the map from J's values to the
+    # values of the column-permuted matrix. Returns the LU of J that the
+    # ordering was taken from.
+    def analyze(self, J):
+        n = J.shape[1]
+        self.pattern = (J.indptr.copy(), J.indices.copy())
+
+        LU = spla.splu(J, permc_spec=self.permSpec)
+        perm = LU.perm_c
+        # perm_c maps original column j to position perm_c[j]; we need
+        # the original column that ends up in each position
+        self.colPerm = np.empty(n, dtype=np.int64)
+        self.colPerm[perm] = np.arange(n)
+
+        # Permute a matrix holding 0,1,...,nnz-1 as values to find where
+        # each value goes
+        idx = sp.csc_matrix((np.arange(J.nnz, dtype=np.double), J.indices,
+            J.indptr), shape=J.shape)
+        P = idx[:, self.colPerm].tocsc()
+        P.sort_indices()
+        self.valueMap = P.data.astype(np.int64)
+        self.permIndices = P.indices
+        self.permIndptr = P.indptr
+        self.numSymbolic += 1
+        return LU
+
+    # On a new pattern the LU from the analysis is used as it is; it
+    # solves with J directly, not with the column-permuted matrix
+    def factor(self, J):
+        J = sp.csc_matrix(J)
+        J.sort_indices()
+        self.numFactorizations += 1
+        if self.pattern is None or not self.samePattern(J):
+            self.LU = self.analyze(J)
+            self.permuted = False
+            return
+
+        Jp = sp.csc_matrix((J.data[self.valueMap], self.permIndices,
+            self.permIndptr), shape=J.shape)
+        self.LU = spla.splu(Jp, permc_spec='NATURAL')
+        self.permuted = True
+
+    def solve(self, b):
+        y = self.LU.solve(b)
+        if not self.permuted:
+            return y
+        x = np.empty_like(y)
+        x[self.colPerm] = y
+        return x
+
+
+# Banded LU via LAPACK dgbtrf/dgbtrs, for matrices of small bandwidth such
+# as the tridiagonal Jacobians of the 1D problems. Factorization and solve
+# are O(m (kl+ku) kl). The band storage layout is computed once.
+class BandedSolver:
+    def __init__(self):
+        self.numFactorizations = 0
+        self.numSymbolic = 0
+        self.bands = None
+
+    def __str__(self):
+        if self.bands is None:
+            return 'BandedLU'
+        return 'BandedLU(kl=%d, ku=%d)' % self.bands
+
+    def factor(self, J):
+        J = sp.coo_matrix(J)
+        bands = bandwidths(J)
+        if bands != self.bands:
+            self.bands = bands
+            self.numSymbolic += 1
+        (kl, ku) = bands
+        n = J.shape[0]
+
+        # LAPACK band storage with kl extra rows for the fill from pivoting
+        ab = np.zeros((2*kl + ku + 1, n))
+        ab[kl + ku + J.row - J.col, J.col] = J.data
+        (lub, piv, info) = lapack.dgbtrf(ab, kl, ku)
+        if info > 0:
+            raise np.linalg.LinAlgError('singular matrix in banded LU')
+        self.lub = lub
+        self.piv = piv
+        self.numFactorizations += 1
+
+    def solve(self, b):
+        (kl, ku) = self.bands
+        (x, info) = lapack.dgbtrs(self.lub, kl, ku, b, self.piv)
+        return x
+
+
+def makeDirectSolver(name, J=None, maxBand=2):
+    if name == 'auto':
+        if J is not None and max(bandwidths(J)) <= maxBand:
+            name = 'banded'
+        else:
+            name = 'lu'
+    if name == 'lu':
+        return SparseLUSolver()
+    if name == 'banded':
+        return BandedSolver()
+    raise ValueError('unknown direct solver: %s' % name)
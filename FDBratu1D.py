@@ -0,0 +1,7 @@
+import numpy as np
+from FDNonlinPoisson1D import FDNonlinPoisson1D, expRHSFunc
+
+# Bratu equation u''=alpha*exp(-u), u(-1)=u(1)=0, as in NewtonBratu.py
+class FDBratu1D(FDNonlinPoisson1D):
+    def __init__(self, m=5, alpha=0.5):
+        super().__init__(m=m, alpha=alpha, rhsFunc=expRHSFunc)
@@ -1,24 +1,73 @@
 import scipy.sparse as sp
+import scipy.sparse.linalg as spla
 import numpy as np
 from FDLaplacian2D import FDLaplacian2D
+from FusedKernels import csrMatvec, resolveKernel
+import FusedKernels
+from NonlinearProblem import NonlinearProblem, unionPattern, \
+    valuesOnPattern, diagonalPositions
 
-class FDBratu2D:
-    def __init__(self, m=4, alpha=0.5):
+# Bratu equation -Laplacian(u) + alpha*exp(-u) = 0 on [-1,1]^2 with zero
+# boundary values. The Jacobian A + alpha*diag(exp(-u)) has A's pattern, so
+# evalJ only rewrites the diagonal.
+#
+# The in-place paths use self.work as scratch space. With kernel='numba'
+# (or 'auto' when Numba is installed) evalF(u, out) runs a fused stencil
+# kernel; otherwise it uses ufuncs with out= and an in-place CSR matvec.
+class FDBratu2D(NonlinearProblem):
+    paramName = 'alpha'
+
+    def __init__(self, m=4, alpha=0.5, kernel='auto'):
         self.m = m
+        self.dim = 2
         self.alpha = alpha
+        self.h = 2.0/(m + 1)
+        self.kernel = resolveKernel(kernel)
+        self.work = np.empty(m*m)
 
         self.A = -FDLaplacian2D(-1.0, 1.0, m)
+        self.pattern = unionPattern(self.A)
+        self.Avals = valuesOnPattern(self.pattern, self.A)
+        self.diagPos = diagonalPositions(self.pattern)
 
     def initialU(self):
         return np.ones(self.m*self.m)
 
-    def evalF(self, u):
-        return self.A*u - self.alpha*np.exp(-u)
+    def evalF(self, u, out=None):
+        if out is None:
+            return self.A*u - self.alpha*np.exp(-u)
+        if self.kernel == 'numba':
+            return FusedKernels.bratu2DResidual(u, self.m, self.h, self.alpha,
+                out)
+        np.negative(u, out=out)
+        np.exp(out, out=out)
+        out *= -self.alpha
+        return csrMatvec(self.A, u, out, accumulate=True)
+
+    def evalJ(self, u, J_out=None):
+        if J_out is None:
+            J_out = self.newJ()
+        g = self.work
+        np.negative(u, out=g)
+        np.exp(g, out=g)
+        g *= self.alpha
+        J_out.data[:] = self.Avals
+        J_out.data[self.diagPos] += g
+        return J_out
 
-    def evalJ(self, u):
-        J = self.A.copy()
+    def evalFParam(self, u):
+        return -np.exp(-u)
+
+    # Jacobian as a matrix-free operator: stencil apply plus the diagonal
+    # term alpha*exp(-u). Nothing of size nnz is allocated per call.
+    def evalJOperator(self, u):
         g = self.alpha*np.exp(-u)
-        d = J.diagonal()
-        J.setdiag(d+g)
+        A = self.A
+
+        def matvec(v):
+            v = np.ravel(v)
+            return A*v + g*v
 
-        return J
+        N = self.m*self.m
+        return spla.LinearOperator((N,N), matvec=matvec, rmatvec=matvec,
+            dtype=np.double)
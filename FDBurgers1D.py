@@ -0,0 +1,77 @@
+import numpy as np
+from FDLaplacian1D import FDLaplacian1D
+from FDCentralDiff1D import FDCentralDiff1D
+from FusedKernels import csrMatvec, resolveKernel
+import FusedKernels
+from NonlinearProblem import NonlinearProblem, unionPattern, \
+    valuesOnPattern, diagonalPositions, entryRows
+
+# Burgers equation -u_xx + beta u u_x - f = 0, u(-1)=u(1)=0, as in
+# NewtonBurgers.py. Residual is -K*u + beta*u.*(D*u) - f, Jacobian is
+# -K + beta*diag(D*u) + beta*diag(u)*D.
+#
+# The Jacobian lives on the union of the patterns of K and D. With K and D
+# laid out on that pattern, entry k of row i of J is
+#   -K_k + beta*u_i*D_k  (+ beta*(D*u)_i on the diagonal)
+# so evalJ is a few vector operations on the values array.
+#
+# The in-place paths use the self.work* arrays as scratch space. With
+# kernel='numba' (or 'auto' when Numba is installed) evalF(u, out) runs a
+# fused stencil kernel.
+class FDBurgers1D(NonlinearProblem):
+    paramName = 'beta'
+
+    def __init__(self, m=10, beta=100.0, f=None, kernel='auto'):
+        self.m = m
+        self.dim = 1
+        self.beta = beta
+        self.h = 2.0/(m + 1)
+        self.kernel = resolveKernel(kernel)
+
+        self.K = FDLaplacian1D(-1.0, 1.0, m).tocsr()
+        self.D = FDCentralDiff1D(-1.0, 1.0, m).tocsr()
+        self.negK = -self.K
+        if f is None:
+            f = np.ones(m)
+        self.f = np.asarray(f, dtype=np.double)
+
+        self.pattern = unionPattern(self.K, self.D)
+        self.Kvals = valuesOnPattern(self.pattern, self.K)
+        self.Dvals = valuesOnPattern(self.pattern, self.D)
+        self.rows = entryRows(self.pattern)
+        self.diagPos = diagonalPositions(self.pattern)
+
+        self.work = np.empty(m)
+        self.workNNZ = np.empty(self.pattern.nnz)
+
+    def initialU(self):
+        return np.zeros(self.m)
+
+    def evalF(self, u, out=None):
+        if out is None:
+            return -self.K*u + self.beta*np.multiply(u, self.D*u) - self.f
+        if self.kernel == 'numba':
+            return FusedKernels.burgers1DResidual(u, self.h, self.beta,
+                self.f, out)
+        Du = csrMatvec(self.D, u, self.work)
+        np.multiply(u, Du, out=out)
+        out *= self.beta
+        out -= self.f
+        return csrMatvec(self.negK, u, out, accumulate=True)
+
+    def evalJ(self, u, J_out=None):
+        beta = self.beta
+        if J_out is None:
+            J_out = self.newJ()
+        data = J_out.data
+        uRows = np.take(u, self.rows, out=self.workNNZ)
+        np.multiply(uRows, self.Dvals, out=data)
+        data *= beta
+        data -= self.Kvals
+        Du = csrMatvec(self.D, u, self.work)
+        Du *= beta
+        data[self.diagPos] += Du
+        return J_out
+
+    def evalFParam(self, u):
+        return np.multiply(u, self.D*u)
@@ -0,0 +1,7 @@
+import numpy as np
+import numpy.linalg as la
+import scipy.sparse as sp
+from FDLaplacianND import FDLaplacianND
+
+def FDLaplacian3D(a, b, m):
+    return FDLaplacianND(a, b, m, 3)
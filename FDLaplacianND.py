@@ -0,0 +1,66 @@
+import numpy as np
+import scipy.sparse as sp
+from FDLaplacian1D import FDLaplacian1D
+
+# Assemble the FD Laplacian on an m^dim grid directly in CSR form.
+#
+# Unknowns are numbered k = ix + m*iy + m*m*iz, as in FDLaplacian2D. Each row
+# has the stencil entries for offsets -m^(dim-1), ..., -m, -1, 0, 1, m, ...,
+# m^(dim-1), in increasing column order; entries that would cross the boundary
+# are masked out. No Python-level loop over grid points is needed, and the
+# result is in canonical CSR form (sorted indices, no duplicates).
+def FDLaplacianND(a, b, m, dim):
+    h = np.abs(b-a)/np.double(m+1)
+    N = m**dim
+
+    diagVal = -2.0*dim/h/h
+    offVal = 1.0/h/h
+
+    # Grid coordinate of every unknown along each axis
+    k = np.arange(N)
+    coords = [(k // m**d) % m for d in range(dim)]
+
+    # Stencil offsets in increasing order, with the axis each one moves along
+    offsets = []
+    for d in reversed(range(dim)):
+        offsets.append((-m**d, d))
+    offsets.append((0, -1))
+    for d in range(dim):
+        offsets.append((m**d, d))
+
+    cols = np.empty((N, len(offsets)), dtype=np.int64)
+    vals = np.empty((N, len(offsets)))
+    mask = np.empty((N, len(offsets)), dtype=bool)
+    for j, (off, d) in enumerate(offsets):
+        cols[:,j] = k + off
+        if d < 0:
+            vals[:,j] = diagVal
+            mask[:,j] = True
+        else:
+            vals[:,j] = offVal
+            if off < 0:
+                mask[:,j] = coords[d] > 0
+            else:
+                mask[:,j] = coords[d] < m-1
+
+    indptr = np.zeros(N+1, dtype=np.int64)
+    np.cumsum(mask.sum(axis=1), out=indptr[1:])
+
+    A = sp.csr_matrix((vals[mask], cols[mask], indptr), shape=(N,N))
+    A.has_sorted_indices = True
+    return A
+
+# Same operator built as a Kronecker sum of 1D Laplacians,
+# L = sum_d I x ... x L1 x ... x I. Kept for comparison in benchmarks; the
+# diagonal is accumulated in floating point, so it may differ from
+# FDLaplacianND in the last bit.
+def FDLaplacianKron(a, b, m, dim):
+    L1 = FDLaplacian1D(a, b, m).tocsr()
+    I = sp.identity(m, format='csr')
+    A = sp.csr_matrix((m**dim, m**dim))
+    for d in range(dim):
+        term = L1 if d==0 else I
+        for e in range(1, dim):
+            term = sp.kron(L1 if e==d else I, term, format='csr')
+        A = A + term
+    return A.tocsr()
@@ -0,0 +1,57 @@
+import numpy as np
+from FDLaplacian1D import FDLaplacian1D
+from FusedKernels import csrMatvec
+from NonlinearProblem import NonlinearProblem, unionPattern, \
+    valuesOnPattern, diagonalPositions
+
+# Default right-hand side for the nonlinear Poisson equation: returns
+# f(u) and f'(u)
+def expRHSFunc(u):
+    return (np.exp(-u), -np.exp(-u))
+
+def cosRHSFunc(u):
+    return (np.cos(u), -np.sin(u))
+
+# Nonlinear Poisson equation u''=alpha*f(u), u(-1)=u(1)=0, as in
+# NewtonNonlinPoisson.py. Residual is K*u - alpha*f(u), Jacobian is
+# K - alpha*diag(f'(u)). The Jacobian has K's pattern, so evalJ only
+# rewrites the diagonal. The in-place paths use self.work as scratch space.
+class FDNonlinPoisson1D(NonlinearProblem):
+    paramName = 'alpha'
+
+    def __init__(self, m=5, alpha=0.5, rhsFunc=expRHSFunc):
+        self.m = m
+        self.dim = 1
+        self.alpha = alpha
+        self.rhsFunc = rhsFunc
+
+        self.K = FDLaplacian1D(-1.0, 1.0, m).tocsr()
+        self.pattern = unionPattern(self.K)
+        self.Kvals = valuesOnPattern(self.pattern, self.K)
+        self.diagPos = diagonalPositions(self.pattern)
+        self.work = np.empty(m)
+
+    def initialU(self):
+        return -np.ones(self.m)
+
+    def evalF(self, u, out=None):
+        (f, df) = self.rhsFunc(u)
+        if out is None:
+            return self.K*u - self.alpha*f
+        csrMatvec(self.K, u, out)
+        np.multiply(f, self.alpha, out=self.work)
+        out -= self.work
+        return out
+
+    def evalJ(self, u, J_out=None):
+        (f, df) = self.rhsFunc(u)
+        if J_out is None:
+            J_out = self.newJ()
+        np.multiply(df, self.alpha, out=self.work)
+        J_out.data[:] = self.Kvals
+        J_out.data[self.diagPos] -= self.work
+        return J_out
+
+    def evalFParam(self, u):
+        (f, df) = self.rhsFunc(u)
+        return -f
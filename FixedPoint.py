@@ -0,0 +1,169 @@
+import time
+import numpy as np
+import numpy.linalg as npla
+from Tab import Tab
+from DirectSolvers import makeDirectSolver
+
+# Picard map u -> K^{-1} g(u) for a semilinear problem K u = g(u), as in
+# FixedPointBratu.py (g = alpha exp(-u)) and FixedPointNonlinPoisson.py
+# (g = alpha cos(u)). K doesn't change, so it is factored once, by a banded
+# or sparse LU (DirectSolvers.makeDirectSolver), and every application of
+# the map is one evaluation of g and one pair of triangular solves: O(m)
+# for the tridiagonal 1D Laplacian, against O(m^3) for a dense solve.
+class PicardMap:
+    def __init__(self, K, g,
+                linSolver='auto'):      # 'auto', 'banded' or 'lu'
+
+        self.g = g
+        self.solver = makeDirectSolver(linSolver, K)
+        self.solver.factor(K.tocsc())
+        self.numMaps = 0
+
+    def __call__(self, u):
+        self.numMaps += 1
+        return self.solver.solve(self.g(u))
+
+
+# Fixed-point iteration u = G(u), plain or with Anderson acceleration.
+#
+# With depth=0 this is u_{k+1} = u_k + beta f_k, with f_k = G(u_k) - u_k
+# (beta=1 is the plain iteration). With depth=m > 0 it is Anderson(m)
+# (H. F. Walker and P. Ni, Anderson acceleration for fixed-point
+# iterations, SIAM J. Numer. Anal. 49, 2011): the differences of the last
+# m residuals and map values are kept, gamma minimizes
+# |f_k - dF gamma|_2, and
+#
+#   u_{k+1} = G(u_k) - dG gamma - (1 - beta) (f_k - dF gamma).
+#
+# The extra work per iteration is a least-squares problem with m columns,
+# O(n m^2), and the memory 2 m vectors. A map that contracts slowly (or
+# not at all, when some eigenvalues of G' are a little larger than 1 in
+# magnitude) usually converges in far fewer iterations.
+#
+# Convergence is |G(u_k) - u_k|_2 < tol; the converged value returned is
+# G(u_k). After a solve, resids holds |f_k| for every iteration.
+class FixedPointSolver:
+    def __init__(self,
+                depth=0,                # Anderson depth (0: no acceleration)
+                beta=1.0,               # damping (mixing) parameter
+                tol=1.0e-6,             # tolerance on |G(u) - u|
+                maxIters=100,           # maximum number of iterations
+                verb=0):                # 1: summary, 2: every iteration
+
+        self.depth = depth
+        self.beta = beta
+        self.tol = tol
+        self.maxIters = maxIters
+        self.verb = verb
+
+    def __str__(self):
+        if self.depth == 0:
+            return 'Picard(beta=%g)' % self.beta
+        return 'Anderson(%d, beta=%g)' % (self.depth, self.beta)
+
+    # Solve u = G(u) from u0. Returns (conv, u).
+    def solve(self, G, u0):
+        tab0 = Tab()
+        u = np.array(u0, dtype=np.double)
+        n = len(u)
+        depth = self.depth
+        beta = self.beta
+        if depth > 0:
+            dF = np.empty((n, depth))
+            dG = np.empty((n, depth))
+        (fPrev, gPrev) = (None, None)
+        numStored = 0
+        self.resids = []
+
+        conv = False
+        for k in range(self.maxIters):
+            g = G(u)
+            f = g - u
+            r = npla.norm(f)
+            self.resids.append(r)
+            if self.verb>1:
+                print(tab0, 'iter %4d |G(u)-u|=%12.5g' % (k, r))
+            if r < self.tol:
+                (conv, u) = (True, g)
+                break
+
+            if depth == 0:
+                u += beta*f
+                continue
+
+            # The newest differences overwrite the oldest
+            if fPrev is not None:
+                col = (k-1) % depth
+                np.subtract(f, fPrev, out=dF[:,col])
+                np.subtract(g, gPrev, out=dG[:,col])
+                numStored = min(numStored+1, depth)
+            (fPrev, gPrev) = (f, g)
+            if numStored == 0:
+                u += beta*f
+                continue
+            gamma = npla.lstsq(dF[:,:numStored], f, rcond=None)[0]
+            u = g - dG[:,:numStored].dot(gamma)
+            if beta != 1.0:
+                u -= (1.0 - beta)*(f - dF[:,:numStored].dot(gamma))
+
+        self.numIters = len(self.resids)
+        if self.verb>0:
+            print(tab0, '%s: conv=%s, iters=%d, |G(u)-u|=%12.5g' % (self,
+                conv, self.numIters, self.resids[-1]))
+        return (conv, u)
+
+
+if __name__=='__main__':
+
+    import argparse
+    from FDLaplacian1D import FDLaplacian1D
+    parser = argparse.ArgumentParser(description='Picard iteration with '
+        'and without Anderson acceleration')
+    parser.add_argument('--problem', default='poisson',
+        choices=['bratu', 'poisson'])
+    parser.add_argument('--m', type=int, default=1000)
+    parser.add_argument('--alpha', type=float, default=None)
+    parser.add_argument('--depth', nargs='+', type=int, default=[0, 1, 3, 5])
+    parser.add_argument('--tol', type=float, default=1.0e-10)
+    parser.add_argument('--maxIters', type=int, default=500)
+    parser.add_argument('--dense', action='store_true',
+        help='also time the dense solve of the original scripts')
+    args = parser.parse_args()
+
+    # u'' = alpha exp(-u) (FixedPointBratu.py) or u'' = alpha cos(u)
+    # (FixedPointNonlinPoisson.py) on (-1,1), zero boundary values
+    m = args.m
+    K = FDLaplacian1D(-1.0, 1.0, m).tocsr()
+    if args.problem == 'bratu':
+        alpha = 0.5 if args.alpha is None else args.alpha
+        g = lambda u: alpha*np.exp(-u)
+        u0 = -np.ones(m)
+    else:
+        alpha = 2.5 if args.alpha is None else args.alpha
+        g = lambda u: alpha*np.cos(u)
+        u0 = np.ones(m)
+
+    print('%s, m=%d, alpha=%g' % (args.problem, m, alpha))
+    print('%-24s %6s %8s %12s %12s' % ('method', 'conv', 'iters',
+        '|G(u)-u|', 'time (s)'))
+    t0 = time.perf_counter()
+    G = PicardMap(K, g)
+    tFactor = time.perf_counter() - t0
+    for depth in args.depth:
+        solver = FixedPointSolver(depth=depth, tol=args.tol,
+            maxIters=args.maxIters)
+        t0 = time.perf_counter()
+        (conv, u) = solver.solve(G, u0)
+        elapsed = time.perf_counter() - t0
+        print('%-24s %6s %8d %12.5g %12.5g' % (solver, conv, solver.numIters,
+            solver.resids[-1], elapsed))
+    print('(factorization of K: %.3g s, %s)' % (tFactor, G.solver))
+
+    if args.dense:
+        Kd = K.toarray()
+        solver = FixedPointSolver(tol=args.tol, maxIters=args.maxIters)
+        t0 = time.perf_counter()
+        (conv, u) = solver.solve(lambda u: npla.solve(Kd, g(u)), u0)
+        elapsed = time.perf_counter() - t0
+        print('%-24s %6s %8d %12.5g %12.5g' % ('Picard, dense solve', conv,
+            solver.numIters, solver.resids[-1], elapsed))
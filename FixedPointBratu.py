@@ -1,34 +1,28 @@
 # Fixed-point iteration for solution of the Bratu equation
 # u''=exp(-u), u(-1)=u(1)=0
 
-import numpy.linalg as npla
 import numpy as np
-import scipy.sparse as sp
 from FDLaplacian1D import FDLaplacian1D
+from FixedPoint import PicardMap, FixedPointSolver
 
 alpha = 0.5
 
 # Set up an m by m matrix for FD discretization of the Laplacian
 m = 5
-K = FDLaplacian1D(-1.0, 1.0, m).todense()
+K = FDLaplacian1D(-1.0, 1.0, m)
 
 # Set initial guess
 u0 = -np.ones(m)
 
-# Fixed point iteration
+# Fixed point iteration u = K^{-1} g(u), with K factored once. Set
+# depth > 0 for Anderson acceleration (see FixedPoint.py).
 tol = 1.0e-6
 maxIter = 100
-conv = False
+depth = 0
 
-for i in range(maxIter):
-  g = alpha*np.exp(-u0)
-  u1 = npla.solve(K, g)
-  print('u[%d]=' % i, u1)
-  r = npla.norm(u0 - u1)
-  u0 = np.copy(u1)
-  if r < m*tol:
-    conv = True
-    break
+G = PicardMap(K, lambda u: alpha*np.exp(-u))
+solver = FixedPointSolver(depth=depth, tol=m*tol, maxIters=maxIter, verb=2)
+(conv, u0) = solver.solve(G, u0)
 
 if conv:
   print('Converged to solution u=', u0)
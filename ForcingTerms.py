@@ -0,0 +1,107 @@
+import numpy as np
+
+# Forcing terms for inexact Newton methods: rules for the relative
+# tolerance eta_k to which the Newton step equation J_k s_k = -F_k is
+# solved.
+#
+# Usage from a Newton loop:
+#   forcing.reset(r0, tauStop)       before the first iteration
+#   eta = forcing.next(r)            at each iterate, with r=|F_k|
+#   forcing.setLinResid(|F_k + J_k s_k|)   after the solve, if
+#                                    forcing.needsLinResid is True
+#
+# All rules are capped at etaMax (a tolerance >= 1 would let the linear
+# solver return a zero step) and floored at etaMin. They are also kept
+# from falling below 0.5*tauStop/r, since solving more accurately than
+# the nonlinear stopping test can resolve is wasted work.
+class ForcingTerm:
+    needsLinResid = False
+
+    def __init__(self, etaMin=1.0e-8, etaMax=0.9):
+        self.etaMin = etaMin
+        self.etaMax = etaMax
+        self.reset(1.0, 0.0)
+
+    def reset(self, r0, tauStop):
+        self.r0 = r0
+        self.tauStop = tauStop
+        self.rPrev = None
+        self.etaPrev = None
+        self.linResidPrev = None
+
+    def setLinResid(self, linResid):
+        self.linResidPrev = linResid
+
+    def next(self, r):
+        eta = self.rawEta(r)
+        if r > 0.0:
+            eta = max(eta, 0.5*self.tauStop/r)
+        eta = max(min(eta, self.etaMax), self.etaMin)
+        self.rPrev = r
+        self.etaPrev = eta
+        return eta
+
+
+# The original NewtonKrylov rule: eta = max(fudge*|F_k|/|F_0|, etaMin)
+class FudgeForcing(ForcingTerm):
+    def __init__(self, tolFudge=0.1, etaMin=1.0e-8, etaMax=0.9):
+        super().__init__(etaMin=etaMin, etaMax=etaMax)
+        self.tolFudge = tolFudge
+
+    def __str__(self):
+        return 'FudgeForcing(fudge=%g, etaMin=%g)' % (self.tolFudge,
+            self.etaMin)
+
+    def rawEta(self, r):
+        return self.tolFudge*r/self.r0
+
+
+# Eisenstat-Walker forcing terms, with their safeguards (S. C. Eisenstat and
+# H. F. Walker, SIAM J. Sci. Comput. 17, 1996).
+#
+# Choice 1: eta_k = | |F_k| - |F_{k-1} + J_{k-1} s_{k-1}| | / |F_{k-1}|,
+#   safeguarded by eta_{k-1}^phi (phi the golden ratio) when that is > 0.1.
+# Choice 2: eta_k = gamma*(|F_k|/|F_{k-1}|)^alpha,
+#   safeguarded by gamma*eta_{k-1}^alpha when that is > 0.1.
+class EisenstatWalkerForcing(ForcingTerm):
+    def __init__(self, choice=2, eta0=0.5, gamma=0.9, alpha=2.0,
+                etaMin=1.0e-8, etaMax=0.9):
+        if choice not in (1, 2):
+            raise ValueError('Eisenstat-Walker choice must be 1 or 2')
+        super().__init__(etaMin=etaMin, etaMax=etaMax)
+        self.choice = choice
+        self.eta0 = eta0
+        self.gamma = gamma
+        self.alpha = alpha
+        self.needsLinResid = (choice == 1)
+
+    def __str__(self):
+        if self.choice == 1:
+            return 'EisenstatWalker(choice=1, eta0=%g)' % self.eta0
+        return 'EisenstatWalker(choice=2, eta0=%g, gamma=%g, alpha=%g)' % (
+            self.eta0, self.gamma, self.alpha)
+
+    def rawEta(self, r):
+        if self.rPrev is None:
+            return self.eta0
+
+        if self.choice == 1:
+            eta = np.abs(r - self.linResidPrev)/self.rPrev
+            safe = self.etaPrev**(0.5*(1.0 + np.sqrt(5.0)))
+        else:
+            eta = self.gamma*(r/self.rPrev)**self.alpha
+            safe = self.gamma*self.etaPrev**self.alpha
+
+        if safe > 0.1:
+            eta = max(eta, safe)
+        return eta
+
+
+def makeForcing(name, tolFudge=0.1, etaMin=1.0e-8):
+    if name == 'fudge':
+        return FudgeForcing(tolFudge=tolFudge, etaMin=etaMin)
+    if name == 'ew1':
+        return EisenstatWalkerForcing(choice=1, etaMin=etaMin)
+    if name == 'ew2':
+        return EisenstatWalkerForcing(choice=2, etaMin=etaMin)
+    raise ValueError('unknown forcing term: %s' % name)
@@ -0,0 +1,114 @@
+import numpy as np
+
+# Kernels for allocation-free residual evaluation.
+#
+# csrMatvec(A, x, out) forms A*x in a given vector through SciPy's compiled
+# CSR kernel, which accumulates into its output, so that y += A*x costs no
+# temporary at all. If that (private) kernel isn't available we fall back
+# to A.dot(x), which allocates. csrMatmat(A, X, out) does the same for a
+# block of vectors.
+#
+# When Numba is installed, fused stencil kernels for the residuals of the
+# constant-coefficient FD problems are also compiled. They evaluate the
+# stencil and the nonlinear term in a single pass over u, so the residual
+# costs one read of u and one write of out. haveNumba tells whether they
+# exist; the problem classes select them with kernel='numba' (or 'auto').
+
+try:
+    from scipy.sparse._sparsetools import csr_matvec as _csr_matvec
+    from scipy.sparse._sparsetools import csr_matvecs as _csr_matvecs
+except ImportError:
+    _csr_matvec = None
+    _csr_matvecs = None
+
+try:
+    import numba
+    haveNumba = True
+except ImportError:
+    haveNumba = False
+
+
+# out = A*x, or out += A*x if accumulate is True. A must be CSR with double
+# values.
+def csrMatvec(A, x, out, accumulate=False):
+    if _csr_matvec is None:
+        if accumulate:
+            out += A.dot(x)
+        else:
+            out[:] = A.dot(x)
+        return out
+    if not accumulate:
+        out.fill(0.0)
+    (nRow, nCol) = A.shape
+    _csr_matvec(nRow, nCol, A.indptr, A.indices, A.data, x, out)
+    return out
+
+
+# out = A*X for a C-contiguous block X of vectors (one per column), in a
+# single pass over A; out += A*X if accumulate is True
+def csrMatmat(A, X, out, accumulate=False):
+    if _csr_matvecs is None or not (X.flags.c_contiguous
+            and out.flags.c_contiguous):
+        if accumulate:
+            out += A.dot(X)
+        else:
+            out[:] = A.dot(X)
+        return out
+    if not accumulate:
+        out.fill(0.0)
+    (nRow, nCol) = A.shape
+    _csr_matvecs(nRow, nCol, X.shape[1], A.indptr, A.indices, A.data,
+        X.ravel(), out.ravel())
+    return out
+
+
+# Select a residual kernel: 'numpy' (ufuncs with out= and csrMatvec),
+# 'numba' (fused stencil, requires Numba) or 'auto' (numba if installed)
+def resolveKernel(kernel):
+    if kernel == 'auto':
+        return 'numba' if haveNumba else 'numpy'
+    if kernel == 'numba' and not haveNumba:
+        raise ValueError('kernel=numba requested but Numba is not installed')
+    if kernel not in ('numpy', 'numba'):
+        raise ValueError('unknown residual kernel: %s' % kernel)
+    return kernel
+
+
+if haveNumba:
+
+    # Bratu 2D on an m by m grid, lexicographic ordering, zero Dirichlet
+    # boundary values:
+    #   out = (4u_ij - u_i-1,j - u_i+1,j - u_i,j-1 - u_i,j+1)/h^2
+    #         - alpha*exp(-u_ij)
+    @numba.njit(cache=True)
+    def bratu2DResidual(u, m, h, alpha, out):
+        c = 1.0/(h*h)
+        for j in range(m):
+            for i in range(m):
+                k = j*m + i
+                s = 4.0*u[k]
+                if i > 0:
+                    s -= u[k-1]
+                if i < m-1:
+                    s -= u[k+1]
+                if j > 0:
+                    s -= u[k-m]
+                if j < m-1:
+                    s -= u[k+m]
+                out[k] = c*s - alpha*np.exp(-u[k])
+        return out
+
+    # Burgers 1D, zero Dirichlet boundary values:
+    #   out = -(u_i-1 - 2u_i + u_i+1)/h^2
+    #         + beta*u_i*(u_i+1 - u_i-1)/(2h) - f_i
+    @numba.njit(cache=True)
+    def burgers1DResidual(u, h, beta, f, out):
+        n = u.shape[0]
+        c2 = 1.0/(h*h)
+        c1 = 0.5*beta/h
+        for i in range(n):
+            ul = u[i-1] if i > 0 else 0.0
+            ur = u[i+1] if i < n-1 else 0.0
+            out[i] = (-c2*(ul - 2.0*u[i] + ur) + c1*u[i]*(ur - ul)
+                - f[i])
+        return out
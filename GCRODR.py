@@ -0,0 +1,238 @@
+import time
+import numpy as np
+import numpy.linalg as npla
+import scipy.linalg as la
+from Tab import Tab
+from GMRES import GMRESSolver, matvecInto
+
+# GCRO-DR: GMRES with deflated restarting and a recycled subspace that is
+# carried from one linear solve to the next (M. L. Parks, E. de Sturler,
+# G. Mackey, D. D. Johnson and S. Maiti, Recycling Krylov subspaces for
+# sequences of linear systems, SIAM J. Sci. Comput. 28, 2006).
+#
+# The solver keeps k vectors U spanning an approximate invariant subspace
+# of the (right-preconditioned) operator B = A M^{-1}: the harmonic Ritz
+# vectors for the k harmonic Ritz values of smallest magnitude, which are
+# the ones that slow GMRES down. At the start of a solve, C = B U is
+# formed (k products with the new operator) and orthonormalized; the
+# residual is projected off range(C), and every later cycle runs Arnoldi
+# on (I - C C^T) B for restart-k steps, so the Krylov space never has to
+# rediscover the recycled directions. After each cycle the recycled space
+# is updated from the harmonic Ritz vectors of the cycle's augmented
+# Hessenberg matrix
+#
+#   G = [ D  B_k ]       W = [C  V_{j+1}],   V^ = [U D  V_j]
+#       [ 0  H_j ]
+#
+# with D scaling the columns of U to unit length and B_k = C^T B V_j, by
+# solving G^T G p = theta G^T W^T V^ p. Complex pairs contribute their real
+# and imaginary parts.
+#
+# The first solve, with nothing to recycle, is a GMRES(restart) cycle whose
+# harmonic Ritz vectors start the recycled space. U lives in the
+# preconditioned space, so it stays meaningful when the preconditioner is
+# rebuilt between solves; only C has to be recomputed.
+#
+# The k products forming C are counted as iterations, so iteration counts
+# are products with the operator, as for GMRES. Memory is restart+1 basis
+# vectors plus 2k for U and C.
+class GCRODRSolver(GMRESSolver):
+    def __init__(self,
+                restart=50,             # Krylov vectors per cycle
+                recycle=10,             # recycled vectors kept
+                ortho='mgs',            # 'mgs' or 'cgs2'
+                timer=None,             # PhaseTimer for an 'orthog' phase
+                verb=0):                # 1: summary, 2: every iteration
+
+        if not 0 < recycle < restart:
+            raise ValueError('recycle=%d must be in [1, restart=%d)' %
+                (recycle, restart))
+        super().__init__(restart=restart, ortho=ortho, timer=timer,
+            verb=verb)
+        self.recycle = recycle
+        self.U = None
+
+    def __str__(self):
+        return 'GCRO-DR(%d, %d, %s)' % (self.restart, self.recycle, self.ortho)
+
+    # Forget the recycled space, e.g., before a solve on a different problem
+    def reset(self):
+        self.U = None
+
+    def workspace(self, n, k):
+        if self.V is None or self.V.shape != (k+1, n):
+            super().workspace(n, k)
+            self.Hraw = np.zeros((k+1, k))
+            self.Bk = np.zeros((self.recycle, k))
+
+    # Solve A x = b to relative residual tol, recycling the subspace from
+    # earlier solves. Returns (conv, iters, x).
+    def solve(self, A, b, maxiters=500, tol=1.0e-8, precond=None, x0=None):
+        n = len(b)
+        m = self.restart
+        self.workspace(n, m)
+        if self.U is not None and self.U.shape[1] != n:
+            self.U = None
+        (V, H, Hraw, Bk, g) = (self.V, self.H, self.Hraw, self.Bk, self.g)
+        self.resids = []
+        self.iterTimes = []
+
+        matvec = matvecInto(A)
+        if precond is None:
+            applyPrec = lambda v: v
+        else:
+            applyPrec = precond.applyRight
+        applyB = lambda v, out: matvec(applyPrec(v), out)
+
+        r = np.empty(n)
+        if x0 is None:
+            x = np.zeros(n)
+            r[:] = b
+        else:
+            x = np.array(x0, dtype=np.double)
+            matvec(x, r)
+            np.subtract(b, r, out=r)
+        bNorm = npla.norm(b)
+        target = tol*bNorm
+        iters = 0
+
+        # Recycled space for this operator: C = B U with orthonormal
+        # columns, then project the residual off it
+        U = self.U
+        C = None
+        if U is not None and npla.norm(r) > target:
+            C = np.empty_like(U)
+            for i in range(U.shape[0]):
+                applyB(U[i], C[i])
+            iters += U.shape[0]
+            (Q, R) = la.qr(C.T, mode='economic')
+            C = np.ascontiguousarray(Q.T)
+            U = la.solve_triangular(R, U, trans='T')
+            a = C.dot(r)
+            r -= a.dot(C)
+            x += applyPrec(a.dot(U))
+
+        beta = npla.norm(r)
+        conv = beta <= target
+        while not conv and iters < maxiters:
+            kc = 0 if C is None else C.shape[0]
+            steps = m - kc
+            V[0] = r/beta
+            g.fill(0.0)
+            g[0] = beta
+
+            j = 0
+            while True:
+                t0 = time.perf_counter()
+                w = V[j+1]
+                applyB(V[j], w)
+                if C is not None:
+                    Bk[:kc, j] = C.dot(w)
+                    w -= np.dot(Bk[:kc, j], C, out=self.tmp)
+                hNext = self.orthogonalize(j, w)
+                Hraw[:j+1, j] = self.h[:j+1]
+                Hraw[j+1, j] = hNext
+                H[:j+2, j] = Hraw[:j+2, j]
+                if hNext > 0.0:
+                    w /= hNext
+                resid = self.rotate(j)
+
+                iters += 1
+                self.resids.append(resid)
+                self.iterTimes.append(time.perf_counter() - t0)
+                if self.verb>1:
+                    tab0 = Tab()
+                    print(tab0, 'GCRO-DR iter %4d resid=%12.5g' % (iters,
+                        resid))
+
+                j += 1
+                if (resid <= target or hNext == 0.0 or j == steps
+                        or iters >= maxiters):
+                    break
+
+            # Minimizer over range([U V_j]). The U coefficients make the
+            # C block of the residual vanish: a = -D^{-1} B_k z.
+            z = la.solve_triangular(H[:j, :j], g[:j])
+            dy = np.dot(z, V[:j], out=self.tmp)
+            if C is not None:
+                dy -= Bk[:kc, :j].dot(z).dot(U)
+            x += applyPrec(dy)
+
+            # New recycled space from this cycle
+            (C, U) = self.updateRecycle(j, C, U)
+
+            if resid <= target:
+                conv = True
+            else:
+                matvec(x, r)
+                np.subtract(b, r, out=r)
+                beta = npla.norm(r)
+                conv = beta <= target
+
+        self.U = U
+        if self.verb>0:
+            tab0 = Tab()
+            print(tab0, '%s: conv=%s, iters=%d, resid=%12.5g, |b|=%12.5g' % (
+                self, conv, iters, self.resids[-1] if self.resids else beta,
+                bNorm))
+        return (conv, iters, x)
+
+    # Harmonic Ritz update after a cycle of j Arnoldi steps. Returns the new
+    # (C, U), or the old ones if the update is numerically rank deficient.
+    def updateRecycle(self, j, C, U):
+        V = self.V
+        if C is None:
+            G = self.Hraw[:j+1, :j]
+            WtV = np.eye(j+1, j)
+            kc = 0
+        else:
+            kc = C.shape[0]
+            d = 1.0/npla.norm(U, axis=1)
+            Uhat = d[:, None]*U
+            G = np.zeros((kc+j+1, kc+j))
+            G[:kc, :kc] = np.diag(d)
+            G[:kc, kc:] = self.Bk[:kc, :j]
+            G[kc:, kc:] = self.Hraw[:j+1, :j]
+            WtV = np.zeros((kc+j+1, kc+j))
+            WtV[:kc, :kc] = C.dot(Uhat.T)
+            WtV[kc:, :kc] = V[:j+1].dot(Uhat.T)
+            WtV[kc:, kc:] = np.eye(j+1, j)
+
+        P = harmonicRitzVectors(G, WtV, self.recycle)
+        (Q, R) = la.qr(G.dot(P), mode='economic')
+        rDiag = np.abs(np.diag(R))
+        if rDiag.min() <= 1.0e-12*rDiag.max():
+            return (C, U)
+
+        # C = W Q and U = V^ P R^{-1}, block by block
+        newC = Q[kc:].T.dot(V[:j+1])
+        newU = P[kc:].T.dot(V[:j])
+        if C is not None:
+            newC += Q[:kc].T.dot(C)
+            newU += P[:kc].T.dot(Uhat)
+        newU = la.solve_triangular(R, newU, trans='T')
+        return (newC, newU)
+
+
+# Real basis (columns) for the harmonic Ritz vectors of the k harmonic Ritz
+# values of smallest magnitude, from G^T G p = theta G^T WtV p
+def harmonicRitzVectors(G, WtV, k):
+    (theta, Z) = la.eig(G.T.dot(G), G.T.dot(WtV))
+    mag = np.abs(theta)
+    mag[~np.isfinite(mag)] = np.inf
+    cols = []
+    for i in np.argsort(mag, kind='stable'):
+        if len(cols) >= k:
+            break
+        z = Z[:, i]
+        if np.abs(theta[i].imag) > 0.0 and np.isfinite(mag[i]):
+            # One of a conjugate pair: take both parts from the member with
+            # positive imaginary part
+            if theta[i].imag < 0.0:
+                continue
+            cols.append(z.real)
+            if len(cols) < k:
+                cols.append(z.imag)
+        else:
+            cols.append(z.real)
+    return np.column_stack(cols)
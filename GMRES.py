@@ -0,0 +1,256 @@
+import time
+import numpy as np
+import numpy.linalg as npla
+import scipy.sparse as sp
+import scipy.linalg as la
+from scipy.linalg.blas import daxpy
+from Tab import Tab
+from FusedKernels import csrMatvec
+
+# Function (z, out) -> out = A*z. CSR matrices, and operators with their
+# own matvecInto() (ThreadedCSR), write the product straight into out;
+# anything else with a dot() method is copied in.
+def matvecInto(A):
+    if sp.issparse(A) and A.format == 'csr' and A.dtype == np.double:
+        return lambda z, out: csrMatvec(A, z, out)
+    if hasattr(A, 'matvecInto'):
+        return A.matvecInto
+    def matvec(z, out):
+        out[:] = A.dot(z)
+        return out
+    return matvec
+
+
+# Restarted, right-preconditioned GMRES(k).
+#
+# The Krylov basis is a preallocated (k+1) by n array whose rows are the
+# basis vectors, so each vector is contiguous and the orthogonalization
+# works on whole rows in place. Memory is (k+1)*n doubles however many
+# iterations are allowed: with the default k=50, about 400 MB at n=10^6,
+# against 4 GB for full GMRES with 500 iterations. The basis is kept
+# between solves and only reallocated when n or k changes, so a solver
+# object reused across Newton steps allocates it once.
+#
+# The Hessenberg matrix is reduced to triangular form by Givens rotations
+# as it grows, which makes the residual norm of the least-squares problem
+# available at O(1) cost per iteration: it is |g[j+1]|, the last entry of
+# the rotated right-hand side. The iterate itself is only formed at the
+# end of a cycle.
+#
+# Orthogonalization is either
+#   'mgs'  -- modified Gram-Schmidt: one dot and one in-place axpy per
+#             basis vector, so the basis is read twice per iteration
+#   'cgs2' -- classical Gram-Schmidt, done twice: four products with the
+#             whole basis per iteration (BLAS-2), as stable as MGS. It reads
+#             the basis twice as often, so it is slower when memory
+#             bandwidth is the limit, but it makes far fewer Python-level
+#             calls and can win for short vectors or a threaded BLAS.
+#
+# With right preconditioning, A M^{-1} y = b is solved and x = M^{-1} y, so
+# the residual being minimized is the true residual b - A x and the
+# tolerance is relative to |b|. The preconditioner is anything with an
+# applyRight() method, such as ILURightPreconditioner.
+#
+# After a solve, resids holds the residual estimate after each iteration
+# and iterTimes the wall time of each iteration.
+class GMRESSolver:
+    def __init__(self,
+                restart=50,             # Krylov vectors per cycle
+                ortho='mgs',            # 'mgs' or 'cgs2'
+                timer=None,             # PhaseTimer for an 'orthog' phase
+                verb=0):                # 1: summary, 2: every iteration
+
+        if ortho not in ('mgs', 'cgs2'):
+            raise ValueError('unknown orthogonalization: %s' % ortho)
+        self.restart = restart
+        self.ortho = ortho
+        self.timer = timer
+        self.verb = verb
+        self.V = None
+
+    def __str__(self):
+        return 'GMRES(%d, %s)' % (self.restart, self.ortho)
+
+    # Workspace for a basis of k+1 vectors of length n
+    def workspace(self, n, k):
+        if self.V is None or self.V.shape != (k+1, n):
+            self.V = np.empty((k+1, n))
+            self.H = np.zeros((k+1, k))
+            self.cs = np.zeros(k)
+            self.sn = np.zeros(k)
+            self.g = np.zeros(k+1)
+            self.h = np.zeros(k+1)
+            self.tmp = np.empty(n)
+
+    # Solve A x = b to relative residual tol. Returns (conv, iters, x).
+    def solve(self, A, b, maxiters=500, tol=1.0e-8, precond=None, x0=None):
+        n = len(b)
+        k = max(1, min(self.restart, maxiters))
+        self.workspace(n, k)
+        (V, H, g) = (self.V, self.H, self.g)
+        self.resids = []
+        self.iterTimes = []
+
+        matvec = matvecInto(A)
+        if precond is None:
+            applyPrec = lambda v: v
+        else:
+            applyPrec = precond.applyRight
+
+        # Initial residual, in the first basis vector
+        if x0 is None:
+            x = np.zeros(n)
+            V[0] = b
+        else:
+            x = np.array(x0, dtype=np.double)
+            matvec(x, V[0])
+            np.subtract(b, V[0], out=V[0])
+        bNorm = npla.norm(b)
+        target = tol*bNorm
+        beta = npla.norm(V[0])
+
+        iters = 0
+        conv = beta <= target
+        while not conv and iters < maxiters:
+            V[0] /= beta
+            g.fill(0.0)
+            g[0] = beta
+
+            j = 0
+            while True:
+                t0 = time.perf_counter()
+                w = V[j+1]
+                matvec(applyPrec(V[j]), w)
+                hNext = self.orthogonalize(j, w)
+                H[:j+1, j] = self.h[:j+1]
+                H[j+1, j] = hNext
+                if hNext > 0.0:
+                    w /= hNext
+                resid = self.rotate(j)
+
+                iters += 1
+                self.resids.append(resid)
+                self.iterTimes.append(time.perf_counter() - t0)
+                if self.verb>1:
+                    tab0 = Tab()
+                    print(tab0, 'GMRES iter %4d resid=%12.5g' % (iters, resid))
+
+                j += 1
+                # hNext=0 is a lucky breakdown: the solution is in the
+                # current space
+                if (resid <= target or hNext == 0.0 or j == k
+                        or iters >= maxiters):
+                    break
+
+            # Update x with the minimizer over this cycle's space
+            y = la.solve_triangular(H[:j, :j], g[:j])
+            np.dot(y, V[:j], out=self.tmp)
+            x += applyPrec(self.tmp)
+
+            if resid <= target:
+                conv = True
+            elif iters < maxiters:
+                # Restart from the true residual
+                matvec(x, V[0])
+                np.subtract(b, V[0], out=V[0])
+                beta = npla.norm(V[0])
+                conv = beta <= target
+
+        if self.verb>0:
+            tab0 = Tab()
+            print(tab0, '%s: conv=%s, iters=%d, resid=%12.5g, |b|=%12.5g' % (
+                self, conv, iters, self.resids[-1] if iters > 0 else beta,
+                bNorm))
+        return (conv, iters, x)
+
+    # Apply the earlier Givens rotations to column j of H, then the one that
+    # zeros its subdiagonal entry, and rotate g to match. Returns the new
+    # residual estimate |g[j+1]|.
+    def rotate(self, j):
+        (H, cs, sn, g) = (self.H, self.cs, self.sn, self.g)
+        for l in range(j):
+            (a, c) = (H[l, j], H[l+1, j])
+            H[l, j] = cs[l]*a + sn[l]*c
+            H[l+1, j] = -sn[l]*a + cs[l]*c
+        hNext = H[j+1, j]
+        d = np.hypot(H[j, j], hNext)
+        if d == 0.0:
+            (cs[j], sn[j]) = (1.0, 0.0)
+        else:
+            (cs[j], sn[j]) = (H[j, j]/d, hNext/d)
+        H[j, j] = d
+        H[j+1, j] = 0.0
+        g[j+1] = -sn[j]*g[j]
+        g[j] = cs[j]*g[j]
+        return abs(g[j+1])
+
+    # Orthogonalize w against the first j+1 basis vectors, in place, with
+    # the coefficients in self.h[:j+1]. Returns |w| afterwards.
+    def orthogonalize(self, j, w):
+        if self.timer is not None:
+            t = self.timer.start()
+        Vj = self.V[:j+1]
+        h = self.h[:j+1]
+        if self.ortho == 'cgs2':
+            np.dot(Vj, w, out=h)
+            w -= np.dot(h, Vj, out=self.tmp)
+            c = np.dot(Vj, w)
+            w -= np.dot(c, Vj, out=self.tmp)
+            h += c
+        else:
+            for l in range(j+1):
+                h[l] = np.dot(Vj[l], w)
+                daxpy(Vj[l], w, a=-h[l])
+        hNext = npla.norm(w)
+        if self.timer is not None:
+            self.timer.stop('orthog', t)
+        return hNext
+
+
+# One-shot solve with a fresh solver. Returns (conv, iters, x).
+def GMRES(A, b, maxiters=500, tol=1.0e-8, verb=0, precond=None, x0=None,
+        restart=50, ortho='mgs'):
+    solver = GMRESSolver(restart=restart, ortho=ortho, verb=verb)
+    return solver.solve(A, b, maxiters=maxiters, tol=tol, precond=precond,
+        x0=x0)
+
+
+if __name__=='__main__':
+
+    import argparse
+    from FDLaplacianND import FDLaplacianND
+    from BasicPreconditioner import ILURightPreconditioner
+    parser = argparse.ArgumentParser(description='GMRES(k) timing')
+    parser.add_argument('--m', type=int, default=300,
+        help='grid size of the 2D convection-diffusion test matrix')
+    parser.add_argument('--restart', nargs='+', type=int, default=[20, 50])
+    parser.add_argument('--ortho', default='mgs', choices=['mgs', 'cgs2'])
+    parser.add_argument('--maxIters', type=int, default=500)
+    parser.add_argument('--tol', type=float, default=1.0e-8)
+    parser.add_argument('--prec', default='none', choices=['none', 'ilu'])
+    args = parser.parse_args()
+
+    # Laplacian plus a first-order upwind convection term, so that the
+    # matrix is nonsymmetric
+    m = args.m
+    L = FDLaplacianND(0.0, 1.0, m, 2)
+    n = L.shape[0]
+    h = 1.0/(m+1)
+    C = sp.diags([np.ones(n), -np.ones(n-1)], [0, -1])/h
+    A = sp.csr_matrix(-L + 10.0*C)
+    b = np.ones(n)
+    prec = None if args.prec == 'none' else ILURightPreconditioner(A)
+
+    print('n=%d, basis MB per restart length: %s' % (n,
+        ', '.join('%d: %.4g' % (k, 8.0*(k+1)*n/2.0**20) for k in args.restart)))
+    print('%8s %6s %8s %12s %12s %14s' % ('restart', 'conv', 'iters',
+        'resid', 'time (s)', 'per iter (s)'))
+    for k in args.restart:
+        solver = GMRESSolver(restart=k, ortho=args.ortho)
+        t0 = time.perf_counter()
+        (conv, iters, x) = solver.solve(A, b, maxiters=args.maxIters,
+            tol=args.tol, precond=prec)
+        elapsed = time.perf_counter() - t0
+        trueResid = npla.norm(b - A*x)/npla.norm(b)
+        print('%8d %6s %8d %12.5g %12.5g %14.5g' % (k, conv, iters,
+            trueResid, elapsed, np.mean(solver.iterTimes)))
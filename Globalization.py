@@ -0,0 +1,207 @@
+import numpy as np
+import numpy.linalg as npla
+
+# Globalization strategies for Newton's method: rules for how much of the
+# Newton step du to take.
+#
+# Usage from a Newton loop, after solving J du = -F (to relative tolerance
+# eta):
+#   glob.reset()                      before the first iteration
+#   (ok, r1, stepNorm, trials) = glob.step(evalStep, du, F, r, J, eta)
+#
+# evalStep(s) is supplied by the driver: it forms the trial point u+s,
+# evaluates the residual there and returns its norm. The last trial
+# evaluated is the one accepted, so the driver can keep the trial point
+# and residual in its own buffers. Every trial costs one residual
+# evaluation; trials-1 is the number of rejected trials (backtracks).
+#
+# The line searches work on the merit function phi(lam) = |F(u+lam*du)|^2/2,
+# whose slope at lam=0 is F.J du <= -(1-eta)|F|^2.
+class Globalization:
+    needsTranspose = False
+
+    def reset(self):
+        pass
+
+    # Workspace for trial steps
+    def trialStep(self, du, lam):
+        if getattr(self, 'work', None) is None or len(self.work) != len(du):
+            self.work = np.empty_like(du)
+        return np.multiply(du, lam, out=self.work)
+
+
+# Always take the full Newton step
+class FullStep(Globalization):
+    def __str__(self):
+        return 'FullStep'
+
+    def step(self, evalStep, du, F, r, J=None, eta=0.0):
+        r1 = evalStep(du)
+        return (True, r1, npla.norm(du), 1)
+
+
+# Cut the step by a fixed factor until the residual norm has decreased by
+# a fraction decrease*lam
+class Backtracking(Globalization):
+    def __init__(self, factor=0.5, maxBack=20, decrease=1.0e-4):
+        self.factor = factor
+        self.maxBack = maxBack
+        self.decrease = decrease
+
+    def __str__(self):
+        return 'Backtracking(factor=%g, maxBack=%d)' % (self.factor,
+            self.maxBack)
+
+    def step(self, evalStep, du, F, r, J=None, eta=0.0):
+        lam = 1.0
+        for j in range(self.maxBack+1):
+            r1 = evalStep(self.trialStep(du, lam))
+            if r1 < (1.0 - self.decrease*lam)*r:
+                return (True, r1, lam*npla.norm(du), j+1)
+            lam *= self.factor
+        return (False, r1, 0.0, self.maxBack+1)
+
+
+# Armijo backtracking with step lengths from quadratic or cubic models of
+# phi (J. E. Dennis and R. B. Schnabel, Numerical Methods for Unconstrained
+# Optimization and Nonlinear Equations, Alg. A6.3.1). The first backtrack
+# minimizes the quadratic through phi(0), phi'(0) and phi(1); with
+# interp='cubic' the later ones use the cubic through the two most recent
+# trials. Each new lam is safeguarded to [lamLow, lamHigh] times the last.
+class ArmijoLineSearch(Globalization):
+    def __init__(self, interp='cubic', sigma=1.0e-4, maxBack=20,
+                lamLow=0.3, lamHigh=0.5):
+        if interp not in ('quadratic', 'cubic'):
+            raise ValueError('unknown line search interpolation: %s' % interp)
+        self.interp = interp
+        self.sigma = sigma
+        self.maxBack = maxBack
+        self.lamLow = lamLow
+        self.lamHigh = lamHigh
+
+    def __str__(self):
+        return 'ArmijoLineSearch(%s, sigma=%g, maxBack=%d)' % (self.interp,
+            self.sigma, self.maxBack)
+
+    def step(self, evalStep, du, F, r, J=None, eta=0.0):
+        phi0 = 0.5*r*r
+        slope = -(1.0 - eta)*r*r
+
+        lam = 1.0
+        lamPrev = None
+        phiPrev = None
+        for j in range(self.maxBack+1):
+            r1 = evalStep(self.trialStep(du, lam))
+            phi = 0.5*r1*r1
+            if phi <= phi0 + self.sigma*lam*slope:
+                return (True, r1, lam*npla.norm(du), j+1)
+            if not np.isfinite(phi):
+                lamNew = self.lamLow*lam
+            elif lamPrev is None or self.interp == 'quadratic':
+                lamNew = -slope*lam*lam/(2.0*(phi - phi0 - slope*lam))
+            else:
+                lamNew = self.cubicMin(phi0, slope, lam, phi, lamPrev, phiPrev)
+            (lamPrev, phiPrev) = (lam, phi)
+            lam = min(max(lamNew, self.lamLow*lam), self.lamHigh*lam)
+        return (False, r1, 0.0, self.maxBack+1)
+
+    # Minimizer of the cubic through phi(0), phi'(0), phi(lam), phi(lamPrev)
+    def cubicMin(self, phi0, slope, lam, phi, lamPrev, phiPrev):
+        d1 = phi - phi0 - slope*lam
+        d2 = phiPrev - phi0 - slope*lamPrev
+        den = lam - lamPrev
+        a = (d1/lam**2 - d2/lamPrev**2)/den
+        b = (-lamPrev*d1/lam**2 + lam*d2/lamPrev**2)/den
+        if a == 0.0:
+            return -slope/(2.0*b)
+        disc = b*b - 3.0*a*slope
+        if disc < 0.0:
+            return self.lamHigh*lam
+        return (-b + np.sqrt(disc))/(3.0*a)
+
+
+# Dogleg trust region (Powell). The step is the Newton step if it fits in
+# the trust region, the steepest-descent (Cauchy) step to its boundary if
+# even that doesn't fit, and otherwise the point where the path from the
+# Cauchy point to the Newton point leaves the region. The radius is
+# adjusted from the ratio of actual to predicted reduction of |F|^2, where
+# the prediction is the linear model |F + J s|^2. Needs products with J and
+# J^T, so it can't be used with a JFNK operator.
+class DoglegTrustRegion(Globalization):
+    needsTranspose = True
+
+    def __init__(self, delta0=None, deltaMax=1.0e10, eta1=0.25, eta2=0.75,
+                shrink=0.25, grow=2.0, maxReject=20):
+        self.delta0 = delta0
+        self.deltaMax = deltaMax
+        self.eta1 = eta1
+        self.eta2 = eta2
+        self.shrink = shrink
+        self.grow = grow
+        self.maxReject = maxReject
+        self.reset()
+
+    def __str__(self):
+        return 'DoglegTrustRegion(eta1=%g, eta2=%g, maxReject=%d)' % (
+            self.eta1, self.eta2, self.maxReject)
+
+    def reset(self):
+        self.delta = self.delta0
+
+    def step(self, evalStep, du, F, r, J=None, eta=0.0):
+        normN = npla.norm(du)
+        if self.delta is None:
+            self.delta = normN
+
+        # Cauchy point: minimizer of the linear model along -g, g = J^T F
+        g = J.T.dot(F)
+        Jg = J.dot(g)
+        gg = np.dot(g, g)
+        sC = -(gg/np.dot(Jg, Jg))*g
+        normC = npla.norm(sC)
+
+        for j in range(self.maxReject+1):
+            delta = self.delta
+            if normN <= delta:
+                s = du
+            elif normC >= delta:
+                s = (delta/normC)*sC
+            else:
+                # sC + tau*(du - sC) with |s| = delta
+                d = du - sC
+                a = np.dot(d, d)
+                b = 2.0*np.dot(sC, d)
+                c = normC*normC - delta*delta
+                tau = (-b + np.sqrt(b*b - 4.0*a*c))/(2.0*a)
+                s = sC + tau*d
+            normS = npla.norm(s)
+
+            r1 = evalStep(s)
+            pred = r*r - npla.norm(F + J.dot(s))**2
+            ratio = (r*r - r1*r1)/pred if pred > 0.0 else -1.0
+            if not np.isfinite(r1):
+                ratio = -1.0
+
+            if ratio < self.eta1:
+                self.delta = self.shrink*min(delta, normS)
+                continue
+            if ratio > self.eta2 and normS >= 0.99*delta:
+                self.delta = min(self.grow*delta, self.deltaMax)
+            return (True, r1, normS, j+1)
+        return (False, r1, 0.0, self.maxReject+1)
+
+
+def makeGlobalization(name, maxBack=20, factor=0.5, decrease=1.0e-4):
+    if name == 'none':
+        return FullStep()
+    if name == 'backtrack':
+        return Backtracking(factor=factor, maxBack=maxBack, decrease=decrease)
+    if name == 'armijo':
+        return ArmijoLineSearch(interp='cubic', sigma=decrease,
+            maxBack=maxBack)
+    if name == 'armijo-quad':
+        return ArmijoLineSearch(interp='quadratic', sigma=decrease,
+            maxBack=maxBack)
+    if name == 'dogleg':
+        return DoglegTrustRegion(maxReject=maxBack)
+    raise ValueError('unknown globalization: %s' % name)
@@ -0,0 +1,159 @@
+import time
+import numpy as np
+from Tab import Tab
+from MultigridPreconditioner import FDProlongation
+from NewtonDirect import NewtonDirect
+from NewtonKrylov import NewtonKrylov
+from FDBratu1D import FDBratu1D
+from FDBratu2D import FDBratu2D
+from FDBurgers1D import FDBurgers1D
+
+# Grid sequencing (nested iteration) for Newton's method. The problem is
+# solved on the coarsest of a sequence of grids m_0 < m_1 < ... < m_L, with
+# m_{l-1} = (m_l - 1)//2 as in the multigrid hierarchy, and each solution is
+# interpolated (FDProlongation) to the next grid as the initial guess there.
+# The interpolated coarse solution is already within discretization error
+# of the fine solution, so the pre-asymptotic Newton iterations happen on
+# the cheap grids; the intermediate levels are capped at levelIters Newton
+# iterations and the finest level needs only a few.
+#
+# Each level stops where a cold solve on that grid would: the relative
+# tolerance is taken relative to the residual of func.initialU(), not of
+# the (much better) interpolated guess.
+#
+# Work is measured in fine-grid units: a Newton iteration on a grid with N
+# unknowns counts N/N_fine.
+class GridSequencing:
+    def __init__(self, makeProblem, solver,
+                minM=7,                 # size of the coarsest grid, at least
+                levelIters=2):          # Newton iterations on middle levels
+
+        self.makeProblem = makeProblem  # function m -> problem
+        self.solver = solver            # NewtonDirect or NewtonKrylov
+        self.minM = minM
+        self.levelIters = levelIters
+
+    # Grid sizes from the coarsest to m
+    def gridSizes(self, m):
+        sizes = [m]
+        while (sizes[-1]-1)//2 >= self.minM:
+            sizes.append((sizes[-1]-1)//2)
+        return sizes[::-1]
+
+    def solveLevel(self, func, u, maxIters):
+        solver = self.solver
+        saved = (solver.maxIters, solver.tau_r, solver.tau_a)
+        if maxIters is not None:
+            solver.maxIters = maxIters
+        rCold = np.linalg.norm(func.evalF(func.initialU()))
+        solver.tau_a = saved[1]*rCold + saved[2]
+        solver.tau_r = 0.0
+        try:
+            t0 = time.perf_counter()
+            (conv, u) = solver.solve(func, u)
+            elapsed = time.perf_counter() - t0
+        finally:
+            (solver.maxIters, solver.tau_r, solver.tau_a) = saved
+        return (conv, u, {
+            'm' : func.m,
+            'N' : func.numUnknowns(),
+            'converged' : bool(conv),
+            'newtonIters' : solver.history.numSteps(),
+            'krylovIters' : solver.totalKrylovIters,
+            'residEvals' : solver.numResidEvals,
+            'time' : elapsed})
+
+    # Solve on the m grid by grid sequencing. Returns (conv, u, func), with
+    # func the fine-grid problem; per-level statistics are in self.levels.
+    def solve(self, m):
+        sizes = self.gridSizes(m)
+        self.levels = []
+
+        func = self.makeProblem(sizes[0])
+        u = func.initialU()
+        for (l, ml) in enumerate(sizes):
+            if l > 0:
+                (P, mc) = FDProlongation(ml, func.dim)
+                func = self.makeProblem(ml)
+                u = P*u
+            # Middle levels only need to get close; the coarsest and the
+            # finest are solved to the solver's tolerance
+            maxIters = None
+            if 0 < l < len(sizes)-1:
+                maxIters = self.levelIters
+            (conv, u, stats) = self.solveLevel(func, u, maxIters)
+            self.levels.append(stats)
+            if l == 0 and not conv:
+                break
+
+        return (conv, u, func)
+
+    # Total work in fine-grid Newton iterations, and the totals of the
+    # other counts, over the levels of the last solve
+    def totalWork(self):
+        Nfine = self.levels[-1]['N']
+        return {
+            'work' : sum(s['newtonIters']*s['N']/Nfine for s in self.levels),
+            'newtonIters' : sum(s['newtonIters'] for s in self.levels),
+            'krylovIters' : sum(s['krylovIters'] for s in self.levels),
+            'time' : sum(s['time'] for s in self.levels)}
+
+    def report(self):
+        tab0 = Tab()
+        print(tab0, '%8s %10s %6s %8s %8s %12s %10s' % ('m', 'N', 'conv',
+            'newton', 'krylov', 'time (s)', 'work'))
+        Nfine = self.levels[-1]['N']
+        for s in self.levels:
+            print(tab0, '%8d %10d %6s %8d %8d %12.5g %10.4g' % (s['m'], s['N'],
+                s['converged'], s['newtonIters'], s['krylovIters'], s['time'],
+                s['newtonIters']*s['N']/Nfine))
+        tot = self.totalWork()
+        print(tab0, '%8s %10s %6s %8d %8d %12.5g %10.4g' % ('total', '', '',
+            tot['newtonIters'], tot['krylovIters'], tot['time'], tot['work']))
+
+
+if __name__=='__main__':
+
+    import argparse
+    parser = argparse.ArgumentParser(description='Grid sequencing')
+    parser.add_argument('--problem', default='bratu2d',
+        choices=['bratu1d', 'bratu2d', 'burgers1d'])
+    parser.add_argument('--m', type=int, default=127)
+    parser.add_argument('--minM', type=int, default=7)
+    parser.add_argument('--levelIters', type=int, default=2)
+    parser.add_argument('--param', type=float, default=None,
+        help='alpha (Bratu) or beta (Burgers)')
+    parser.add_argument('--solver', default='nk', choices=['direct', 'nk'])
+    parser.add_argument('--tau_r', type=float, default=1.0e-8)
+    parser.add_argument('--tau_a', type=float, default=1.0e-10)
+    args = parser.parse_args()
+
+    if args.problem == 'bratu1d':
+        param = 0.5 if args.param is None else args.param
+        makeProblem = lambda m: FDBratu1D(m=m, alpha=param)
+    elif args.problem == 'bratu2d':
+        param = 0.5 if args.param is None else args.param
+        makeProblem = lambda m: FDBratu2D(m=m, alpha=param)
+    else:
+        param = 100.0 if args.param is None else args.param
+        makeProblem = lambda m: FDBurgers1D(m=m, beta=param)
+
+    if args.solver == 'nk':
+        solver = NewtonKrylov(tau_r=args.tau_r, tau_a=args.tau_a, verb=0,
+            linVerb=0)
+    else:
+        solver = NewtonDirect(tau_r=args.tau_r, tau_a=args.tau_a, verb=0)
+
+    print('Grid sequencing')
+    seq = GridSequencing(makeProblem, solver, minM=args.minM,
+        levelIters=args.levelIters)
+    (conv, u, func) = seq.solve(args.m)
+    seq.report()
+
+    print('Single fine-grid solve')
+    single = GridSequencing(makeProblem, solver, minM=args.m)
+    (conv1, u1, func1) = single.solve(args.m)
+    single.report()
+
+    print('converged: sequenced=%s single=%s; |u_seq - u_single|_inf=%.3g'
+        % (conv, conv1, np.max(np.abs(u - u1))))
@@ -9,9 +9,13 @@ def func(x):
 
   return (f,df)
 
-rng = default_rng()
+# One seed per noise level, so each run reproduces
+logsigs = range(-16, -1)
+seeds = np.random.SeedSequence(0).spawn(len(logsigs))
 
-for logsig in range(-16, -1):
+for (k, logsig) in enumerate(logsigs):
+
+  rng = default_rng(seeds[k])
 
   sigma = 10**logsig
 
@@ -5,10 +5,9 @@
 # or v'' - alpha*f'(u^k)*v = -r(u^k), where r(u^k)= (u^k)'' - alpha*f(u^k)
 # Jacobian is K - alpha*diag(f')
 import numpy.linalg as npla
-import scipy.sparse.linalg as spla
 import numpy as np
-import scipy.sparse as sp
-from FDLaplacian1D import FDLaplacian1D
+from FDNonlinPoisson1D import FDNonlinPoisson1D
+from DirectSolvers import makeDirectSolver
 from numpy.random import default_rng
 
 # Write a function to return f(u) and its derivative
@@ -19,15 +18,18 @@ alpha = 0.5
 
 # Set up an m by m matrix for FD discretization of the Laplacian
 m = 500
-K = FDLaplacian1D(-1.0, 1.0, m)
+prob = FDNonlinPoisson1D(m=m, alpha=alpha, rhsFunc=RHSFunc)
 
 # Set initial guess
 
 
-# RNG
-rng = default_rng()
+# One seed per noise level, so each run reproduces. ParameterSweep.py runs
+# this kind of study in parallel.
+logsigs = range(-16,0)
+seeds = np.random.SeedSequence(0).spawn(len(logsigs))
 
-for logsig in range(-16,0):
+for (k, logsig) in enumerate(logsigs):
+  rng = default_rng(seeds[k])
   sigma = 10**logsig
   tau_r = 1.0e-10
   tau_a = 1.0e-10
@@ -39,23 +41,26 @@ for logsig in range(-16,0):
 
   maxIter = 20 # if it doesn't converge in a few iters, it probably won't ever
   conv = False
+  r = np.empty(m)
+  J = None
+  linSolver = None  # banded LU for the tridiagonal J, set up once
   r0 = RHSFunc(u0)[0]
   normR0 = npla.norm(r0)
 
   # Newton iteration for K u = f(u)
   print('%6s %12s %20s %20s' % ('iter', '|dr|/|r|', '|r|/|r0|', '|du|'))
   for i in range(maxIter):
-    fAndDf = RHSFunc(u0)        # Evaluate f(u^k) and f'(u^k)
-    f = fAndDf[0]
-    df = fAndDf[1]
-    J = K - alpha*sp.diags([df],[0])  # Jacobian matrix (discrete Frechet deriv)
-    r = K*u0 - alpha*f                # Current residual
+    J = prob.evalJ(u0, J_out=J)  # Jacobian matrix (discrete Frechet deriv)
+    prob.evalF(u0, out=r)        # Current residual
     # Perturb the residual
-    rPert = np.array([r[j]*(1.0 + rng.normal(scale=sigma)) for j in range(m)])
+    rPert = r*(1.0 + rng.normal(scale=sigma, size=m))
     pertNorm = npla.norm(rPert - r)/npla.norm(r)
 
     # Step eqn is: J*v + r = 0, or (K-alpha*diag(f'(u^k)))*v=alpha*f(u^k)-(u^k)''
-    newtStep = spla.spsolve(J, -rPert)    # Solve for step
+    if linSolver is None:
+      linSolver = makeDirectSolver('auto', J)
+    linSolver.factor(J)
+    newtStep = linSolver.solve(-rPert)    # Solve for step
     normR = npla.norm(r)             # Compute residual norm
     normDelta = npla.norm(newtStep)  # Compute step norm
     u0 = u0 + newtStep          # Update solution
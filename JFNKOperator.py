@@ -0,0 +1,24 @@
+import numpy as np
+import scipy.sparse.linalg as spla
+from NewtonFDDeriv import FDDifferentiator
+
+# Jacobian-free approximation to the Jacobian of func at u. Products J*v are
+# formed by finite differencing func.evalF along v, using the stencil and
+# step size of an FDDifferentiator. F0 = func.evalF(u) is reused, so with
+# the default one-sided stencil each product costs one residual evaluation.
+class JFNKOperator(spla.LinearOperator):
+    def __init__(self, func, u, F0, diff=FDDifferentiator(1)):
+        N = len(u)
+        super().__init__(dtype=np.double, shape=(N,N))
+        self.func = func
+        self.u = u
+        self.F0 = F0
+        self.diff = diff
+        self.numResidEvals = 0
+
+    def evalF(self, w):
+        self.numResidEvals += 1
+        return self.func.evalF(w)
+
+    def _matvec(self, v):
+        return self.diff.dirDeriv(self.evalF, self.u, np.ravel(v), F0=self.F0)
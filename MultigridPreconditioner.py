@@ -0,0 +1,131 @@
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+from BasicPreconditioner import BasicPreconditioner
+
+# Linear interpolation from a coarse to a fine grid of interior points on an
+# interval with homogeneous Dirichlet BCs. The fine grid has m interior
+# points; the coarse grid has mc=(m-1)//2. When m=2^k-1 the coarse points are
+# exactly every other fine point and this is the usual 1-2-1 prolongation;
+# otherwise the hat functions of the coarse grid are evaluated at the fine
+# points. Returns the m by mc prolongation matrix and mc.
+def FDProlongation1D(m):
+    mc = (m-1)//2
+
+    # Positions of fine points in coarse-grid units; coarse point j is at j+1,
+    # the boundaries are at 0 and mc+1
+    t = np.arange(1, m+1)*(mc+1)/np.double(m+1)
+    left = np.floor(t).astype(np.int64)
+    w = t - left
+
+    rows = []
+    cols = []
+    vals = []
+    # Weight on the coarse point to the left
+    ok = (left >= 1) & (left <= mc)
+    rows.append(np.nonzero(ok)[0])
+    cols.append(left[ok]-1)
+    vals.append(1.0 - w[ok])
+    # Weight on the coarse point to the right
+    ok = (left+1 <= mc) & (w > 0.0)
+    rows.append(np.nonzero(ok)[0])
+    cols.append(left[ok])
+    vals.append(w[ok])
+
+    P = sp.csr_matrix((np.concatenate(vals),
+        (np.concatenate(rows), np.concatenate(cols))), shape=(m,mc))
+    return (P, mc)
+
+# Prolongation on an m^dim grid, numbered as in FDLaplacianND, built as a
+# tensor product of 1D prolongations.
+def FDProlongation(m, dim):
+    (P1, mc) = FDProlongation1D(m)
+    P = P1
+    for d in range(1, dim):
+        P = sp.kron(P1, P, format='csr')
+    return (P, mc)
+
+
+# One level of the multigrid hierarchy: the operator, its smoother, and
+# the transfer operators to the next coarser level.
+class MGLevel:
+    def __init__(self, A, P, smoother, omega):
+        self.A = A
+        self.P = P
+        self.R = P.transpose().tocsr()
+        self.smoother = smoother
+        self.omega = omega
+        if smoother == 'jacobi':
+            self.Dinv = 1.0/A.diagonal()
+        else:
+            self.L = sp.tril(A, format='csr')
+            self.U = sp.triu(A, format='csr')
+
+    def smooth(self, x, b, sweeps, forward=True):
+        for s in range(sweeps):
+            r = b - self.A*x
+            if self.smoother == 'jacobi':
+                x += self.omega*self.Dinv*r
+            elif forward:
+                x += spla.spsolve_triangular(self.L, r, lower=True)
+            else:
+                x += spla.spsolve_triangular(self.U, r, lower=False)
+        return x
+
+
+# Geometric multigrid V-cycle used as a right preconditioner for operators
+# discretized on the structured grids of FDLaplacian1D/FDLaplacian2D/
+# FDLaplacian3D. Coarse operators are formed by Galerkin projection
+# R*A*P with R=P^T, so the diagonal terms of a Jacobian (e.g., the exp(-u)
+# term in Bratu) are carried down to the coarse levels automatically.
+# Smoothing is weighted Jacobi or Gauss-Seidel (forward before the coarse
+# correction, backward after, so the cycle is symmetric); the coarsest level
+# is solved directly.
+class MGRightPreconditioner(BasicPreconditioner):
+    def __init__(self, A, m, dim,
+                smoother='jacobi',      # 'jacobi' or 'gs'
+                nu1=2,                  # pre-smoothing sweeps
+                nu2=2,                  # post-smoothing sweeps
+                omega=None,             # Jacobi weight, default 2d/(2d+1)
+                maxCoarse=500,          # solve directly below this size
+                maxLevels=20):
+
+        if smoother not in ('jacobi', 'gs'):
+            raise ValueError('unknown multigrid smoother: %s' % smoother)
+        if omega is None:
+            omega = 2.0*dim/(2.0*dim + 1.0)
+
+        self.nu1 = nu1
+        self.nu2 = nu2
+        self.levels = []
+
+        # Copied, since the caller may later overwrite A's values in place
+        # (e.g., evalJ with J_out)
+        A = sp.csr_matrix(A, copy=True)
+        while (A.shape[0] > maxCoarse and m >= 3
+                and len(self.levels) < maxLevels-1):
+            (P, mc) = FDProlongation(m, dim)
+            level = MGLevel(A, P, smoother, omega)
+            self.levels.append(level)
+            A = (level.R*(A*P)).tocsr()
+            m = mc
+
+        self.coarseLU = spla.splu(A.tocsc())
+
+    def __str__(self):
+        return 'MG(levels=%d, nu1=%d, nu2=%d)' % (len(self.levels)+1,
+            self.nu1, self.nu2)
+
+    def vcycle(self, l, b):
+        if l == len(self.levels):
+            return self.coarseLU.solve(b)
+
+        level = self.levels[l]
+        x = level.smooth(np.zeros_like(b), b, self.nu1, forward=True)
+        r = b - level.A*x
+        x += level.P*self.vcycle(l+1, level.R*r)
+        x = level.smooth(x, b, self.nu2, forward=False)
+        return x
+
+    def applyRight(self, vec):
+        return self.vcycle(0, np.ravel(vec).astype(np.double))
@@ -0,0 +1,218 @@
+import numpy.linalg as npla
+import scipy.sparse.linalg as spla
+import numpy as np
+from Tab import Tab
+from ConvergenceHistory import ConvergenceHistory
+from PhaseTimer import PhaseTimer
+from DirectSolvers import makeDirectSolver
+from Globalization import makeGlobalization
+
+# Newton's method with a sparse direct solve for each step, for problems
+# with the evalF/evalJ interface used by NewtonKrylov (e.g., FDBratu1D,
+# FDNonlinPoisson1D, FDBurgers1D, FDBratu2D).
+#
+# The linear solver (see DirectSolvers.py) keeps its ordering and band
+# structure between iterations and only refactors numerically. 'auto' picks
+# a banded LU for matrices of bandwidth <= 2 (the 1D problems) and sparse
+# LU otherwise; 'spsolve' calls spla.spsolve from scratch every time.
+#
+# With maxChord>0 the method becomes a chord/Shamanskii iteration: a
+# factorization is reused for up to maxChord further steps (skipping evalJ
+# as well) as long as each step reduces the residual by at least a factor
+# chordRate.
+#
+# Steps are globalized as selected by globalization (see Globalization.py):
+# 'backtrack' cuts the step length by backtrackFactor until the residual
+# norm decreases by a fraction decrease*(step length); 'armijo' and
+# 'armijo-quad' backtrack with cubic/quadratic interpolation; 'dogleg' is
+# a trust region; 'none' takes full Newton steps. maxBack bounds the
+# number of rejected trials per step. The problem's in-place evalF(u, out=)
+# and evalJ(u, J_out=) are used, so the Jacobian matrix and the solution
+# and residual vectors are allocated once per solve.
+#
+# residPerturb, if given, maps the residual to the right-hand side of the
+# step solve, e.g., to add noise as in InexactNewtonNonlinPoisson.py; the
+# convergence test and the globalization still see the true residual.
+class NewtonDirect:
+    def __init__(self,
+                maxIters=20,            # maximum Newton iterations
+                tau_r=1.0e-14,          # relative residual tolerance
+                tau_a=1.0e-14,          # absolute residual tolerance
+                linSolver='auto',       # 'auto', 'lu', 'banded', 'spsolve'
+                maxChord=0,             # max steps reusing a factorization
+                chordRate=0.5,          # required reduction for reuse
+                globalization='backtrack', # see above
+                maxBack=20,             # max backtracks per step
+                backtrackFactor=0.5,    # step length reduction per backtrack
+                decrease=1.0e-4,        # required relative residual decrease
+                residPerturb=None,      # F -> F used in the step solve
+                verb=1):                # verbosity
+
+        self.maxIters = maxIters
+        self.tau_r = tau_r
+        self.tau_a = tau_a
+        self.linSolver = linSolver
+        self.maxChord = maxChord
+        self.chordRate = chordRate
+        self.maxBack = maxBack
+        self.backtrackFactor = backtrackFactor
+        self.decrease = decrease
+        self.residPerturb = residPerturb
+        self.globalization = makeGlobalization(globalization, maxBack=maxBack,
+            factor=backtrackFactor, decrease=decrease)
+        self.verb = verb
+        self.timer = PhaseTimer()
+
+    def describe(self):
+        tab0 = Tab()
+        tab1 = Tab()
+        print(tab0, '='*60)
+        print(tab0, 'Newton solver with sparse direct linear solves')
+        print(tab1, 'Max iters: ', self.maxIters)
+        print(tab1, 'Tolerance: tau_r=%12.5g, tau_a=%12.5g' %
+            (self.tau_r, self.tau_a))
+        print(tab1, 'Linear solver: ', self.linSolver)
+        if self.maxChord > 0:
+            print(tab1, 'Chord steps: max=%d, required rate=%g' %
+                (self.maxChord, self.chordRate))
+        print(tab1, 'Globalization: ', self.globalization)
+
+    # Solve J(u) X = B with one factorization for all the columns of B (or
+    # for a single vector B), e.g., for the sensitivities of a converged
+    # solution. The direct solvers take the whole block in one call.
+    # Returns (True, X).
+    def solveJacobian(self, func, u, B):
+        J = func.evalJ(u)
+        if self.linSolver == 'spsolve':
+            return (True, spla.spsolve(J.tocsc(), B))
+        solver = makeDirectSolver(self.linSolver, J)
+        solver.factor(J)
+        return (True, solver.solve(B))
+
+    def solve(self, func, uInit):
+
+        if self.verb>0:
+            self.describe()
+
+        tab0 = Tab()
+        tab1 = Tab()
+
+        timer = self.timer
+        timer.reset()
+
+        u0 = uInit.copy()
+        u1 = np.empty_like(u0)
+        F0 = np.empty_like(u0)
+        F1 = np.empty_like(u0)
+        J = None
+
+        t = timer.start()
+        func.evalF(u0, out=F0)
+        timer.stop('evalF', t)
+        r0 = npla.norm(F0)
+        r = r0
+
+        self.numResidEvals = 1
+        self.numJacEvals = 0
+        self.numFactorizations = 0
+        self.numSymbolic = 0
+        self.totalKrylovIters = 0
+
+        # The solver is chosen when the first Jacobian is seen
+        solver = None
+        stepsOnFactor = 0
+        rPrev = None
+
+        self.history = ConvergenceHistory(self.maxIters, verb=self.verb,
+            prefix=str(tab1)+' ')
+        hist = self.history
+
+        glob = self.globalization
+        glob.reset()
+
+        # Residual at the trial point u0+s, into u1 and F1
+        def evalStep(s):
+            t = timer.start()
+            np.add(u0, s, out=u1)
+            timer.stop('update', t)
+            t = timer.start()
+            func.evalF(u1, out=F1)
+            timer.stop('evalF', t)
+            self.numResidEvals += 1
+            return npla.norm(F1)
+
+        for i in range(self.maxIters):
+
+            hist.record(i, residNorm=r)
+
+            if r <= r0*self.tau_r + self.tau_a:
+                hist.emit(i)
+                if self.verb>0:
+                    print(tab0, 'Converged!')
+                return (True, u0)
+
+            # Reuse the current factorization if chord steps are allowed
+            # and the last step converged fast enough
+            reuse = (solver is not None and self.maxChord > 0
+                and stepsOnFactor <= self.maxChord
+                and r <= self.chordRate*rPrev)
+            rPrev = r
+
+            if not reuse:
+                t = timer.start()
+                J = func.evalJ(u0, J_out=J)
+                timer.stop('evalJ', t)
+                self.numJacEvals += 1
+
+            FStep = F0
+            if self.residPerturb is not None:
+                FStep = self.residPerturb(F0)
+
+            if self.linSolver == 'spsolve':
+                t = timer.start()
+                du = spla.spsolve(J.tocsc(), -FStep)
+                timer.stop('linSolve', t)
+                self.numFactorizations += 1
+                self.numSymbolic += 1
+            else:
+                if not reuse:
+                    if solver is None:
+                        solver = makeDirectSolver(self.linSolver, J)
+                        self.directSolver = solver
+                    t = timer.start()
+                    solver.factor(J)
+                    timer.stop('factor', t)
+                    stepsOnFactor = 0
+                    self.numFactorizations = solver.numFactorizations
+                    self.numSymbolic = solver.numSymbolic
+                t = timer.start()
+                du = solver.solve(-FStep)
+                timer.stop('linSolve', t)
+                stepsOnFactor += 1
+
+            # Take (part of) the step; the accepted trial point and its
+            # residual are left in u1 and F1
+            (ok, r1, stepNorm, trials) = glob.step(evalStep, du, F0, r, J=J)
+            if not ok:
+                hist.record(i, stepNorm=0.0, backtracks=trials-1)
+                hist.emit(i)
+                if self.verb>0:
+                    print(tab0, 'Globalization failed!')
+                return (False, u0)
+
+            (u0, u1) = (u1, u0)
+            (F0, F1) = (F1, F0)
+            r = r1
+            hist.record(i, stepNorm=stepNorm, backtracks=trials-1)
+            hist.emit(i)
+
+        hist.record(self.maxIters, residNorm=r)
+        if r <= r0*self.tau_r + self.tau_a:
+            hist.emit(self.maxIters)
+            if self.verb>0:
+                print(tab0, 'Converged!')
+            return (True, u0)
+
+        if self.verb>0:
+            print(tab0, 'Newton failed to converge!')
+        return (False, u0)
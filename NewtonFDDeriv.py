@@ -1,13 +1,33 @@
 import numpy as np
+import numpy.linalg as npla
 from Tab import Tab
-
+from ConvergenceHistory import ConvergenceHistory
+
+# Finite-difference derivatives of f with a stencil of the given order.
+#
+# With vectorized=True, f must take arrays elementwise: all the offsets of
+# a stencil, for every base point in an array x, are then evaluated in a
+# single call f(X), with X of shape x.shape + (number of offsets,), and
+# the derivative is a contraction of the result with the weights. Without
+# it, f is called once per offset, as for a scalar f.
+#
+# A caller that already has f(x) can pass it as fx, and the stencil's zero
+# offset then costs nothing; deriv() and deriv2() at the same x can share
+# it that way. numCalls and numPoints count the calls of f and the points
+# evaluated.
+#
+# richardson() chooses h itself: central differences with steps h0, h0/2,
+# h0/4, ... are extrapolated in a Neville tableau (Ridders' method), and
+# for each x the entry with the smallest error estimate is returned, along
+# with that estimate. In vectorized mode the whole tableau is one call.
 class FDDifferentiator:
-    def __init__(self, order=1, hFactor=1):
+    def __init__(self, order=1, hFactor=1, vectorized=False):
 
         self.eps = 1.022e-16
         self.p = order
         self.h = hFactor*self.eps**(1/(self.p+1))
         self.hFactor = hFactor
+        self.vectorized = vectorized
 
         stencils = {
         1 : [(0,1),(-1,1)],
@@ -25,18 +45,104 @@ class FDDifferentiator:
         self.dx = [dx*self.h for dx in stencil[0]]
         self.w = [w/self.h for w in stencil[1]]
 
-    def __str__(self):
-        return 'FDDiff(p=%d, h=%12.5g)' % (self.p, self.h)
+        self.numCalls = 0
+        self.numPoints = 0
 
-    def deriv(self, f, x):
-        df = 0.0
+    def __str__(self):
+        return 'FDDiff(p=%d, h=%12.5g%s)' % (self.p, self.h,
+            ', vectorized' if self.vectorized else '')
+
+    # f(x + offsets[i]) for every base point, stacked along a new last
+    # axis. The zero offset, if any, comes from fx when it is given.
+    def evalOffsets(self, f, x, offsets, fx=None):
+        x = np.asarray(x, dtype=np.double)
+        offsets = np.asarray(offsets, dtype=np.double)
+        zero = (offsets == 0.0)
+        known = np.any(zero) and fx is not None
+        todo = offsets[~zero] if known else offsets
+
+        F = np.empty(x.shape + offsets.shape)
+        if self.vectorized:
+            Ft = f(x[..., None] + todo)
+            self.numCalls += 1
+        else:
+            Ft = np.stack([f(x + d) for d in todo], axis=-1)
+            self.numCalls += len(todo)
+        self.numPoints += x.size*len(todo)
+
+        if known:
+            F[..., ~zero] = Ft
+            F[..., zero] = np.asarray(fx)[..., None]
+        else:
+            F[...] = Ft
+        return F
+
+    def deriv(self, f, x, fx=None):
+        F = self.evalOffsets(f, x, self.dx, fx)
+        return F.dot(self.w)
+
+    def deriv2(self, f, x, fx=None):
+        F = self.evalOffsets(f, x, (-self.h, 0.0, self.h), fx)
+        return F.dot((1.0, -2.0, 1.0))/self.h**2
+
+    # Derivative by Richardson extrapolation of central differences with
+    # steps h0/2^k, k < levels; h0 defaults to 0.1*max(|x|, 1). Returns
+    # (df, err) with err an estimate of the error of each df.
+    def richardson(self, f, x, h0=None, levels=8):
+        if levels < 2:
+            raise ValueError('Richardson extrapolation needs levels >= 2')
+        x = np.asarray(x, dtype=np.double)
+        if h0 is None:
+            h0 = 0.1*np.maximum(np.abs(x), 1.0)
+        h = np.asarray(h0)[..., None]*0.5**np.arange(levels)
+        if self.vectorized:
+            F = f(x[..., None, None] + np.stack((h, -h), axis=-1))
+            self.numCalls += 1
+        else:
+            F = np.stack([np.stack((f(x + h[..., k]), f(x - h[..., k])),
+                axis=-1) for k in range(levels)], axis=-2)
+            self.numCalls += 2*levels
+        self.numPoints += 2*levels*x.size
+
+        # Neville tableau: T[k][j] has error O(h_k^(2j+2)). Keep the entry
+        # with the smallest error estimate for each x.
+        (df, bestErr) = (None, None)
+        prev = [(F[..., 0, 0] - F[..., 0, 1])/(2.0*h[..., 0])]
+        for k in range(1, levels):
+            row = [(F[..., k, 0] - F[..., k, 1])/(2.0*h[..., k])]
+            for j in range(1, k+1):
+                c = 4.0**j
+                row.append((c*row[j-1] - prev[j-1])/(c - 1.0))
+                err = np.maximum(np.abs(row[j] - row[j-1]),
+                    np.abs(row[j] - prev[j-1]))
+                if df is None:
+                    (df, bestErr) = (row[j], err)
+                else:
+                    better = err < bestErr
+                    df = np.where(better, row[j], df)
+                    bestErr = np.where(better, err, bestErr)
+            prev = row
+        return (df, bestErr)
+
+    # Directional derivative J(u)*v of a vector function F. The step is
+    # scaled by (1+|u|)/|v| so that h has the same meaning as in the scalar
+    # case. If F0=F(u) is supplied it is used for the zero offset of the
+    # stencil, so the one-sided p=1 formula costs one evaluation of F.
+    def dirDeriv(self, F, u, v, F0=None):
+        normV = npla.norm(v)
+        if normV == 0.0:
+            return np.zeros_like(v)
+
+        s = (1.0 + npla.norm(u))/normV
+        Jv = np.zeros_like(v)
         for dx_i, w_i in zip(self.dx, self.w):
-            f_i = f(x + dx_i)
-            df += w_i * f_i
-        return df
-
-    def deriv2(self, f, x):
-        return (f(x+self.h) + f(x-self.h) - 2.0*f(x))/self.h**2
+            if dx_i == 0.0 and F0 is not None:
+                F_i = F0
+            else:
+                F_i = F(u + (dx_i*s)*v)
+            Jv += w_i * F_i
+        Jv /= s
+        return Jv
 
 
 
@@ -46,55 +152,73 @@ class FDDifferentiator:
 
 class FDNewtonSolver1D:
     def __init__(self, maxIters=20, tau_a=1.0e-14, tau_r=1.0e-14,
-                diff=FDDifferentiator(1)):
+                diff=None, verb=1):
 
         self.maxIters = maxIters
         self.tau_a = tau_a
         self.tau_r = tau_r
+        if diff is None:
+            diff = FDDifferentiator(1)
         self.diff = diff
+        self.verb = verb
 
     def solve(self, f, xInit):
         tab0 = Tab()
         tab1 = Tab()
 
-        print(tab0, ''*60)
-        print(tab0, 'Starting Newton solver:')
-        print(tab1, 'Max iters = ', self.maxIters)
-        print(tab1, 'tau_r=%12.5g, tau_a=%12.5g' % (self.tau_r, self.tau_a))
-        print(tab1, 'diff=', self.diff)
+        if self.verb>0:
+            print(tab0, ''*60)
+            print(tab0, 'Starting Newton solver:')
+            print(tab1, 'Max iters = ', self.maxIters)
+            print(tab1, 'tau_r=%12.5g, tau_a=%12.5g' % (self.tau_r, self.tau_a))
+            print(tab1, 'diff=', self.diff)
 
         # Initialize first step
         x0 = xInit
         f0 = f(x0)
         r0 = np.abs(f0)
-        dx = 1.0
+
+        self.history = ConvergenceHistory(self.maxIters, verb=self.verb,
+            prefix=str(tab1)+' ')
+        hist = self.history
 
         # Run loop
-        print('\n', tab0, 'Newton loop')
+        if self.verb>0:
+            print('\n', tab0, 'Newton loop')
 
         for i in range(self.maxIters):
             if i>0:
                 f0 = f(x0)
             r = np.abs(f0)
-            print(tab1, 'iter %6d x=%20.15g r=%20.15g r/r0=%20.15g dx=%12.5g' %
-                (i+1, x0, r, r/r0, dx))
+            hist.record(i, residNorm=r)
 
             if r <= self.tau_r * r0 + self.tau_a:
-                print(tab0, 'Converged!')
-                print(tab1, 'iter %6d x=%25.15g r=%25.15g r/r0=%25.15g' %
-                    (i+1, x0, r, r/r0))
+                hist.emit(i)
+                if self.verb>0:
+                    print(tab0, 'Converged!')
+                    print(tab1, 'iter %6d x=%25.15g r=%25.15g r/r0=%25.15g' %
+                        (i, x0, r, r/r0))
                 return x0
 
-            df = self.diff.deriv(f, x0)
-            ddf = self.diff.deriv2(f, x0)
-            c1 = 0.5*np.abs(ddf)/np.abs(df)
-            p = self.diff.p
-            c2 = (self.diff.h)**(p/(1+p)) / np.abs(df)
-            print(tab1, '            c1=%12.5g, c2=%12.5g\n' % (c1, c2))
+            df = self.diff.deriv(f, x0, fx=f0)
             dx = -f0/df
+            (xOld, fOld) = (x0, f0)
             x0 = x0 + dx
-
-        print('Newton solver failed to converge!')
+            hist.record(i, stepNorm=np.abs(dx))
+            hist.emit(i)
+
+            # Error constants of the FD Newton step. These cost extra
+            # evaluations of f, so only compute them when they'll be shown.
+            if self.verb>1:
+                ddf = self.diff.deriv2(f, xOld, fx=fOld)
+                c1 = 0.5*np.abs(ddf)/np.abs(df)
+                p = self.diff.p
+                c2 = (self.diff.h)**(p/(1+p)) / np.abs(df)
+                print(tab1, '            x=%20.15g c1=%12.5g, c2=%12.5g\n'
+                    % (x0, c1, c2))
+
+        if self.verb>0:
+            print('Newton solver failed to converge!')
         return x0
 
 
@@ -155,3 +279,34 @@ if __name__=='__main__':
         root = newt.solve(f, x0)
         print('Found root: ', root)
         print('Error is ', np.abs(root-exact))
+
+
+    print('\n\n','='*80)
+    print('Testing vectorized stencils and Richardson extrapolation')
+    xs = np.linspace(0.5, 1.5, 1000)
+    for vec in [False, True]:
+        diff = FDDifferentiator(order=4, vectorized=vec)
+        fxs = f(xs)
+        if vec:
+            dfFD = diff.deriv(f, xs)
+            ddfFD = diff.deriv2(f, xs, fx=fxs)
+        else:
+            dfFD = np.array([diff.deriv(f, x) for x in xs])
+            ddfFD = np.array([diff.deriv2(f, x, fx=fx)
+                for (x, fx) in zip(xs, fxs)])
+        print('%s: calls of f=%d, points=%d, max err df=%10.5g, '
+            'max err d2f=%10.5g' % (diff, diff.numCalls, diff.numPoints,
+            np.max(np.abs(dfFD - df(xs))), np.max(np.abs(ddfFD - 12.0*xs*xs))))
+
+    diff = FDDifferentiator(vectorized=True)
+    (dfR, errR) = diff.richardson(f, xs)
+    print('Richardson: calls of f=%d, points=%d, max err=%10.5g, '
+        'max error estimate=%10.5g' % (diff.numCalls, diff.numPoints,
+        np.max(np.abs(dfR - df(xs))), np.max(errR)))
+    g = lambda x: np.exp(np.sin(10.0*x))
+    dg = lambda x: 10.0*np.cos(10.0*x)*g(x)
+    (dgR, errR) = diff.richardson(g, xs)
+    dg8 = FDDifferentiator(order=8, vectorized=True).deriv(g, xs)
+    print('exp(sin(10x)): Richardson max err=%10.5g, p=8 stencil max '
+        'err=%10.5g' % (np.max(np.abs(dgR - dg(xs))),
+        np.max(np.abs(dg8 - dg(xs)))))
@@ -3,8 +3,21 @@ import scipy.sparse.linalg as spla
 import numpy as np
 import scipy.sparse as sp
 from Tab import Tab
-from BasicPreconditioner import ILURightPreconditioner
-from GMRES import GMRES
+from BasicPreconditioner import BasicPreconditioner, ILURightPreconditioner
+from GMRES import GMRESSolver
+from GCRODR import GCRODRSolver
+from BlockGMRES import BlockGMRESSolver
+from NewtonFDDeriv import FDDifferentiator
+from JFNKOperator import JFNKOperator
+from ColoredJacobian import ColoredFDJacobian
+from PreconditionerManager import PreconditionerManager
+from MultigridPreconditioner import MGRightPreconditioner
+from BlockJacobiPreconditioner import BlockJacobiILUPreconditioner
+from ThreadedKernels import ThreadedCSR, makePool
+from ConvergenceHistory import ConvergenceHistory
+from ForcingTerms import makeForcing
+from Globalization import makeGlobalization
+from PhaseTimer import PhaseTimer, TimedOperator, TimedPreconditioner
 from FDBratu2D import FDBratu2D
 
 
@@ -14,12 +27,38 @@ class NewtonKrylov:
                 tau_r=1.0e-14,          # relative residual tolerance for Newton
                 tau_a=1.0e-14,          # absolute residual tolerance for Newton
                 maxLinIters=500,        # maximum iterations in linear solve
+                restart=50,             # GMRES restart length
+                recycle=0,              # GCRO-DR recycled vectors (0: GMRES)
+                warmStart=False,        # previous step as initial guess
+                blockRestart=30,        # block GMRES restart, in blocks
                 minLinTol=1.0e-8,       # minimum linear solve tolerance
                 tolFudge=0.1,           # multiplier for tol adjustment
                 fixLinTol=False,        # whether to override tol adjustment
+                forcing='fudge',        # tol adjustment: 'fudge', 'ew1', 'ew2'
+                globalization='none',   # 'none', 'backtrack', 'armijo',
+                                        # 'armijo-quad', 'dogleg'
+                maxBack=20,             # max rejected trials per step
                 reusePrecond=False,      # whether to reuse initial precond
+                precPolicy=None,        # 'rebuild', 'reuse', or 'adaptive'
+                precIterGrowth=2.0,     # adaptive: allowed Krylov slowdown
+                precMaxKrylov=None,     # adaptive: rebuild above this count
+                precDriftTol=None,      # adaptive: rebuild if u drifts
+                matrixFree=False,       # use func.evalJOperator() in GMRES
+                jfnk=False,             # use FD Jacobian-vector products
+                jfnkOrder=1,            # order of FD stencil for JFNK
+                fdJacobian=False,       # colored FD Jacobian from evalF
+                precType='ilu',         # preconditioner: 'ilu', 'mg' or
+                                        # 'bjilu' (block-Jacobi ILU)
+                precBlocks=None,        # bjilu: blocks (default: threads)
+                precOverlap=1,          # bjilu: overlap layers per block
                 iluDrop=1.0e-4,         # drop tolerance for ILU
                 iluFill=15,             # fill allowance for ILU
+                mgSmoother='jacobi',    # multigrid smoother: 'jacobi' or 'gs'
+                mgSweeps=2,             # multigrid pre/post smoothing sweeps
+                threads=1,              # threads for SpMV and bjilu
+                residPerturb=None,      # F -> F used in the step solve
+                profile=False,          # time matvecs and precond applies
+                trace=False,            # keep a timeline of all phases
                 verb=1,                 # verbosity for nonlinear solve
                 linVerb=1):             # verbosity for linear solve
 
@@ -31,11 +70,73 @@ class NewtonKrylov:
         self.minLinTol = minLinTol
         self.tolFudge = tolFudge
         self.fixLinTol = fixLinTol
+        self.forcing = makeForcing(forcing, tolFudge=tolFudge,
+            etaMin=minLinTol)
+        if globalization == 'dogleg' and jfnk:
+            raise ValueError('dogleg needs J^T, which JFNK does not provide')
+        self.globalization = makeGlobalization(globalization, maxBack=maxBack)
         self.reusePrecond = reusePrecond
+        # The old reusePrecond flag selects between the two fixed policies
+        if precPolicy is None:
+            precPolicy = 'reuse' if reusePrecond else 'rebuild'
+        self.precPolicy = precPolicy
+        self.precIterGrowth = precIterGrowth
+        self.precMaxKrylov = precMaxKrylov
+        self.precDriftTol = precDriftTol
+        self.matrixFree = matrixFree
+        self.jfnk = jfnk
+        self.jfnkOrder = jfnkOrder
+        self.fdJacobian = fdJacobian
         self.iluDrop = iluDrop
         self.iluFill = iluFill
+        if precType not in ('ilu', 'mg', 'bjilu'):
+            raise ValueError('unknown preconditioner type: %s' % precType)
+        self.precType = precType
+        self.mgSmoother = mgSmoother
+        self.mgSweeps = mgSweeps
+        self.precBlocks = threads if precBlocks is None else precBlocks
+        self.precOverlap = precOverlap
+        # One pool for the whole life of the solver, shared by the
+        # threaded matvec and the block-Jacobi preconditioner, until close()
+        self.threads = threads
+        self.pool = makePool(threads)
+        self.residPerturb = residPerturb
+        self.profile = profile
+        self.trace = trace
         self.verb = verb
         self.linVerb = linVerb
+        self.timer = PhaseTimer(trace=trace)
+        # The solver keeps its Krylov basis between Newton steps. The
+        # history already reports Krylov counts at linVerb=1, so GMRES
+        # itself only prints from linVerb=2 on.
+        linTimer = self.timer if profile else None
+        if recycle > 0:
+            self.linSolver = GCRODRSolver(restart=restart, recycle=recycle,
+                timer=linTimer, verb=max(linVerb-1, 0))
+        else:
+            self.linSolver = GMRESSolver(restart=restart, timer=linTimer,
+                verb=max(linVerb-1, 0))
+        self.warmStart = warmStart
+        self.blockRestart = blockRestart
+        self.precManager = None
+        self.precProblem = None
+
+    # Shut down the thread pool, if there is one. A solver made for a
+    # single run should be closed (or used in a with statement) so that its
+    # threads don't outlive it. It can still be used afterwards, serially;
+    # the preconditioner, which may hold the pool, is dropped.
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+            self.precManager = None
+            self.precProblem = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
     def describe(self):
         tab0 = Tab()
@@ -49,13 +150,127 @@ class NewtonKrylov:
         print(tab1, 'Newton-Krylov tolerance multiplier=%12.5g, min tol=%12.5g'%
             (self.tolFudge, self.minLinTol))
         print(tab1, 'use tolerance adjustment: ', not self.fixLinTol)
-        print(tab1, 'Linear solver: GMRES, maxIters=', self.maxLinIters)
-        print(tab1, 'Preconditioner: ILU(drop=%12.5g, fill=%d)' %
-            (self.iluDrop, self.iluFill))
-        print(tab1, 'Recycle initial preconditioner ', self.reusePrecond)
-
-
-    def solve(self, func, uInit):
+        if not self.fixLinTol:
+            print(tab1, 'Forcing term: ', self.forcing)
+        print(tab1, 'Globalization: ', self.globalization)
+        print(tab1, 'Linear solver: %s, maxIters=' % self.linSolver,
+            self.maxLinIters)
+        print(tab1, 'Warm start from previous step: ', self.warmStart)
+        if self.precType == 'mg':
+            print(tab1, 'Preconditioner: MG V-cycle(smoother=%s, sweeps=%d)' %
+                (self.mgSmoother, self.mgSweeps))
+        elif self.precType == 'bjilu':
+            print(tab1, 'Preconditioner: block-Jacobi ILU(blocks=%d, '
+                'overlap=%d, drop=%12.5g, fill=%d)' % (self.precBlocks,
+                self.precOverlap, self.iluDrop, self.iluFill))
+        else:
+            print(tab1, 'Preconditioner: ILU(drop=%12.5g, fill=%d)' %
+                (self.iluDrop, self.iluFill))
+        print(tab1, 'Preconditioner policy: ', self.makePrecManager())
+        print(tab1, 'Matrix-free Jacobian operator ', self.matrixFree)
+        print(tab1, 'Jacobian-free Newton-Krylov ', self.jfnk)
+        if self.jfnk:
+            print(tab1, 'JFNK differentiator: ', FDDifferentiator(self.jfnkOrder))
+        print(tab1, 'Colored FD Jacobian ', self.fdJacobian)
+        print(tab1, 'Threads: ', self.threads)
+
+    # Build the selected preconditioner from the assembled Jacobian. The
+    # multigrid preconditioner needs the structured grid (func.m, func.dim)
+    # on which the problem is discretized.
+    def buildPrecond(self, J, func):
+        if self.precType == 'mg':
+            return MGRightPreconditioner(J, func.m, func.dim,
+                smoother=self.mgSmoother, nu1=self.mgSweeps,
+                nu2=self.mgSweeps)
+        if self.precType == 'bjilu':
+            return BlockJacobiILUPreconditioner(J, numBlocks=self.precBlocks,
+                overlap=self.precOverlap, drop_tol=self.iluDrop,
+                fill_factor=self.iluFill, pool=self.pool)
+        return ILURightPreconditioner(J, drop_tol=self.iluDrop,
+            fill_factor=self.iluFill)
+
+    # The problem as the solver sees it: with fdJacobian, evalJ is a
+    # colored finite-difference Jacobian of evalF, on func's pattern, with
+    # the JFNK stencil order
+    def wrapProblem(self, func):
+        if self.fdJacobian:
+            return ColoredFDJacobian(func,
+                diff=FDDifferentiator(self.jfnkOrder))
+        return func
+
+    def makePrecManager(self, func=None):
+        return PreconditionerManager(lambda J: self.buildPrecond(J, func),
+            policy=self.precPolicy,
+            iterGrowth=self.precIterGrowth,
+            maxKrylovIters=self.precMaxKrylov,
+            driftTol=self.precDriftTol)
+
+    # Time and call counts per phase of the last solve. The GMRES entry is
+    # the total time in the linear solver; with profile=True, the matvec
+    # and preconditioner time spent inside it and in orthogonalization is
+    # also reported separately and gmresOther is the remainder.
+    def timingSummary(self):
+        summary = self.timer.summary()
+        if 'gmres' in summary and self.profile:
+            other = summary['gmres']['time']
+            for p in ('matvec', 'precApply', 'orthog'):
+                if p in summary:
+                    other -= summary[p]['time']
+            summary['gmresOther'] = {'time' : other,
+                'calls' : summary['gmres']['calls']}
+        return summary
+
+    def reportTiming(self):
+        tab0 = Tab()
+        print(tab0, 'Newton-Krylov timing')
+        self.timer.report(prefix=str(tab0)+' ', summary=self.timingSummary())
+
+    def writeTrace(self, filename):
+        self.timer.writeChromeTrace(filename)
+
+    # Solve J(u) X = B for all the columns of B (or a single vector B) by
+    # block GMRES, to relative tolerance tol in each column (default
+    # minLinTol). The preconditioner comes from the manager of the last
+    # solve if that was of the same problem (otherwise a fresh manager is
+    # made), rebuilt at u if its policy asks for it. As in solve(), the
+    # Jacobian is assembled only for the preconditioner or for GMRES, and a
+    # JFNK problem without evalJ is left unpreconditioned. Returns
+    # (conv, X); the number of block iterations is left in blockKrylovIters.
+    def solveJacobian(self, func, u, B, tol=None):
+        if tol is None:
+            tol = self.minLinTol
+        if self.precManager is None or self.precProblem is not func:
+            self.precManager = self.makePrecManager(func)
+            self.precProblem = func
+        func = self.wrapProblem(func)
+        havePrecMatrix = not self.jfnk or hasattr(func, 'evalJ')
+        J = None
+        if havePrecMatrix and self.precManager.needsRebuild(u):
+            J = func.evalJ(u)
+            self.precManager.build(J, u)
+        if havePrecMatrix:
+            prec = self.precManager.get()
+        else:
+            prec = BasicPreconditioner()
+        if self.jfnk:
+            F = func.evalF(u)
+            A = JFNKOperator(func, u, F, FDDifferentiator(self.jfnkOrder))
+        elif self.matrixFree:
+            A = func.evalJOperator(u)
+        else:
+            A = J if J is not None else func.evalJ(u)
+        blockSolver = BlockGMRESSolver(restart=self.blockRestart,
+            verb=max(self.linVerb-1, 0))
+        (conv, iters, X) = blockSolver.solve(A, B, maxiters=self.maxLinIters,
+            tol=tol, precond=prec)
+        self.blockKrylovIters = iters
+        return (conv, X)
+
+    # Solve F(u)=0 from uInit. A preconditioner manager (see
+    # makePrecManager) can be passed in to carry the preconditioner over
+    # from an earlier solve, e.g., at a nearby parameter value in
+    # continuation; otherwise a fresh one is made.
+    def solve(self, func, uInit, precManager=None):
 
         # Report all parameters
         if self.verb>0:
@@ -65,19 +280,88 @@ class NewtonKrylov:
         tab0 = Tab()
         tab1 = Tab()
 
-        # Make a copy of the initial estimate
+        # Time the phases of the solve
+        timer = self.timer
+        timer.reset()
+
+        self.precProblem = func
+        func = self.wrapProblem(func)
+
+        # Make a copy of the initial estimate. The iterate, the residual
+        # and the assembled Jacobian are updated in place from here on.
         u0 = uInit.copy()
+        u1 = np.empty_like(u0)
+        F0 = np.empty_like(u0)
+        F1 = np.empty_like(u0)
+        JMat = None
 
         # Evaluate residual and its norm at initial iterate
-        F0 = func.evalF(u0)
+        t = timer.start()
+        func.evalF(u0, out=F0)
+        timer.stop('evalF', t)
         r0 = npla.norm(F0)
-
-        # Newton step vector. Initialize to all ones (this will be overwritten
-        # before use)
-        du = np.ones_like(u0)
+        r = r0
+
+        # Count residual and Jacobian evaluations so that the cost of the
+        # JFNK and assembled paths can be compared
+        self.numResidEvals = 1
+        self.numJacEvals = 0
+
+        # In JFNK mode without an assembled Jacobian there's nothing to
+        # build a preconditioner from
+        if self.jfnk:
+            diff = FDDifferentiator(self.jfnkOrder)
+            havePrecMatrix = hasattr(func, 'evalJ')
+        else:
+            havePrecMatrix = True
+        if not havePrecMatrix:
+            ILU = BasicPreconditioner()
+
+        # The manager decides when the preconditioner is rebuilt
+        if precManager is None:
+            precManager = self.makePrecManager(func)
+        self.precManager = precManager
+        precMgr = self.precManager
+
+        # Per-iteration history. Printing is done by the history's console
+        # sink, attached only if verb>0.
+        self.history = ConvergenceHistory(self.maxIters, verb=self.verb,
+            linVerb=self.linVerb, prefix=str(tab1)+' ')
+        hist = self.history
+
+        glob = self.globalization
+        glob.reset()
+
+        # Residual at the trial point u0+s, into u1 and F1
+        def evalStep(s):
+            t = timer.start()
+            np.add(u0, s, out=u1)
+            timer.stop('update', t)
+            t = timer.start()
+            func.evalF(u1, out=F1)
+            timer.stop('evalF', t)
+            self.numResidEvals += 1
+            return npla.norm(F1)
+
+        # Assembled Jacobian at u, into J_out. A colored FD Jacobian is
+        # given the residual F at u, and its residual evaluations are
+        # counted with the others.
+        def evalJ(u, F, J_out):
+            if self.fdJacobian:
+                J = func.evalJ(u, J_out=J_out, F0=F)
+                self.numResidEvals += func.lastEvals
+            else:
+                J = func.evalJ(u, J_out=J_out)
+            self.numJacEvals += 1
+            return J
 
         # We'll keep a count of the total Krylov iterations
         totalKrylovIters = 0
+        duPrev = None
+
+        # Start the sequence of linear tolerances
+        forcing = self.forcing
+        forcing.reset(r0, r0*self.tau_r + self.tau_a)
 
         # Run the loop!
         if self.verb>0:
@@ -85,60 +369,150 @@ class NewtonKrylov:
 
         for i in range(self.maxIters):
 
-            # Evaluate residual at current iterate (already done if i=0)
-            if i>0:
-                F0 = func.evalF(u0)
-            # Compute residual norm
-            r = npla.norm(F0)
-
-            # Output convergence information if desired
-            if self.verb>0:
-                print(tab1, 'iter %6d r=%12.5g r/r0=%12.5g dx=%12.5g'
-                    % (i, r, r/r0, npla.norm(du)))
+            # The residual at the current iterate was computed at the
+            # start or by the globalization's last trial
+            hist.record(i, residNorm=r)
 
             # Check for convergence
             if r <= r0*self.tau_r + self.tau_a:
-                print(tab0, 'Converged!')
-                print(tab0, 'totalKrylovIters=', totalKrylovIters)
+                hist.emit(i)
+                if self.verb>0:
+                    print(tab0, 'Converged!')
+                    print(tab0, 'totalKrylovIters=', totalKrylovIters)
+                    print(tab0, 'numResidEvals=', self.numResidEvals)
+                    print(tab0, 'numJacEvals=', self.numJacEvals)
+                    print(tab0, 'numPrecBuilds=', precMgr.numBuilds)
+                self.totalKrylovIters = totalKrylovIters
                 return (True, u0)
 
-            # Compute Jacobian at current iterate
-            J = func.evalJ(u0)
+            # Compute Jacobian at current iterate. In matrix-free mode GMRES
+            # only sees the operator; the assembled matrix is formed below
+            # only if the preconditioner is to be rebuilt.
+            t = timer.start()
+            if self.jfnk:
+                J = JFNKOperator(func, u0, F0, diff)
+            elif self.matrixFree:
+                J = func.evalJOperator(u0)
+            else:
+                J = evalJ(u0, F0, JMat)
+                JMat = J
+            timer.stop('evalJ', t)
+            JSolve = J
+            if self.pool is not None and sp.issparse(J):
+                JSolve = ThreadedCSR(J, self.pool, self.threads)
+            if self.profile:
+                JSolve = TimedOperator(JSolve, timer)
 
             # Update tolerance for linear solve
             if self.fixLinTol: # Use fixed tolerance if desired (for testing)
                 tau_lin = self.minLinTol
             else: # Adjust linear tol according to nonlinear resid
-                # new linear tolerance is the larger of:
-                # (*) "fudge factor" times relative residual of nonlinear solve
-                # (*) a minimum linear tolerance.
-                # The minimum tolerance avoids pointlessly small tolerances
-                # for the linear solver
-                tau_lin = max(self.tolFudge*r/r0, self.minLinTol)
-
-            # Update the preconditioner if desired
-            if i==0 or not self.reusePrecond:
-                print(tab1, 'Building ILU prec')
-                drop = self.iluDrop
-                fill = self.iluFill
-                ILU = ILURightPreconditioner(J, drop_tol=drop, fill_factor=fill)
-
-
-            (conv,krylovIters,du)=GMRES(J, -F0,
-                maxiters=self.maxLinIters, tol=tau_lin, verb=self.linVerb,
-                precond=ILU)
-            totalKrylovIters += krylovIters
-
+                # The forcing term picks the tolerance from the residual
+                # history (see ForcingTerms.py). The default 'fudge' rule
+                # is the larger of a "fudge factor" times relative residual
+                # of nonlinear solve and a minimum linear tolerance.
+                tau_lin = forcing.next(r)
+
+            # With warmStart, the initial guess for the step is the previous
+            # step scaled to minimize |J (alpha duPrev) + F0|, which costs
+            # one product with J and is never worse than a zero guess
+            stepKrylovIters = 0
+            du0 = None
+            if self.warmStart and duPrev is not None:
+                Jd = JSolve*duPrev
+                stepKrylovIters += 1
+                JdNorm2 = np.dot(Jd, Jd)
+                if JdNorm2 > 0.0:
+                    du0 = (-np.dot(Jd, F0)/JdNorm2)*duPrev
+
+            # With residPerturb (e.g., noise), only the right-hand side of
+            # the step solve is perturbed; the convergence test and the
+            # globalization see the true residual
+            FStep = F0
+            if self.residPerturb is not None:
+                FStep = self.residPerturb(F0)
+
+            # Solve for the step, rebuilding the preconditioner when the
+            # manager asks for it. If the solve fails with an old
+            # preconditioner, rebuild and try once more.
+            for attempt in range(2):
+                built = False
+                if havePrecMatrix and precMgr.needsRebuild(u0):
+                    if self.verb>0:
+                        print(tab1, 'Building %s prec' % self.precType.upper())
+                    if self.matrixFree or self.jfnk:
+                        t = timer.start()
+                        JPrec = evalJ(u0, F0, JMat)
+                        JMat = JPrec
+                        timer.stop('evalJ', t)
+                    else:
+                        JPrec = J
+                    t = timer.start()
+                    precMgr.build(JPrec, u0)
+                    timer.stop('precBuild', t)
+                    built = True
+                if havePrecMatrix:
+                    ILU = precMgr.get()
+                prec = TimedPreconditioner(ILU, timer) if self.profile else ILU
+
+                t = timer.start()
+                (conv,krylovIters,du)=self.linSolver.solve(JSolve, -FStep,
+                    maxiters=self.maxLinIters, tol=tau_lin, precond=prec,
+                    x0=du0)
+                timer.stop('gmres', t)
+                stepKrylovIters += krylovIters
+                if havePrecMatrix:
+                    precMgr.update(krylovIters, tau_lin, conv)
+
+                if conv or built or not havePrecMatrix:
+                    break
+
+            totalKrylovIters += stepKrylovIters
+
+            # Eisenstat-Walker choice 1 needs the achieved linear residual
+            if conv and forcing.needsLinResid and not self.fixLinTol:
+                forcing.setLinResid(npla.norm(J*du + F0))
+
+            if self.jfnk:
+                self.numResidEvals += J.numResidEvals
+
+            hist.record(i, linTol=tau_lin, krylovIters=stepKrylovIters)
             if not conv:
+                hist.emit(i)
                 if self.verb>0:
                     print('Newton-Krylov: linear solver failed to converge')
+                self.totalKrylovIters = totalKrylovIters
                 return (False, u0)
-
-            # Update solution estimate
-            u0 = u0 + du
+            duPrev = du
+
+            # Update solution estimate. The accepted trial point and its
+            # residual are left in u1 and F1.
+            (ok, r1, stepNorm, trials) = glob.step(evalStep, du, F0, r, J=J,
+                eta=tau_lin)
+            if not ok:
+                hist.record(i, stepNorm=0.0, backtracks=trials-1)
+                hist.emit(i)
+                if self.verb>0:
+                    print('Newton-Krylov: globalization failed')
+                self.totalKrylovIters = totalKrylovIters
+                return (False, u0)
+            (u0, u1) = (u1, u0)
+            (F0, F1) = (F1, F0)
+            r = r1
+            hist.record(i, stepNorm=stepNorm, backtracks=trials-1)
+            hist.emit(i)
+
+        hist.record(self.maxIters, residNorm=r)
+        if r <= r0*self.tau_r + self.tau_a:
+            hist.emit(self.maxIters)
+            if self.verb>0:
+                print(tab0, 'Converged!')
+            self.totalKrylovIters = totalKrylovIters
+            return (True, u0)
 
         if self.verb>0:
             print(tab0, 'Newton-Krylov failed to converge!')
+        self.totalKrylovIters = totalKrylovIters
         return (False, u0)
 
 
@@ -153,7 +527,34 @@ if __name__=='__main__':
     parser.add_argument('--tau_a', action='store', default=1.0e-14)
     parser.add_argument('--fudge', action='store', default=0.05)
     parser.add_argument('--ilu_drop', action='store', default=1.0e-4)
+    parser.add_argument('--prec', action='store', default='ilu',
+        choices=['ilu', 'mg', 'bjilu'])
+    parser.add_argument('--precBlocks', action='store', default=None)
+    parser.add_argument('--precOverlap', action='store', default=1)
+    parser.add_argument('--threads', action='store', default=1)
+    parser.add_argument('--mgSmoother', action='store', default='jacobi',
+        choices=['jacobi', 'gs'])
     parser.add_argument('--tau_min', action='store', default=1.0e-8)
+    parser.add_argument('--forcing', action='store', default='fudge',
+        choices=['fudge', 'ew1', 'ew2'])
+    parser.add_argument('--globalization', action='store', default='none',
+        choices=['none', 'backtrack', 'armijo', 'armijo-quad', 'dogleg'])
+    parser.add_argument('--matrixFree', action='store_true', default=False)
+    parser.add_argument('--jfnk', action='store_true', default=False)
+    parser.add_argument('--jfnkOrder', action='store', default=1)
+    parser.add_argument('--fdJacobian', action='store_true', default=False)
+    parser.add_argument('--precPolicy', action='store', default=None,
+        choices=['rebuild', 'reuse', 'adaptive'])
+    parser.add_argument('--precIterGrowth', action='store', default=2.0)
+    parser.add_argument('--restart', action='store', default=50)
+    parser.add_argument('--recycle', action='store', default=0,
+        help='GCRO-DR recycled vectors (0 for GMRES)')
+    parser.add_argument('--warmStart', action='store_true', default=False)
+    parser.add_argument('--profile', action='store_true', default=False)
+    parser.add_argument('--trace', action='store', default=None,
+        help='write a Chrome trace of the solve to this file')
+    parser.add_argument('--gridSeq', action='store_true', default=False,
+        help='solve by grid sequencing from a coarse grid')
 
     args = parser.parse_args()
 
@@ -161,13 +562,39 @@ if __name__=='__main__':
         tau_r=np.double(args.tau_r),
         tau_a=np.double(args.tau_a),
         tolFudge=np.double(args.fudge),
-        reusePrecond=False,
+        reusePrecond=str(args.reusePrec).lower() in ('true', '1', 'yes'),
+        precPolicy=args.precPolicy,
+        precIterGrowth=np.double(args.precIterGrowth),
         minLinTol=np.double(args.tau_min),
-        iluDrop=np.double(args.ilu_drop))
+        forcing=args.forcing,
+        globalization=args.globalization,
+        iluDrop=np.double(args.ilu_drop),
+        precType=args.prec,
+        precBlocks=None if args.precBlocks is None else int(args.precBlocks),
+        precOverlap=int(args.precOverlap),
+        threads=int(args.threads),
+        mgSmoother=args.mgSmoother,
+        matrixFree=args.matrixFree,
+        jfnk=args.jfnk,
+        jfnkOrder=int(args.jfnkOrder),
+        fdJacobian=args.fdJacobian,
+        restart=int(args.restart),
+        recycle=int(args.recycle),
+        warmStart=args.warmStart,
+        profile=args.profile,
+        trace=args.trace is not None)
 
     m = int(args.m)
     print('grid is %d by %d' % (m,m))
-    func = FDBratu2D(m=m)
-    u = func.initialU()
-
-    (conv, uSoln) = solver.solve(func, u)
+    if args.gridSeq:
+        from GridSequencing import GridSequencing
+        seq = GridSequencing(lambda ml: FDBratu2D(m=ml), solver)
+        (conv, uSoln, func) = seq.solve(m)
+        seq.report()
+    else:
+        func = FDBratu2D(m=m)
+        u = func.initialU()
+        (conv, uSoln) = solver.solve(func, u)
+    solver.reportTiming()
+    if args.trace is not None:
+        solver.writeTrace(args.trace)
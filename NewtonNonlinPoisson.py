@@ -4,11 +4,9 @@
 # v''= alpha*f'(u^k)*v - r(u^k), with BCs v(-1)=v(1)=0.
 # or v'' - alpha*f'(u^k)*v = -r(u^k), where r(u^k)= (u^k)'' - alpha*f(u^k)
 # Jacobian is K - alpha*diag(f')
-import numpy.linalg as npla
-import scipy.sparse.linalg as spla
 import numpy as np
-import scipy.sparse as sp
-from FDLaplacian1D import FDLaplacian1D
+from FDNonlinPoisson1D import FDNonlinPoisson1D
+from NewtonDirect import NewtonDirect
 
 # Write a function to return f(u) and its derivative
 def RHSFunc(uk):
@@ -16,35 +14,22 @@ def RHSFunc(uk):
 
 alpha = 0.5
 
-# Set up an m by m matrix for FD discretization of the Laplacian
+# FD discretization on m interior points
 m = 5
-K = FDLaplacian1D(-1.0, 1.0, m)
+prob = FDNonlinPoisson1D(m=m, alpha=alpha, rhsFunc=RHSFunc)
 
 # Set initial guess
-u0 = -np.ones(m)
+u0 = prob.initialU()
 
 # Newton iteration
 tol = 1.0e-15
 maxIter = 20 # if it doesn't converge in a few iters, it probably won't ever
-conv = False
 
-# Newton iteration for K u = f(u)
-for i in range(maxIter):
-  fAndDf = RHSFunc(u0)        # Evaluate f(u^k) and f'(u^k)
-  f = fAndDf[0]
-  df = fAndDf[1]
-  J = K - alpha*sp.diags([df],[0])  # Jacobian matrix (discrete Frechet deriv)
-  r = K*u0 - alpha*f                # Current residual
-  # Step eqn is: J*v + r = 0, or (K-alpha*diag(f'(u^k)))*v=alpha*f(u^k)-(u^k)'' 
-  newtStep = spla.spsolve(J, -r)    # Solve for step
-  normR = npla.norm(r)             # Compute residual norm
-  normDelta = npla.norm(newtStep)  # Compute step norm
-  u0 = u0 + newtStep          # Update solution
-  print('u[%d]=' % i, u0)
-  # Check for convergence: stop if either normR or normDelta is small enough
-  if normR < m*tol or normDelta < m*tol:
-    conv = True
-    break
+# Newton iteration for K u = f(u): stop when the residual norm is below
+# m*tol
+newton = NewtonDirect(maxIters=maxIter, tau_r=0.0, tau_a=m*tol,
+    globalization='none', verb=1)
+(conv, u0) = newton.solve(prob, u0)
 
 if conv:
   print('Converged to solution u=', u0)
@@ -0,0 +1,103 @@
+import numpy as np
+import scipy.sparse as sp
+
+# Interface shared by the discretized nonlinear problems (FDBratu1D,
+# FDBratu2D, FDNonlinPoisson1D, FDBurgers1D) and consumed by NewtonDirect
+# and NewtonKrylov.
+#
+# Subclasses build a CSR matrix self.pattern holding the sparsity pattern
+# of the Jacobian (canonical form, diagonal included) and implement
+#
+#   evalF(u, out=None)    residual F(u), written into out if given
+#   evalJ(u, J_out=None)  Jacobian J(u). If J_out (a matrix previously
+#                         returned by evalJ) is given, only its values are
+#                         overwritten; no new matrix is allocated.
+#
+# m is the number of grid points per direction and dim the spatial
+# dimension, so that grid-based solvers (e.g., multigrid) can reconstruct
+# the grid.
+#
+# paramName names the attribute holding the problem's main parameter (e.g.,
+# 'alpha' or 'beta'), which continuation methods vary; evalFParam(u) is
+# the derivative of F with respect to it.
+class NonlinearProblem:
+    paramName = None
+
+    def numUnknowns(self):
+        return self.pattern.shape[0]
+
+    def initialU(self):
+        return np.zeros(self.numUnknowns())
+
+    # A new matrix with the Jacobian's pattern and zero values
+    def newJ(self):
+        J = self.pattern.copy()
+        J.data[:] = 0.0
+        return J
+
+    def evalF(self, u, out=None):
+        raise NotImplementedError('evalF() not implemented for %s'
+            % type(self).__name__)
+
+    def evalJ(self, u, J_out=None):
+        raise NotImplementedError('evalJ() not implemented for %s'
+            % type(self).__name__)
+
+    # dF/dparam by a one-sided difference. Problems override this with
+    # the exact derivative.
+    def evalFParam(self, u):
+        p = getattr(self, self.paramName)
+        dp = 1.0e-7*max(abs(p), 1.0)
+        setattr(self, self.paramName, p + dp)
+        Fp = self.evalF(u)
+        setattr(self, self.paramName, p)
+        return (Fp - self.evalF(u))/dp
+
+
+# The union of the sparsity patterns of several matrices, plus the diagonal,
+# as a canonical CSR matrix with all values zero
+def unionPattern(*mats):
+    n = mats[0].shape[0]
+    P = sp.identity(n, format='csr')
+    for A in mats:
+        P = P + abs(sp.csr_matrix(A))
+    P = sp.csr_matrix((np.ones_like(P.data), P.indices, P.indptr),
+        shape=P.shape)
+    P.sort_indices()
+    P.data[:] = 0.0
+    return P
+
+
+# Positions in pattern.data of the entries of A, whose pattern must be a
+# subset of pattern's
+def patternPositions(pattern, A):
+    n = pattern.shape[1]
+    rows = np.repeat(np.arange(pattern.shape[0]), np.diff(pattern.indptr))
+    keys = rows*n + pattern.indices
+
+    A = sp.coo_matrix(A)
+    aKeys = A.row.astype(np.int64)*n + A.col
+    pos = np.searchsorted(keys, aKeys)
+    if np.any(pos >= len(keys)) or np.any(keys[np.minimum(pos, len(keys)-1)]
+            != aKeys):
+        raise ValueError('matrix pattern is not contained in the pattern')
+    return pos
+
+
+# The values of A laid out as the data array of pattern
+def valuesOnPattern(pattern, A):
+    A = sp.coo_matrix(A)
+    vals = np.zeros(pattern.nnz)
+    np.add.at(vals, patternPositions(pattern, A), A.data)
+    return vals
+
+
+# Row index of every stored entry of a CSR matrix
+def entryRows(pattern):
+    return np.repeat(np.arange(pattern.shape[0]), np.diff(pattern.indptr))
+
+
+# Positions of the diagonal entries in pattern.data
+def diagonalPositions(pattern):
+    n = pattern.shape[0]
+    return patternPositions(pattern, sp.identity(n, format='coo'))
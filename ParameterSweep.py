@@ -0,0 +1,235 @@
+# Parameter sweeps and multi-start runs farmed out to a process pool.
+#
+# A sweep is a list of independent tasks (plain dicts, so they pickle
+# cheaply), each naming a problem, its grid size, the parameter values to
+# set on it, the solver configuration, and optionally a residual noise level
+# and a random perturbation of the initial guess. runSweep() runs the tasks
+# in a concurrent.futures.ProcessPoolExecutor and returns one result dict
+# per task, in task order, with the convergence history as lists.
+#
+# Each worker process keeps the problems it has built, keyed by problem and
+# grid size, so the discretization (matrices, patterns, index maps) is set
+# up once per worker and only the swept parameters change between tasks.
+# Before a task's parameters are set, every parameter an earlier task
+# changed is put back to its constructor value, so a task sees the same
+# problem whatever ran before it in that process.
+#
+# Every task gets its own child of a numpy SeedSequence, spawned in task
+# order from the sweep seed, so the random numbers a task sees don't depend
+# on which worker runs it or in what order: noise experiments reproduce
+# exactly for a given seed.
+#
+# Example (the noise study of InexactNewtonNonlinPoisson.py, in parallel):
+#   python ParameterSweep.py --problem poisson1d --m 500 \
+#       --noise 1e-16 1e-12 1e-8 1e-4 --workers 4
+
+import os
+import time
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from NewtonDirect import NewtonDirect
+from NewtonKrylov import NewtonKrylov
+from FDBratu1D import FDBratu1D
+from FDBratu2D import FDBratu2D
+from FDNonlinPoisson1D import FDNonlinPoisson1D
+from FDBurgers1D import FDBurgers1D
+
+
+problemTypes = {
+    'bratu1d' : FDBratu1D,
+    'bratu2d' : FDBratu2D,
+    'poisson1d' : FDNonlinPoisson1D,
+    'burgers1d' : FDBurgers1D,
+}
+
+# Problems built in this process, keyed by (problem, m), with the
+# constructor values of the parameters tasks have changed on them
+_problemCache = {}
+
+
+# Deterministic, statistically independent seeds for n tasks
+def taskSeeds(seed, n):
+    return np.random.SeedSequence(seed).spawn(n)
+
+
+# Relative noise F_i*(1 + N(0, sigma)) on the residual, passed to the
+# solvers as residPerturb: as in InexactNewtonNonlinPoisson.py, only the
+# right-hand side of each step solve is perturbed, and the convergence
+# test and the globalization use the true residual.
+class ResidualNoise:
+    def __init__(self, sigma, rng):
+        self.sigma = sigma
+        self.rng = rng
+
+    def __call__(self, F):
+        return F*(1.0 + self.rng.normal(scale=self.sigma, size=F.shape))
+
+
+# The problem for a task, from this process's cache, with the swept
+# parameters set
+def getProblem(problem, m, params):
+    if problem not in problemTypes:
+        raise ValueError('unknown problem: %s' % problem)
+    key = (problem, m)
+    if key not in _problemCache:
+        _problemCache[key] = (problemTypes[problem](m=m), {})
+    (func, defaults) = _problemCache[key]
+    for (name, value) in defaults.items():
+        setattr(func, name, value)
+    for (name, value) in params.items():
+        if not hasattr(func, name):
+            raise ValueError('unknown parameter for %s: %s' % (problem, name))
+        if name not in defaults:
+            defaults[name] = getattr(func, name)
+        setattr(func, name, value)
+    return func
+
+
+def makeSolver(solver, solverOpts):
+    if solver == 'direct':
+        return NewtonDirect(verb=0, **solverOpts)
+    if solver == 'nk':
+        return NewtonKrylov(verb=0, linVerb=0, **solverOpts)
+    raise ValueError('unknown solver: %s' % solver)
+
+
+# Tasks for every combination of the values in paramGrid (a dict of
+# parameter name to list of values), noise level and start. Start 0 uses
+# the problem's initial guess; the others perturb it by uniform noise of
+# size startScale.
+def makeTasks(problem, m, paramGrid=None, solver='direct', solverOpts=None,
+            noise=None, starts=1, startScale=0.0, seed=0,
+            keepSolution=False):
+    if paramGrid is None:
+        paramGrid = {}
+    if solverOpts is None:
+        solverOpts = {}
+    if noise is None:
+        noise = [0.0]
+
+    names = list(paramGrid.keys())
+    combos = list(itertools.product(*[paramGrid[n] for n in names],
+        noise, range(starts)))
+    seeds = taskSeeds(seed, len(combos))
+
+    tasks = []
+    for (k, combo) in enumerate(combos):
+        tasks.append({
+            'index' : k,
+            'problem' : problem,
+            'm' : m,
+            'params' : dict(zip(names, combo[:-2])),
+            'solver' : solver,
+            'solverOpts' : solverOpts,
+            'noise' : combo[-2],
+            'start' : combo[-1],
+            'startScale' : startScale,
+            'seed' : seeds[k],
+            'keepSolution' : keepSolution
+        })
+    return tasks
+
+
+def runTask(task):
+    rng = np.random.default_rng(task['seed'])
+    func = getProblem(task['problem'], task['m'], task['params'])
+    u = func.initialU()
+    if task['start'] > 0:
+        u = u + task['startScale']*rng.uniform(-1.0, 1.0, u.shape)
+    solverOpts = dict(task['solverOpts'])
+    if task['noise'] > 0.0:
+        solverOpts['residPerturb'] = ResidualNoise(task['noise'], rng)
+
+    solver = makeSolver(task['solver'], solverOpts)
+    t0 = time.perf_counter()
+    (conv, uSoln) = solver.solve(func, u)
+    tSolve = time.perf_counter() - t0
+    if hasattr(solver, 'close'):
+        solver.close()
+
+    hist = solver.history
+    result = {
+        'index' : task['index'],
+        'problem' : task['problem'],
+        'm' : task['m'],
+        'params' : task['params'],
+        'solver' : task['solver'],
+        'noise' : task['noise'],
+        'start' : task['start'],
+        'converged' : bool(conv),
+        'newtonIters' : hist.numIters - 1,
+        'krylovIters' : solver.totalKrylovIters,
+        'residEvals' : solver.numResidEvals,
+        'solveTime' : tSolve,
+        'uNorm' : float(np.linalg.norm(uSoln)),
+        'history' : {k : v.tolist() for (k, v) in hist.asDict().items()},
+        'pid' : os.getpid()
+    }
+    if task['keepSolution']:
+        result['u'] = uSoln.copy()
+    return result
+
+
+# Run the tasks, in a pool of the given number of worker processes
+# (default: one per CPU) or serially in this process if workers=1. Results
+# are returned in task order.
+def runSweep(tasks, workers=None):
+    if workers == 1:
+        return [runTask(task) for task in tasks]
+    if workers is None:
+        workers = os.cpu_count()
+    chunk = max(1, len(tasks)//(4*workers))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(runTask, tasks, chunksize=chunk))
+
+
+def printResult(res):
+    params = ' '.join('%s=%g' % kv for kv in res['params'].items())
+    print('%5d %-20s %10.3g %5d %6s %6d %8d %10.4g %12.6g' % (res['index'],
+        params, res['noise'], res['start'], res['converged'],
+        res['newtonIters'], res['krylovIters'], res['solveTime'],
+        res['uNorm']))
+
+
+if __name__=='__main__':
+
+    import argparse
+    from BenchSuite import writeJSON
+    parser = argparse.ArgumentParser(description='Parallel parameter sweep')
+    parser.add_argument('--problem', default='bratu1d',
+        choices=list(problemTypes.keys()))
+    parser.add_argument('--m', type=int, default=100)
+    parser.add_argument('--param', nargs='+', action='append', default=[],
+        metavar=('NAME', 'VALUE'),
+        help='parameter name followed by the values to sweep; repeatable')
+    parser.add_argument('--solver', default='direct', choices=['direct', 'nk'])
+    parser.add_argument('--tau_r', type=float, default=1.0e-10)
+    parser.add_argument('--tau_a', type=float, default=1.0e-10)
+    parser.add_argument('--noise', nargs='+', type=float, default=[0.0],
+        help='relative residual noise levels')
+    parser.add_argument('--starts', type=int, default=1)
+    parser.add_argument('--startScale', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--json', default=None)
+    args = parser.parse_args()
+
+    paramGrid = {p[0] : [float(v) for v in p[1:]] for p in args.param}
+    tasks = makeTasks(args.problem, args.m, paramGrid, solver=args.solver,
+        solverOpts={'tau_r' : args.tau_r, 'tau_a' : args.tau_a},
+        noise=args.noise, starts=args.starts, startScale=args.startScale,
+        seed=args.seed)
+
+    t0 = time.perf_counter()
+    results = runSweep(tasks, workers=args.workers)
+    elapsed = time.perf_counter() - t0
+
+    print('%5s %-20s %10s %5s %6s %6s %8s %10s %12s' % ('task', 'params',
+        'noise', 'start', 'conv', 'newton', 'krylov', 'solve(s)', '|u|'))
+    for res in results:
+        printResult(res)
+    print('%d tasks in %.4g s' % (len(tasks), elapsed))
+
+    if args.json is not None:
+        writeJSON(results, args.json)
@@ -0,0 +1,101 @@
+import time
+import json
+import numpy as np
+import scipy.sparse.linalg as spla
+
+# Accumulates wall time and call counts per named phase of a solve. Timing
+# uses the monotonic time.perf_counter(); a phase is timed by
+#
+#   t = timer.start()
+#   ... work ...
+#   timer.stop('phase', t)
+#
+# which costs two clock reads and a dict update. With trace=True every
+# interval is also kept so that the run can be written as a Chrome trace
+# (load the file in chrome://tracing or https://ui.perfetto.dev).
+class PhaseTimer:
+    def __init__(self, trace=False):
+        self.trace = trace
+        self.reset()
+
+    def reset(self):
+        self.totals = {}
+        self.counts = {}
+        self.events = []
+        self.t0 = time.perf_counter()
+
+    def start(self):
+        return time.perf_counter()
+
+    def stop(self, phase, tStart):
+        t = time.perf_counter()
+        self.totals[phase] = self.totals.get(phase, 0.0) + (t - tStart)
+        self.counts[phase] = self.counts.get(phase, 0) + 1
+        if self.trace:
+            self.events.append((phase, tStart, t - tStart))
+
+    # Per-phase totals as {phase : {'time' : seconds, 'calls' : count}}
+    def summary(self):
+        return {p : {'time' : self.totals[p], 'calls' : self.counts[p]}
+            for p in self.totals}
+
+    # Print a table of the phases. A summary with extra (e.g., derived)
+    # entries can be given in place of the timer's own.
+    def report(self, prefix='', summary=None):
+        if summary is None:
+            summary = self.summary()
+        total = time.perf_counter() - self.t0
+        print('%s%-20s %12s %10s %12s %8s' % (prefix, 'phase', 'time (s)',
+            'calls', 'per call', '%'))
+        for p in sorted(summary, key=lambda q: -summary[q]['time']):
+            t = summary[p]['time']
+            n = summary[p]['calls']
+            print('%s%-20s %12.5g %10d %12.5g %8.2f' % (prefix, p, t, n,
+                t/max(n, 1), 100.0*t/total))
+        print('%s%-20s %12.5g' % (prefix, 'total', total))
+
+    def writeChromeTrace(self, filename):
+        events = [{'name' : p, 'ph' : 'X', 'pid' : 0, 'tid' : 0,
+                'ts' : 1.0e6*(t - self.t0), 'dur' : 1.0e6*dt}
+            for (p, t, dt) in self.events]
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents' : events, 'displayTimeUnit' : 'ms'}, f)
+
+
+# Operator wrapper that times every product with the wrapped operator
+class TimedOperator(spla.LinearOperator):
+    def __init__(self, A, timer, phase='matvec'):
+        super().__init__(dtype=np.double, shape=A.shape)
+        self.A = A
+        self.timer = timer
+        self.phase = phase
+
+    def _matvec(self, v):
+        t = self.timer.start()
+        y = self.A*v
+        self.timer.stop(self.phase, t)
+        return y
+
+
+# Preconditioner wrapper that times every application of the wrapped
+# preconditioner
+class TimedPreconditioner:
+    def __init__(self, precond, timer, phase='precApply'):
+        self.precond = precond
+        self.timer = timer
+        self.phase = phase
+
+    def applyRight(self, vec):
+        t = self.timer.start()
+        y = self.precond.applyRight(vec)
+        self.timer.stop(self.phase, t)
+        return y
+
+    def applyLeft(self, vec):
+        return self.precond.applyLeft(vec)
+
+    def applyRightBlock(self, X):
+        t = self.timer.start()
+        Y = self.precond.applyRightBlock(X)
+        self.timer.stop(self.phase, t)
+        return Y
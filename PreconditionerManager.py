@@ -0,0 +1,101 @@
+import numpy as np
+import numpy.linalg as npla
+
+# Keeps the current preconditioner for a sequence of related linear solves
+# (e.g., the Newton steps in NewtonKrylov) and decides when to rebuild it.
+#
+# Policies:
+# (*) 'rebuild'  -- build a new preconditioner for every solve
+# (*) 'reuse'    -- build once, keep it forever
+# (*) 'adaptive' -- keep the current preconditioner until it goes stale.
+#     It is marked stale when
+#       - the Krylov iteration count exceeds maxKrylovIters, or
+#       - the average residual reduction per Krylov iteration, measured as
+#         log(tol)/iters, has dropped by more than a factor iterGrowth
+#         compared to the first solve after the build, or
+#       - the iterate has moved by more than driftTol (relative) since the
+#         build, used as a cheap proxy for drift of the Jacobian, or
+#       - a linear solve failed to converge.
+#
+# The builder is any function that takes an assembled matrix and returns
+# an object with an applyRight() method, such as ILURightPreconditioner.
+class PreconditionerManager:
+    def __init__(self, builder,
+                policy='adaptive',      # 'rebuild', 'reuse', or 'adaptive'
+                iterGrowth=2.0,         # allowed slowdown in Krylov rate
+                maxKrylovIters=None,    # rebuild if a solve needs more
+                driftTol=None):         # rebuild if |u-u_b|/|u_b| exceeds
+
+        if policy not in ('rebuild', 'reuse', 'adaptive'):
+            raise ValueError('unknown preconditioner policy: %s' % policy)
+
+        self.builder = builder
+        self.policy = policy
+        self.iterGrowth = iterGrowth
+        self.maxKrylovIters = maxKrylovIters
+        self.driftTol = driftTol
+
+        self.reset()
+
+    def __str__(self):
+        return ('PrecManager(policy=%s, iterGrowth=%g, maxKrylovIters=%s, '
+            'driftTol=%s)' % (self.policy, self.iterGrowth,
+            self.maxKrylovIters, self.driftTol))
+
+    # Forget the current preconditioner and all statistics
+    def reset(self):
+        self.precond = None
+        self.stale = False
+        self.uBuild = None
+        self.buildRate = None
+        self.solvesSinceBuild = 0
+        self.numBuilds = 0
+
+    # Decide whether the preconditioner must be (re)built before solving
+    # at iterate u
+    def needsRebuild(self, u=None):
+        if self.precond is None:
+            return True
+        if self.policy == 'rebuild':
+            return self.solvesSinceBuild > 0
+        if self.policy == 'reuse':
+            return False
+        if self.stale:
+            return True
+        if self.driftTol is not None and u is not None:
+            drift = npla.norm(u - self.uBuild)
+            if drift > self.driftTol*max(npla.norm(self.uBuild), 1.0):
+                return True
+        return False
+
+    # Build a new preconditioner from the assembled matrix J
+    def build(self, J, u=None):
+        self.precond = self.builder(J)
+        self.stale = False
+        self.buildRate = None
+        self.solvesSinceBuild = 0
+        self.numBuilds += 1
+        if u is not None and self.driftTol is not None:
+            self.uBuild = u.copy()
+        return self.precond
+
+    def get(self):
+        return self.precond
+
+    # Record the outcome of a linear solve with the current preconditioner
+    def update(self, krylovIters, tol, conv):
+        self.solvesSinceBuild += 1
+        if not conv:
+            self.stale = True
+            return
+
+        if self.maxKrylovIters is not None and krylovIters > self.maxKrylovIters:
+            self.stale = True
+
+        # Average number of digits of residual reduction per Krylov iteration
+        if krylovIters > 0 and tol < 1.0:
+            rate = -np.log10(tol)/krylovIters
+            if self.buildRate is None:
+                self.buildRate = rate
+            elif rate*self.iterGrowth < self.buildRate:
+                self.stale = True
@@ -0,0 +1,168 @@
+import time
+import numpy as np
+from Tab import Tab
+from NewtonDirect import NewtonDirect
+from NewtonKrylov import NewtonKrylov
+from FDBratu2D import FDBratu2D
+from FDBurgers1D import FDBurgers1D
+
+# Linear solves with one Jacobian and several right-hand sides, through the
+# solvers' solveJacobian(func, u, B): NewtonDirect factors J(u) once and
+# solves for all the columns of B, NewtonKrylov runs block GMRES
+# (BlockGMRES.py), whose matrix-vector products and preconditioner
+# applications act on whole n by p blocks.
+#
+# Sensitivities of a solution u of F(u; p) = 0 solve J du/dp = -dF/dp for
+# each parameter p. A load (a right-hand side array such as Burgers' f)
+# enters F affinely, so the change in u to first order for a change of load
+# is -J^{-1} (F(u; f_new) - F(u; f)), exact up to the nonlinearity in u.
+#
+# multiLoadSolve() uses that for a family of loads f_1, ..., f_p: one
+# Newton solve at the base load, one block solve for the first-order
+# predictors u + du_i, and a Newton solve from each predictor, which needs
+# far fewer iterations than a start from func.initialU().
+
+
+# du/dp at a solution u for each parameter (attribute) in names. The
+# problem's own parameter uses its evalFParam(); others are differenced.
+# Returns (conv, S) with S n by len(names).
+def paramSensitivities(solver, func, u, names):
+    cols = []
+    for name in names:
+        if name == func.paramName:
+            cols.append(-func.evalFParam(u))
+            continue
+        p = getattr(func, name)
+        dp = 1.0e-7*max(abs(p), 1.0)
+        F = func.evalF(u)
+        setattr(func, name, p + dp)
+        Fp = func.evalF(u)
+        setattr(func, name, p)
+        cols.append((F - Fp)/dp)
+    return solver.solveJacobian(func, u, np.column_stack(cols))
+
+
+# First-order change in u at a solution u when the load attribute loadName
+# changes to each of loads (a list of arrays). Returns (conv, dU) with dU
+# n by len(loads).
+def loadSensitivities(solver, func, u, loads, loadName='f'):
+    f0 = getattr(func, loadName)
+    F0 = func.evalF(u)
+    B = np.empty((len(u), len(loads)))
+    try:
+        for (i, f) in enumerate(loads):
+            setattr(func, loadName, f)
+            B[:,i] = F0 - func.evalF(u)
+    finally:
+        setattr(func, loadName, f0)
+    return solver.solveJacobian(func, u, B)
+
+
+# Solve F(u; f) = 0 for each f in loads, with one Newton solve at the
+# problem's current load and first-order predictors from a single block
+# solve. Returns a list of (conv, u, newtonIters), one per load.
+def multiLoadSolve(solver, func, loads, loadName='f', verb=0):
+    tab0 = Tab()
+    f0 = getattr(func, loadName)
+    (conv, u0) = solver.solve(func, func.initialU())
+    if not conv:
+        raise RuntimeError('base solve did not converge')
+    (linConv, dU) = loadSensitivities(solver, func, u0, loads, loadName)
+    if verb>0:
+        print(tab0, 'base solve: %d Newton iterations; block solve for %d '
+            'loads, conv=%s' % (solver.history.numSteps(), len(loads),
+            linConv))
+
+    # Each load stops where a cold solve would: the relative tolerance is
+    # taken relative to the residual at func.initialU(), not at the much
+    # better predictor (as in GridSequencing)
+    results = []
+    saved = (solver.tau_r, solver.tau_a)
+    try:
+        for (i, f) in enumerate(loads):
+            setattr(func, loadName, f)
+            rCold = np.linalg.norm(func.evalF(func.initialU()))
+            (solver.tau_r, solver.tau_a) = (0.0, saved[0]*rCold + saved[1])
+            (conv, u) = solver.solve(func, u0 + dU[:,i])
+            results.append((conv, u, solver.history.numSteps()))
+            if verb>0:
+                print(tab0, 'load %d: conv=%s, %d Newton iterations' % (i,
+                    conv, solver.history.numSteps()))
+    finally:
+        setattr(func, loadName, f0)
+        (solver.tau_r, solver.tau_a) = saved
+    return results
+
+
+if __name__=='__main__':
+
+    import argparse
+    parser = argparse.ArgumentParser(description='Multi-RHS sensitivities '
+        'and multi-load Newton solves')
+    parser.add_argument('--mBurgers', type=int, default=2000)
+    parser.add_argument('--beta', type=float, default=100.0)
+    parser.add_argument('--mBratu', type=int, default=96)
+    parser.add_argument('--alpha', type=float, default=1.0)
+    parser.add_argument('--numLoads', type=int, default=8)
+    parser.add_argument('--solver', default='direct', choices=['direct', 'nk'])
+    args = parser.parse_args()
+
+    def makeSolver():
+        if args.solver == 'nk':
+            return NewtonKrylov(tau_r=1.0e-10, tau_a=1.0e-12, verb=0,
+                linVerb=0)
+        return NewtonDirect(tau_r=1.0e-10, tau_a=1.0e-12, verb=0)
+
+    # Burgers with a family of loads: the base f=1 plus smooth bumps
+    func = FDBurgers1D(m=args.mBurgers, beta=args.beta)
+    x = np.linspace(-1.0, 1.0, args.mBurgers+2)[1:-1]
+    loads = [1.0 + 0.5*np.sin((k+1)*np.pi*(x+1.0)/2.0)
+        for k in range(args.numLoads)]
+
+    solver = makeSolver()
+    print('Burgers, m=%d, beta=%g, %d loads, %s' % (args.mBurgers, args.beta,
+        args.numLoads, args.solver))
+    t0 = time.perf_counter()
+    results = multiLoadSolve(solver, func, loads, verb=1)
+    tMulti = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    coldIters = 0
+    for (i, f) in enumerate(loads):
+        func.f = f
+        (conv, u) = solver.solve(func, func.initialU())
+        coldIters += solver.history.numSteps()
+        if not conv or np.max(np.abs(u - results[i][1])) > 1.0e-6:
+            print('load %d: cold start disagrees (conv=%s)' % (i, conv))
+    func.f = np.ones(args.mBurgers)
+    tCold = time.perf_counter() - t0
+    print('predicted starts: %d Newton iterations, %.4g s (incl. base '
+        'solve); cold starts: %d, %.4g s' % (sum(r[2] for r in results),
+        tMulti, coldIters, tCold))
+
+    # Bratu: du/dalpha at a solution, one block solve against p separate
+    # solves with the same Jacobian
+    func = FDBratu2D(m=args.mBratu, alpha=args.alpha)
+    solver = makeSolver()
+    (conv, u) = solver.solve(func, func.initialU())
+    (linConv, S) = paramSensitivities(solver, func, u, ['alpha'])
+    da = 1.0e-4
+    func.alpha = args.alpha + da
+    (conv1, u1) = solver.solve(func, u)
+    func.alpha = args.alpha
+    print('Bratu 2D, m=%d: |du/dalpha - FD|/|du/dalpha|=%.3g' % (args.mBratu,
+        np.linalg.norm(S[:,0] - (u1 - u)/da)/np.linalg.norm(S[:,0])))
+
+    xy = np.linspace(0.0, 1.0, args.mBratu+2)[1:-1]
+    (X, Y) = np.meshgrid(xy, xy)
+    B = np.column_stack([(np.sin((k%4+1)*np.pi*X)*np.sin((k//4+1)*np.pi*Y))
+        .ravel() for k in range(args.numLoads)])
+    t0 = time.perf_counter()
+    (c, Xb) = solver.solveJacobian(func, u, B)
+    tBlock = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for i in range(B.shape[1]):
+        (c, x1) = solver.solveJacobian(func, u, B[:,i])
+    tSep = time.perf_counter() - t0
+    print('%d right-hand sides: one block solve %.4g s, separate solves '
+        '%.4g s' % (B.shape[1], tBlock, tSep))
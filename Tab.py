@@ -0,0 +1,22 @@
+# Indentation for nested output. Each live Tab is one level deeper than the
+# ones created before it, and the level is given back when it is deleted,
+# so a function that makes
+#
+#   tab0 = Tab()
+#   tab1 = Tab()
+#   print(tab0, 'heading')
+#   print(tab1, 'detail')
+#
+# prints at one level deeper than its caller.
+class Tab:
+    depth = 0
+
+    def __init__(self):
+        Tab.depth += 1
+        self.level = Tab.depth
+
+    def __del__(self):
+        Tab.depth -= 1
+
+    def __str__(self):
+        return '  '*(self.level-1)
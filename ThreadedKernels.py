@@ -0,0 +1,168 @@
+import numpy as np
+import scipy.sparse as sp
+from concurrent.futures import ThreadPoolExecutor
+from FusedKernels import csrMatvec, _csr_matvec
+
+# Shared-memory parallel kernels on a thread pool.
+#
+# SciPy's compiled sparse kernels (csr_matvec, and SuperLU's factor and
+# triangular solves) release the GIL while they run, so Python threads
+# calling them on disjoint pieces of a problem run concurrently. The
+# pieces here are contiguous blocks of rows, balanced by their number of
+# nonzeros; for the lexicographically ordered grid problems these are
+# strips of the grid.
+#
+# The pool is created once and shared (by NewtonKrylov, between the
+# matvec and the block-Jacobi preconditioner), so no threads are started
+# per operation. With one thread everything runs in the calling thread.
+
+
+# Row boundaries r_0=0 < r_1 < ... < r_k=n splitting a CSR matrix into k
+# blocks of contiguous rows with about nnz/k nonzeros each
+def partitionRows(A, k):
+    n = A.shape[0]
+    k = max(1, min(k, n))
+    targets = np.linspace(0, A.nnz, k+1)
+    bounds = np.searchsorted(A.indptr, targets[1:-1])
+    bounds = np.concatenate(([0], bounds, [n]))
+    return np.unique(bounds)
+
+
+# A thread pool, or None for serial execution
+def makePool(threads):
+    if threads <= 1:
+        return None
+    return ThreadPoolExecutor(max_workers=threads)
+
+
+# Run f(i) for i in range(k), in the pool if there is one. Exceptions in
+# the workers are raised here.
+def runBlocks(pool, f, k):
+    if pool is None or k == 1:
+        for i in range(k):
+            f(i)
+        return
+    for fut in [pool.submit(f, i) for i in range(k)]:
+        fut.result()
+
+
+# CSR matrix with a row-partitioned, multithreaded matrix-vector product.
+# Each thread runs SciPy's csr_matvec on its rows, straight from A's
+# arrays (the row pointer slice keeps its offsets), into its slice of the
+# output; nothing is copied. Values changed in place in A (evalJ with
+# J_out) are seen by later products. GMRES uses matvecInto(); everything
+# else that needs A*x gets dot() or *.
+class ThreadedCSR:
+    def __init__(self, A, pool=None, numBlocks=1):
+        if not (sp.issparse(A) and A.format == 'csr'):
+            raise ValueError('ThreadedCSR needs a CSR matrix, not %s'
+                % type(A).__name__)
+        self.A = A
+        self.shape = A.shape
+        self.dtype = A.dtype
+        self.pool = pool
+        self.bounds = partitionRows(A, numBlocks)
+
+    def __str__(self):
+        return 'ThreadedCSR(%d blocks)' % (len(self.bounds)-1)
+
+    def matvecInto(self, x, out):
+        if _csr_matvec is None or self.pool is None:
+            return csrMatvec(self.A, x, out)
+        A = self.A
+        x = np.ascontiguousarray(x, dtype=np.double)
+        bounds = self.bounds
+        nCol = A.shape[1]
+
+        def rows(i):
+            (r0, r1) = (bounds[i], bounds[i+1])
+            y = out[r0:r1]
+            y.fill(0.0)
+            _csr_matvec(r1-r0, nCol, A.indptr[r0:r1+1], A.indices, A.data, x,
+                y)
+
+        runBlocks(self.pool, rows, len(bounds)-1)
+        return out
+
+    def dot(self, x):
+        x = np.asarray(x)
+        if x.ndim != 1:
+            return self.A.dot(x)
+        return self.matvecInto(x, np.empty(self.shape[0]))
+
+    def __mul__(self, x):
+        return self.dot(x)
+
+    def __matmul__(self, x):
+        return self.dot(x)
+
+
+if __name__=='__main__':
+
+    import argparse
+    import time
+    from FDBratu2D import FDBratu2D
+    from BlockJacobiPreconditioner import BlockJacobiILUPreconditioner
+    from NewtonKrylov import NewtonKrylov
+    parser = argparse.ArgumentParser(description='Strong scaling of the '
+        'threaded SpMV, block-Jacobi ILU and Newton-Krylov on Bratu 2D')
+    parser.add_argument('--m', type=int, default=1024)
+    parser.add_argument('--threads', nargs='+', type=int,
+        default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--blocks', type=int, default=None,
+        help='block-Jacobi blocks (default: the largest thread count)')
+    parser.add_argument('--overlap', type=int, default=1)
+    parser.add_argument('--reps', type=int, default=20)
+    parser.add_argument('--solve', action='store_true',
+        help='also time a full Newton-Krylov solve')
+    args = parser.parse_args()
+
+    func = FDBratu2D(m=args.m, alpha=1.0)
+    u = func.initialU()
+    J = func.evalJ(u)
+    n = J.shape[0]
+    x = np.random.default_rng(0).standard_normal(n)
+    y = np.empty(n)
+    blocks = args.blocks if args.blocks is not None else max(args.threads)
+    print('Bratu 2D, m=%d, n=%d, nnz=%d, %d blocks, overlap %d' % (args.m, n,
+        J.nnz, blocks, args.overlap))
+    print('%8s %12s %8s %12s %12s %8s %10s %8s' % ('threads', 'SpMV (ms)',
+        'speedup', 'build (s)', 'apply (ms)', 'speedup', 'solve (s)',
+        'speedup'))
+
+    base = None
+    for threads in args.threads:
+        pool = makePool(threads)
+        A = ThreadedCSR(J, pool, threads)
+        A.matvecInto(x, y)
+        t0 = time.perf_counter()
+        for k in range(args.reps):
+            A.matvecInto(x, y)
+        tMat = (time.perf_counter() - t0)/args.reps
+
+        t0 = time.perf_counter()
+        prec = BlockJacobiILUPreconditioner(J, numBlocks=blocks,
+            overlap=args.overlap, pool=pool)
+        tBuild = time.perf_counter() - t0
+        prec.applyRight(x)
+        t0 = time.perf_counter()
+        for k in range(args.reps):
+            prec.applyRight(x)
+        tApply = (time.perf_counter() - t0)/args.reps
+
+        tSolve = np.nan
+        if args.solve:
+            with NewtonKrylov(tau_r=1.0e-8, tau_a=1.0e-10, verb=0,
+                    linVerb=0, precType='bjilu', precBlocks=blocks,
+                    precOverlap=args.overlap, threads=threads) as solver:
+                t0 = time.perf_counter()
+                solver.solve(func, func.initialU())
+                tSolve = time.perf_counter() - t0
+        if pool is not None:
+            pool.shutdown()
+
+        if base is None:
+            base = (tMat, tApply, tSolve)
+        print('%8d %12.4g %8.3g %12.4g %12.4g %8.3g %10.4g %8.3g' % (threads,
+            1.0e3*tMat, base[0]/tMat, tBuild, 1.0e3*tApply, base[1]/tApply,
+            tSolve, base[2]/tSolve))